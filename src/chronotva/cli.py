@@ -1,15 +1,67 @@
 import argparse
 import datetime
+import functools
 import logging
 import os
 import sys
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, List, Optional, Tuple, Union
 
+from .dataset import export_dataset
 from .default_data import default_data as data
-from .tesseract import BlockPlotter, PlotParameters, parse_rgba_list
+from .engines import (
+    BUILTIN_ENGINES,
+    DEFAULT_ENGINE,
+    check_formats,
+    create_engine,
+)
+from .geometry import uniform_extent
+from .journal import (
+    JOURNAL_NAME,
+    RenderFailures,
+    RunJournal,
+    TaskFailure,
+    check_time_limit,
+    run_with_retries,
+)
+from .meshes import MESH_FORMATS, export_meshes
+from .metrics import RenderMetrics
+from .naming import (
+    DEFAULT_TEMPLATE,
+    PALETTE_TEMPLATE,
+    OutputKey,
+    OutputNamer,
+    validate_template,
+)
+from .profiling import RenderProfiler, optional_profile, profile_run
+from .raster import (
+    BackgroundEncoder,
+    PendingImage,
+    RasterCache,
+    check_raster_options,
+    render_image,
+    write_images,
+)
+from .renderdb import RenderCatalogue, file_sha256
+from .shared import WorkerLimits
+from .sinks import ArchiveSink, DirectorySink, OutputRecord
+from .sweep import dry_run_job, load_job, run_job
+from .tesseract import (
+    OUTPUT_FORMATS,
+    Palette,
+    PlotParameters,
+    parse_palettes,
+    parse_rgba_list,
+)
+from .viewer import export_viewer
+from .workqueue import DEFAULT_LEASE_SECONDS, enqueue_job, run_worker
 
 logger = logging.getLogger(__name__)
 
+RUN_COMMAND = "run"
+WORKER_COMMAND = "worker"
+
 
 def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse command-line arguments for chronotva.
@@ -21,7 +73,10 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
     Returns:
         An argparse.Namespace object containing the parsed arguments.
     """
-    parser = argparse.ArgumentParser(description="ChronoTVA")
+    parser = argparse.ArgumentParser(
+        description="ChronoTVA",
+        epilog=f"Use 'chronotva {RUN_COMMAND} JOB.toml' to render a parameter sweep from a job file, and 'chronotva {WORKER_COMMAND} --queue DIR' to render the tasks of a queued sweep.",
+    )
     parser.add_argument(
         "-b",
         "--block-color",
@@ -53,10 +108,9 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "-f",
         "--output-format",
-        type=str,
-        default="svg",
-        choices=["png", "svg", "pdf"],
-        help="Output file format. Options: png, svg, pdf. Default: 'svg'",
+        type=parse_output_formats,
+        default=["svg"],
+        help="Comma-separated output file formats, e.g. 'png,svg,pdf'. Each unfolding is built once and saved in every format. Options: png, webp, svg, svgz (gzip-compressed SVG), pdf. Default: 'svg'",
     )
     parser.add_argument(
         "-d",
@@ -91,6 +145,35 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
         action="store_true",
         help="Show axes in the plot. Default: False",
     )
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        metavar="LEVEL",
+        help="zlib compression level of PNG files, from 0 (fastest) to 9 (smallest). Default: 6",
+    )
+    parser.add_argument(
+        "--png-colors",
+        type=int,
+        metavar="N",
+        help="Quantize PNG files to an indexed palette of N colors with transparency, from 2 to 256. The flat block colors and their antialiased edges fit in a small palette, which makes the files several times smaller. Default: full RGBA",
+    )
+    parser.add_argument(
+        "--webp-quality",
+        type=int,
+        metavar="QUALITY",
+        help="Write lossy WebP files of QUALITY from 0 to 100 instead of lossless ones. Default: lossless",
+    )
+    parser.add_argument(
+        "--svg-precision",
+        type=int,
+        metavar="DIGITS",
+        help="Write compact SVG and SVGZ files: coordinates rounded to DIGITS decimals, one shared CSS class per style, e.g. per block and edge color, and, with the native-vector engine, one path per fill color. 2 keeps coordinates exact to 1/100 point. Default: the engine's full output",
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Make equal inputs give byte-identical SVG and PDF files by leaving out their creation dates and deriving the SVG element IDs from the content. Default: False",
+    )
     parser.add_argument(
         "-u",
         "--unfolding-ids",
@@ -123,9 +206,279 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
         default=4.8,
         help="Width of the output image in inches.",
     )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default=DEFAULT_ENGINE,
+        help=f"Render engine for the images. Built-in: {', '.join(BUILTIN_ENGINES)}. Engines of installed packages register through the 'chronotva.engines' entry point group. Default: '{DEFAULT_ENGINE}'",
+    )
+    parser.add_argument(
+        "--archive",
+        type=str,
+        metavar="PATH",
+        help="Stream all images from memory into a single archive instead of the output directory. Supported: .zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz, .tar.zst. A manifest.json member lists every image.",
+    )
+    parser.add_argument(
+        "--output-template",
+        type=str,
+        help="Template for output file names, relative to the output directory or archive. Fields: {id}, {view}, {elevation}, {azimuth}, {palette}, {format}, {hash}. Default: 'unfolding_{id}.{format}', or 'unfolding_{id}_{palette}.{format}' with --palettes.",
+    )
+    parser.add_argument(
+        "--shard-depth",
+        type=int,
+        help="Number of hashed subdirectory levels (256 directories each) the outputs are spread over. Default: none for up to 4096 outputs, otherwise as many as needed.",
+    )
+    parser.add_argument(
+        "--render-db",
+        type=str,
+        metavar="PATH",
+        help="Record every output in the SQLite database at PATH with its unfolding ID, normalized plot parameters, format, engine, location, SHA-256, size, render time and timestamp.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Number of further attempts at an unfolding whose rendering failed. Unfoldings that still fail are skipped and listed at the end. Default: 0",
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Time limit for every attempt at rendering an unfolding. Needs SIGALRM, so it is rejected on Windows.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Skip the unfoldings that the journal of an earlier run in the output directory ({JOURNAL_NAME}) records as complete. Use the same options as that run. The journal is removed once a run has rendered every unfolding.",
+    )
+    parser.add_argument(
+        "--dataset",
+        type=str,
+        metavar="DIR",
+        help="Render the unfoldings into a memory-mapped uint8 NumPy dataset in DIR (images.npy of shape (N, height, width, 4) and labels.npy with the unfolding IDs) instead of image files. Whitespace is not removed.",
+    )
+    parser.add_argument(
+        "--dataset-views",
+        type=int,
+        default=1,
+        help="Number of views rendered per unfolding in dataset mode. With more than one, the views are random. Default: 1",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the random dataset views. Default: 0",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for dataset rendering. Default: 1",
+    )
+    add_worker_limit_arguments(parser)
+    parser.add_argument(
+        "--mesh",
+        type=str,
+        metavar="DIR",
+        help="Export the unfoldings as triangle meshes to DIR instead of rendering images. Hidden faces are removed and coplanar faces merged.",
+    )
+    parser.add_argument(
+        "--mesh-format",
+        type=parse_mesh_formats,
+        default=["obj"],
+        help=f"Comma-separated list of mesh formats. Options: {', '.join(MESH_FORMATS)}. Default: obj",
+    )
+    parser.add_argument(
+        "--mesh-catalogue",
+        action="store_true",
+        default=False,
+        help="Place all exported unfoldings side by side in one 'catalogue' file per mesh format. Default: False",
+    )
+    parser.add_argument(
+        "--viewer",
+        type=str,
+        metavar="PATH",
+        help="Export the unfoldings as one instanced unit cube to a binary glTF file (.glb) or a self-contained WebGL viewer page (.html) instead of rendering images.",
+    )
+    parser.add_argument(
+        "--palettes",
+        type=str,
+        nargs="+",
+        metavar="[NAME=]BLOCK[/EDGE]",
+        help="Render every unfolding with several color schemes in one pass, e.g. 'brand=255,0,0,1;red/black'. Each palette reuses the unfolding's geometry and is saved as unfolding_<id>_<name>. Palettes without edge colors use --edge-color.",
+    )
+    parser.add_argument(
+        "--uniform-scale",
+        action="store_true",
+        default=False,
+        help="Draw every selected unfolding at the same scale, so that images line up in atlases and animations. Default: False",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="DIR",
+        help="Profile every render, or every --dataset chunk in whichever worker process renders it, with cProfile, write the .prof files to DIR and merge them into an aggregated report, also when the run fails.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        metavar="PATH",
+        help="Write render counters and histograms to PATH in the Prometheus text format, e.g. for node_exporter's textfile collector.",
+    )
     return parser.parse_args(args)
 
 
+def parse_run_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command-line arguments of 'chronotva run'.
+
+    Args:
+        args: A list of strings representing the arguments after 'run'.
+
+    Returns:
+        An argparse.Namespace object containing the parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"chronotva {RUN_COMMAND}",
+        description="Render every combination of palettes, views, sizes and formats listed in a TOML job file.",
+    )
+    parser.add_argument("job", type=str, help="Path of the TOML job file.")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of worker processes, overriding the job file.",
+    )
+    add_worker_limit_arguments(parser)
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="DIR",
+        help="Profile every task with cProfile, in whichever worker process renders it, and merge the .prof files in DIR into an aggregated report.",
+    )
+    parser.add_argument(
+        "--cost-model",
+        type=str,
+        metavar="PATH",
+        help="JSON file of recorded render timings and output sizes, overriding the job file. Tasks are scheduled and the runtime and size estimated from it, and the measurements of the run are added to it.",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="List every planned output and estimate the CPU time, the wall time for --jobs workers and the output size without rendering anything.",
+    )
+    mode.add_argument(
+        "--queue",
+        type=str,
+        metavar="DIR",
+        help=f"Add the tasks to the file queue in DIR instead of rendering them, for 'chronotva {WORKER_COMMAND}' processes on hosts sharing DIR and the output directory.",
+    )
+    return parser.parse_args(args)
+
+
+def parse_worker_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command-line arguments of 'chronotva worker'.
+
+    Args:
+        args: A list of strings representing the arguments after 'worker'.
+
+    Returns:
+        An argparse.Namespace object containing the parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"chronotva {WORKER_COMMAND}",
+        description=f"Render the tasks of a file queue filled by 'chronotva {RUN_COMMAND} JOB.toml --queue DIR' until it is drained. Workers on several hosts can share one queue.",
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        required=True,
+        metavar="DIR",
+        help="The queue directory, shared by all workers.",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        metavar="SECONDS",
+        help=f"Time after which the task of a worker that stopped renewing its lease, e.g. because its host died, is returned to the queue. Use the same value for all workers. Default: {DEFAULT_LEASE_SECONDS:g}",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Number of times a failed task is queued again before it is moved to the failed tasks. Default: 0",
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Time limit for every task. Needs SIGALRM, so it is rejected on Windows.",
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Keep waiting for new tasks once the queue is drained instead of exiting.",
+    )
+    return parser.parse_args(args)
+
+
+def add_worker_limit_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options that recycle worker processes to a parser.
+
+    Args:
+        parser: The argument parser.
+    """
+    parser.add_argument(
+        "--max-tasks-per-worker",
+        type=int,
+        metavar="N",
+        help="Replace every worker process by a fresh one after N tasks, keeping the memory of long runs bounded.",
+    )
+    parser.add_argument(
+        "--max-worker-memory",
+        type=int,
+        metavar="MIB",
+        help="Replace a worker process after a task that leaves its resident memory above MIB mebibytes.",
+    )
+
+
+def build_worker_limits(
+    args: argparse.Namespace, defaults: WorkerLimits = WorkerLimits()
+) -> WorkerLimits:
+    """Builds the worker limits from the command-line arguments.
+
+    Args:
+        args: An argparse.Namespace object containing the parsed arguments.
+        defaults: The limits used for options that are not given, e.g. from a
+            job file.
+
+    Returns:
+        The worker limits.
+
+    Raises:
+        ValueError: If a limit is not positive.
+    """
+    limits = WorkerLimits(
+        (
+            args.max_tasks_per_worker
+            if args.max_tasks_per_worker is not None
+            else defaults.max_tasks
+        ),
+        (
+            args.max_worker_memory
+            if args.max_worker_memory is not None
+            else defaults.max_memory
+        ),
+    )
+    if any(limit is not None and limit < 1 for limit in limits):
+        raise ValueError("Worker limits must be positive.")
+    return limits
+
+
 def parse_unfolding_ids(value: str) -> List[int]:
     """Parse a string of comma-separated unfolding IDs into a list of integers.
 
@@ -146,6 +499,52 @@ def parse_unfolding_ids(value: str) -> List[int]:
         )
 
 
+def parse_output_formats(value: str) -> List[str]:
+    """Parse a string of comma-separated output formats into a list.
+
+    Args:
+        value: A string containing comma-separated file formats, e.g. 'png,svg'.
+
+    Returns:
+        A list of unique output formats in the given order.
+
+    Raises:
+        argparse.ArgumentTypeError: If a format is not supported.
+    """
+    output_formats = list(
+        dict.fromkeys(item.strip().lower() for item in value.split(","))
+    )
+    for output_format in output_formats:
+        if output_format not in OUTPUT_FORMATS:
+            raise argparse.ArgumentTypeError(
+                f"Invalid output format: '{output_format}'. Options: {', '.join(OUTPUT_FORMATS)}."
+            )
+    return output_formats
+
+
+def parse_mesh_formats(value: str) -> List[str]:
+    """Parse a string of comma-separated mesh formats into a list.
+
+    Args:
+        value: A string containing comma-separated mesh formats, e.g. 'obj,glb'.
+
+    Returns:
+        A list of unique mesh formats in the given order.
+
+    Raises:
+        argparse.ArgumentTypeError: If a format is not supported.
+    """
+    mesh_formats = list(
+        dict.fromkeys(item.strip().lower() for item in value.split(","))
+    )
+    for mesh_format in mesh_formats:
+        if mesh_format not in MESH_FORMATS:
+            raise argparse.ArgumentTypeError(
+                f"Invalid mesh format: '{mesh_format}'. Options: {', '.join(MESH_FORMATS)}."
+            )
+    return mesh_formats
+
+
 def build_configuration(args: argparse.Namespace) -> PlotParameters:
     """Build the plot configuration from the parsed arguments.
 
@@ -158,6 +557,10 @@ def build_configuration(args: argparse.Namespace) -> PlotParameters:
     Raises:
         ValueError: If there are inconsistencies in the provided arguments.
     """
+    if args.resume and args.output_dir is None and args.archive is None:
+        # Without it, the run would get a fresh folder without a journal.
+        raise ValueError("--resume needs the --output-dir of the run to resume.")
+
     if (args.pixel_width is not None and args.pixel_height is None) or (
         args.pixel_width is None and args.pixel_height is not None
     ):
@@ -177,6 +580,9 @@ def build_configuration(args: argparse.Namespace) -> PlotParameters:
             "Both --inch-width and --inch-height must be provided together if one is provided."
         )
 
+    if args.svg_precision is not None and args.svg_precision < 0:
+        raise ValueError("The SVG precision must not be negative.")
+
     if args.pixel_width is not None and args.pixel_height is not None:
         width = args.pixel_width / args.dpi
         height = args.pixel_height / args.dpi
@@ -192,6 +598,11 @@ def build_configuration(args: argparse.Namespace) -> PlotParameters:
     block_colors = parse_rgba_list(args.block_color)
     edge_colors = parse_rgba_list(args.edge_color)
     view_angle = (args.elevation, args.azimuth)
+    extent = (
+        uniform_extent(select_unfoldings(data, args.unfolding_ids).values())
+        if args.uniform_scale
+        else None
+    )
 
     plot_params = PlotParameters(
         colors=block_colors,
@@ -204,11 +615,54 @@ def build_configuration(args: argparse.Namespace) -> PlotParameters:
         bbox_inches=bbox_inches,
         height=height,
         width=width,
+        extent=extent,
+        reproducible=args.reproducible,
+        svg_precision=args.svg_precision,
+        png_compression=args.png_compression,
+        png_colors=args.png_colors,
+        webp_quality=args.webp_quality,
     )
+    check_raster_options(plot_params)
 
     return plot_params
 
 
+def build_palettes(args: argparse.Namespace) -> Optional[List[Palette]]:
+    """Build the color palettes from the parsed arguments.
+
+    Args:
+        args: An argparse.Namespace object containing the parsed command-line arguments.
+
+    Returns:
+        A list of Palette objects, or None if no palettes were requested.
+
+    Raises:
+        ValueError: If a palette is invalid or two palettes share a name.
+    """
+    if not args.palettes:
+        return None
+
+    return parse_palettes(args.palettes, parse_rgba_list(args.edge_color))
+
+
+def select_unfoldings(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    unfolding_ids: Optional[List[int]] = None,
+) -> Dict[int, List[Tuple[int, int, int]]]:
+    """Select the unfoldings to plot.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        unfolding_ids: An optional list of unfolding IDs. Unknown IDs are ignored.
+
+    Returns:
+        The requested subset of the data, or all of it if no IDs are given.
+    """
+    if unfolding_ids is None:
+        return data
+    return {uid: data[uid] for uid in unfolding_ids if uid in data}
+
+
 def prepare_output_directory(args: argparse.Namespace) -> str:
     """Prepare the output directory for saving plots.
 
@@ -229,28 +683,292 @@ def perform_plotting(
     plot_params: PlotParameters,
     data: Dict[int, List[Tuple[int, int, int]]],
     output_folder: str,
-    output_format: str,
+    output_format: Union[str, List[str]],
     unfolding_ids: Optional[List[int]] = None,
+    profiler: Optional[RenderProfiler] = None,
+    metrics_path: Optional[str] = None,
+    palettes: Optional[List[Palette]] = None,
+    archive_path: Optional[str] = None,
+    output_template: Optional[str] = None,
+    shard_depth: Optional[int] = None,
+    engine: str = DEFAULT_ENGINE,
+    retries: int = 0,
+    task_timeout: Optional[float] = None,
+    resume: bool = False,
+    render_db: Optional[str] = None,
 ) -> None:
     """Perform the plotting of 3D blocks based on the provided data and parameters.
 
+    Every unfolding is rendered in isolation: a failing unfolding is retried and
+    then skipped, so the rest of the run continues, and the failures are listed
+    at the end. Without an archive, every finished unfolding is appended to a
+    journal in the output folder, so that an interrupted or partially failed run
+    can be resumed without rendering its finished outputs again. The journal is
+    removed once every unfolding has been rendered.
+
+    Every attempt renders the images of an unfolding into memory. Only once an
+    attempt succeeds are its images encoded and written to the output folder or
+    archive, on a background thread while the next unfolding is drawn, so that
+    failed attempts leave no outputs behind. An unfolding counts as finished once
+    its images are written; a failed encoding is not retried but fails the
+    unfolding, so that a resumed run renders it again.
+
     Args:
         plot_params: A PlotParameters object containing the plot configuration.
         data: A dictionary mapping unfolding IDs to lists of block coordinates.
         output_folder: The path to the directory where output images will be saved.
-        output_format: The file format for the output images.
+        output_format: The file format for the output images, or a list of formats.
+            Every unfolding is built once and saved in each format.
         unfolding_ids: An optional list of unfolding IDs to plot. If None, all unfoldings will be plotted.
+        profiler: An optional RenderProfiler that profiles every render separately.
+        metrics_path: An optional path of a Prometheus `.prom` file that receives the
+            render metrics, even if plotting fails.
+        palettes: An optional list of palettes. Every unfolding is rendered once per
+            palette, reusing its geometry, instead of with the colors of plot_params.
+        archive_path: An optional path of an archive that receives all images instead
+            of output_folder.
+        output_template: An optional template for the output names. See OutputNamer.
+        shard_depth: An optional number of hashed subdirectory levels. If None, the
+            outputs are only sharded when there are too many for one directory.
+        engine: The name of the render engine. See `create_engine`.
+        retries: The number of further attempts at an unfolding that failed.
+        task_timeout: An optional time limit in seconds for every attempt at an
+            unfolding. See `time_limit`.
+        resume: Whether to skip the unfoldings whose outputs the journal of an
+            earlier run in output_folder records as complete.
+        render_db: An optional path of a SQLite database that records every
+            output with its parameters, engine, content hash, size and render
+            time. See `RenderCatalogue`.
+
+    Raises:
+        ValueError: If the engine is unknown or cannot write an output format,
+            the retries or time limit are invalid, or resume is requested with
+            an archive.
+        RenderFailures: If any unfolding failed on every attempt.
     """
-    plotter = BlockPlotter()
-    if unfolding_ids is not None:
-        filtered_data = {uid: data[uid] for uid in unfolding_ids if uid in data}
+    if retries < 0:
+        raise ValueError("The number of retries must not be negative.")
+    check_time_limit(task_timeout)
+    if resume and archive_path is not None:
+        raise ValueError("An archive cannot be resumed; use an output directory.")
+    output_formats = (
+        [output_format] if isinstance(output_format, str) else output_format
+    )
+    plotter = create_engine(engine, scene_cache_size=1)
+    check_formats(plotter, output_formats)
+    metrics = RenderMetrics() if metrics_path is not None else None
+    filtered_data = select_unfoldings(data, unfolding_ids)
+    variants: List[Tuple[PlotParameters, Optional[str]]]
+    if palettes:
+        variants = [
+            (
+                plot_params._replace(
+                    colors=palette.colors, edgecolors=palette.edgecolors
+                ),
+                palette.name,
+            )
+            for palette in palettes
+        ]
     else:
-        filtered_data = data
-    for unfolding_id, coordinates in filtered_data.items():
-        output_filename = f"unfolding_{unfolding_id}.{output_format}"
-        output_path = os.path.join(output_folder, output_filename)
-        plotter.plot_3d_blocks(coordinates, plot_params, output_format, output_path)
-        logger.info(f"Saved '{output_path}'")
+        variants = [(plot_params, None)]
+    namer = OutputNamer(
+        output_template or (PALETTE_TEMPLATE if palettes else DEFAULT_TEMPLATE),
+        shard_depth,
+    )
+    output_names = namer.plan(
+        OutputKey(unfolding_id, plot_params.view_angle, palette_name, variant_format)
+        for unfolding_id in filtered_data
+        for _, palette_name in variants
+        for variant_format in output_formats
+    )
+    sink = (
+        ArchiveSink(archive_path, plot_params.reproducible)
+        if archive_path is not None
+        else DirectorySink(output_folder)
+    )
+    sink.prepare(output_names.values())
+    journal = (
+        RunJournal(os.path.join(output_folder, JOURNAL_NAME), resume)
+        if archive_path is None
+        else None
+    )
+    catalogue = RenderCatalogue(render_db) if render_db is not None else None
+    encoder = BackgroundEncoder()
+    failures: List[TaskFailure] = []
+    skipped = 0
+    # Unfoldings whose images may still be written, with their images and either
+    # the pending write or the failure of every attempt.
+    in_flight: Deque[
+        Tuple[
+            int,
+            List[str],
+            List[PendingImage],
+            Union["Future[List[Tuple[OutputRecord, float]]]", TaskFailure],
+        ]
+    ] = deque()
+
+    def finish_unfolding(
+        unfolding_id: int,
+        names: List[str],
+        images: List[PendingImage],
+        outcome: Union["Future[List[Tuple[OutputRecord, float]]]", TaskFailure],
+    ) -> None:
+        failure = outcome if isinstance(outcome, TaskFailure) else None
+        if not isinstance(outcome, TaskFailure):
+            try:
+                written = outcome.result()
+            except Exception as error:
+                if metrics is not None:
+                    for image in images:
+                        metrics.record_failure(image.output_format, plotter.name)
+                failure = TaskFailure(
+                    unfolding_id, 1, f"{type(error).__name__}: {error}"
+                )
+                logger.warning(
+                    f"Writing failed for unfolding {unfolding_id}. Error: {failure.error}"
+                )
+            else:
+                for image, (record, seconds) in zip(images, written):
+                    if metrics is not None:
+                        metrics.observe_render(
+                            image.output_format, plotter.name, seconds, record.size
+                        )
+                    logger.info(f"Saved '{record.location}'")
+                    if catalogue is not None:
+                        catalogue.add(
+                            unfolding_id,
+                            image.plot_params,
+                            image.output_format,
+                            plotter.name,
+                            record.location,
+                            record.sha256 or file_sha256(record.location),
+                            record.size,
+                            seconds,
+                        )
+        if failure is not None:
+            failures.append(failure)
+        if journal is not None:
+            if failure is None:
+                journal.record_done(unfolding_id, names)
+            else:
+                journal.record_failure(failure)
+
+    try:
+        for unfolding_id, coordinates in filtered_data.items():
+            unfolding_outputs = [
+                (
+                    variant_params,
+                    variant_format,
+                    output_names[
+                        OutputKey(
+                            unfolding_id,
+                            plot_params.view_angle,
+                            palette_name,
+                            variant_format,
+                        )
+                    ],
+                    palette_name,
+                )
+                for variant_params, palette_name in variants
+                for variant_format in output_formats
+            ]
+            names = [name for _, _, name, _ in unfolding_outputs]
+            if journal is not None and journal.is_done(names):
+                skipped += 1
+                continue
+            images: List[PendingImage] = []
+            # The raster formats of every variant share its pixels.
+            rasters = RasterCache()
+            # The format of the failing output of every failed attempt.
+            failed_formats: List[str] = []
+
+            def render_unfolding() -> None:
+                # Only the images of the last attempt are written.
+                images.clear()
+                for (
+                    variant_params,
+                    variant_format,
+                    name,
+                    palette_name,
+                ) in unfolding_outputs:
+                    try:
+                        images.append(
+                            render_image(
+                                plotter,
+                                coordinates,
+                                variant_params,
+                                variant_format,
+                                name,
+                                {
+                                    "unfolding_id": unfolding_id,
+                                    "format": variant_format,
+                                    "palette": palette_name,
+                                },
+                                rasters,
+                            )
+                        )
+                    except Exception:
+                        failed_formats.append(variant_format)
+                        raise
+
+            with optional_profile(profiler, f"unfolding_{unfolding_id}"):
+                failure = run_with_retries(
+                    render_unfolding, unfolding_id, retries, task_timeout, plotter.close
+                )
+            if metrics is not None:
+                # Only the last attempt decides whether an output failed.
+                retried = failed_formats[:-1] if failure is not None else failed_formats
+                for failed_format in retried:
+                    metrics.record_retry(failed_format, plotter.name)
+                if failure is not None and failed_formats:
+                    metrics.record_failure(failed_formats[-1], plotter.name)
+            in_flight.append(
+                (
+                    unfolding_id,
+                    names,
+                    images,
+                    (
+                        failure
+                        if failure is not None
+                        else encoder.submit(
+                            functools.partial(write_images, sink, list(images))
+                        )
+                    ),
+                )
+            )
+            # The images of the previous unfolding were written while this one was drawn.
+            while len(in_flight) > 1:
+                finish_unfolding(*in_flight.popleft())
+        while in_flight:
+            finish_unfolding(*in_flight.popleft())
+    finally:
+        encoder.close()
+        plotter.close()
+        sink.close()
+        if journal is not None:
+            journal.close()
+        if catalogue is not None:
+            catalogue.close()
+        if metrics is not None and metrics_path is not None:
+            metrics.record_cache(hit=True, count=plotter.cache_hits)
+            metrics.record_cache(hit=False, count=plotter.cache_misses)
+            metrics.write_textfile(metrics_path)
+    if skipped:
+        logger.info(f"Skipped {skipped} unfoldings completed by an earlier run")
+    if journal is not None and not failures:
+        # Nothing is left to resume.
+        os.remove(journal.path)
+    if failures:
+        logger.error(f"{len(failures)} of {len(filtered_data)} unfoldings failed:")
+        for failure in failures:
+            logger.error(
+                f"  Unfolding {failure.unfolding_id} after {failure.attempts} attempts: {failure.error}"
+            )
+        raise RenderFailures(
+            f"{len(failures)} unfoldings failed. Run again with --resume to retry them."
+            if journal is not None
+            else f"{len(failures)} unfoldings failed."
+        )
     if unfolding_ids:
         logger.info(
             f"Plotted unfoldings with IDs: {', '.join(map(str, unfolding_ids))}"
@@ -262,15 +980,90 @@ def perform_plotting(
 def main() -> None:
     """The main function for ChronoTVA."""
     try:
+        if sys.argv[1:2] == [RUN_COMMAND]:
+            run_args = parse_run_arguments(sys.argv[2:])
+            spec = load_job(run_args.job, data)
+            spec = spec._replace(
+                limits=build_worker_limits(run_args, spec.limits),
+                cost_model=run_args.cost_model or spec.cost_model,
+            )
+            if run_args.dry_run:
+                dry_run_job(spec, data, run_args.jobs)
+            elif run_args.queue:
+                enqueue_job(spec, data, run_args.queue)
+            else:
+                with profile_run(run_args.profile) as profiler:
+                    run_job(spec, data, run_args.jobs, profiler)
+            return
+        if sys.argv[1:2] == [WORKER_COMMAND]:
+            worker_args = parse_worker_arguments(sys.argv[2:])
+            run_worker(
+                worker_args.queue,
+                data,
+                worker_args.lease_seconds,
+                worker_args.retries,
+                worker_args.task_timeout,
+                worker_args.wait,
+            )
+            return
         args = parse_arguments()
         plot_params = build_configuration(args)
-        output_folder = prepare_output_directory(args)
-        perform_plotting(
-            plot_params, data, output_folder, args.output_format, args.unfolding_ids
-        )
+        palettes = build_palettes(args)
+        if args.output_template is not None:
+            validate_template(args.output_template)
+        if args.viewer:
+            export_viewer(data, args.viewer, plot_params, args.unfolding_ids)
+            return
+        if args.mesh:
+            export_meshes(
+                data,
+                args.mesh,
+                args.unfolding_ids,
+                args.mesh_format,
+                args.mesh_catalogue,
+            )
+            return
+        if args.dataset:
+            with profile_run(args.profile) as profiler:
+                export_dataset(
+                    data,
+                    plot_params,
+                    args.dataset,
+                    args.unfolding_ids,
+                    args.dataset_views,
+                    palettes,
+                    args.jobs,
+                    args.seed,
+                    build_worker_limits(args),
+                    profiler,
+                )
+            return
+        output_folder = "" if args.archive else prepare_output_directory(args)
+        with profile_run(args.profile) as profiler:
+            perform_plotting(
+                plot_params,
+                data,
+                output_folder,
+                args.output_format,
+                args.unfolding_ids,
+                profiler,
+                args.metrics_file,
+                palettes,
+                args.archive,
+                args.output_template,
+                args.shard_depth,
+                args.engine,
+                args.retries,
+                args.task_timeout,
+                args.resume,
+                args.render_db,
+            )
     except ValueError as e:
         logger.error(f"Configuration Error: {e}")
         sys.exit(2)
+    except RenderFailures as e:
+        logger.error(str(e))
+        sys.exit(1)
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
         sys.exit(1)
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COST_MODEL_VERSION = 2
+
+
+def output_keys(
+    engine: str,
+    unfolding_id: int,
+    output_format: str,
+    dpi: int,
+    size: Tuple[int, int],
+) -> List[str]:
+    """Returns the keys of an output's measurements, the most specific first.
+
+    Args:
+        engine: The name of the render engine.
+        unfolding_id: The ID of the unfolding.
+        output_format: The file format of the output.
+        dpi: The resolution of the output.
+        size: The (width, height) of the output in pixels.
+
+    Returns:
+        The key of the unfolding and the key shared by all unfoldings.
+    """
+    shared = f"{engine}/{output_format}/{dpi}/{size[0]}x{size[1]}"
+    return [f"{shared}/{unfolding_id}", shared]
+
+
+class CostModel:
+    """Expected render times and sizes of outputs, learned from measurements.
+
+    Render times and output sizes are kept as running means per engine,
+    unfolding, output format, DPI and pixel size, and per engine, format, DPI
+    and pixel size over all unfoldings, which is used for unfoldings that have
+    not been measured yet. The model is stored as a JSON file, so that every
+    run refines the estimates of the next.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Initializes the model, loading the measurements stored at the path.
+
+        A missing or unreadable file starts an empty model.
+
+        Args:
+            path: An optional JSON file the measurements are read from and
+                saved to.
+        """
+        self.path = path
+        self.means: Dict[str, Tuple[int, float]] = {}
+        self.sizes: Dict[str, Tuple[int, float]] = {}
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path) as model_file:
+                stored = json.load(model_file)
+            if stored.get("version") != COST_MODEL_VERSION:
+                raise ValueError(f"unsupported version {stored.get('version')}")
+            self.means = {
+                key: (int(count), float(mean))
+                for key, (count, mean) in stored["timings"].items()
+            }
+            self.sizes = {
+                key: (int(count), float(mean))
+                for key, (count, mean) in stored["sizes"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+            logger.warning(f"Ignoring the cost model '{path}'. Error: {error}")
+            self.means = {}
+            self.sizes = {}
+
+    def estimate(self, keys: List[str], default: float) -> float:
+        """Returns the expected render time of an output.
+
+        Args:
+            keys: The keys of the output. See `output_keys`.
+            default: The time assumed if no similar output has been timed.
+
+        Returns:
+            The expected time in seconds.
+        """
+        return next((self.means[key][1] for key in keys if key in self.means), default)
+
+    def estimate_size(self, keys: List[str], default: float) -> float:
+        """Returns the expected size of an output.
+
+        Args:
+            keys: The keys of the output. See `output_keys`.
+            default: The size assumed if no similar output has been measured.
+
+        Returns:
+            The expected size in bytes.
+        """
+        return next((self.sizes[key][1] for key in keys if key in self.sizes), default)
+
+    def record(self, keys: List[str], seconds: float, size: int) -> None:
+        """Adds the measured render time and size of an output to the model.
+
+        Args:
+            keys: The keys of the output. See `output_keys`.
+            seconds: The measured time.
+            size: The size of the output in bytes.
+        """
+        for table, value in ((self.means, seconds), (self.sizes, float(size))):
+            for key in keys:
+                count, mean = table.get(key, (0, 0.0))
+                table[key] = (count + 1, mean + (value - mean) / (count + 1))
+
+    def save(self) -> None:
+        """Writes the model to its file, replacing the previous one atomically."""
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial = f"{self.path}.partial"
+        with open(partial, "w") as model_file:
+            json.dump(
+                {
+                    "version": COST_MODEL_VERSION,
+                    "timings": {
+                        key: [count, round(mean, 6)]
+                        for key, (count, mean) in sorted(self.means.items())
+                    },
+                    "sizes": {
+                        key: [count, round(mean, 1)]
+                        for key, (count, mean) in sorted(self.sizes.items())
+                    },
+                },
+                model_file,
+                indent=1,
+            )
+        os.replace(partial, self.path)
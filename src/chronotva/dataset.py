@@ -0,0 +1,276 @@
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple, cast
+
+import numpy as np
+
+from .engines import process_engine, warm_engine
+from .profiling import RenderProfiler, optional_profile
+from .shared import WorkerLimits, map_shared
+from .tesseract import BlockPlotter, Palette, PlotParameters, raster_size
+
+logger = logging.getLogger(__name__)
+
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+VIEWS_FILE = "views.npy"
+PALETTES_FILE = "palettes.npy"
+METADATA_FILE = "metadata.json"
+# Datasets are rendered to pixel arrays with BlockPlotter.render_rgba.
+DATASET_ENGINE = "matplotlib"
+
+
+class DatasetSample(NamedTuple):
+    """A single image of the dataset.
+
+    Attributes:
+        position: The position of the image in the dataset arrays.
+        unfolding_id: The ID of the rendered unfolding, used as its label.
+        view_angle: The elevation and azimuth angles of the view.
+        palette_index: The index of the palette, or 0 if no palettes are used.
+    """
+
+    position: int
+    unfolding_id: int
+    view_angle: Tuple[float, float]
+    palette_index: int
+
+
+class DatasetChunk(NamedTuple):
+    """The samples of one unfolding, rendered together by one worker.
+
+    Attributes:
+        images_path: The path of the memory-mapped images array.
+        unfolding_id: The ID of the rendered unfolding.
+        samples: The samples to render.
+        plot_params: A PlotParameters object containing the plot configuration.
+        palettes: The palettes referenced by the samples, if any.
+    """
+
+    images_path: str
+    unfolding_id: int
+    samples: List[DatasetSample]
+    plot_params: PlotParameters
+    palettes: Optional[List[Palette]]
+
+
+def plan_samples(
+    unfolding_ids: List[int],
+    view_angle: Tuple[float, float],
+    views_per_unfolding: int = 1,
+    palette_count: int = 0,
+    seed: int = 0,
+) -> List[DatasetSample]:
+    """Plans the images of the dataset.
+
+    Every unfolding is rendered from each of its views in each palette. Samples
+    sharing an unfolding and view are adjacent, so they reuse one built scene.
+
+    Args:
+        unfolding_ids: The IDs of the unfoldings to render.
+        view_angle: The view used if only one view per unfolding is requested.
+        views_per_unfolding: The number of views per unfolding. With more than one,
+            every view is drawn at random from all elevations and azimuths.
+        palette_count: The number of palettes, or 0 to use the plot's colors.
+        seed: The seed for the random views.
+
+    Returns:
+        The samples in dataset order.
+    """
+    rng = random.Random(seed)
+    samples: List[DatasetSample] = []
+    for unfolding_id in unfolding_ids:
+        for _ in range(views_per_unfolding):
+            view = (
+                view_angle
+                if views_per_unfolding == 1
+                else (rng.uniform(-90, 90), rng.uniform(-180, 180))
+            )
+            for palette_index in range(max(palette_count, 1)):
+                samples.append(
+                    DatasetSample(len(samples), unfolding_id, view, palette_index)
+                )
+    return samples
+
+
+def render_chunk(
+    chunk: DatasetChunk, data: Mapping[int, List[Tuple[int, int, int]]]
+) -> Tuple[int, int]:
+    """Renders the samples of a chunk into their slices of the images array.
+
+    The array is opened memory-mapped, so workers write their pixels in place.
+
+    Args:
+        chunk: The chunk to render.
+        data: A mapping of unfolding IDs to lists of block coordinates.
+
+    Returns:
+        The unfolding ID and the number of rendered samples.
+    """
+    coordinates = data[chunk.unfolding_id]
+    images = np.load(chunk.images_path, mmap_mode="r+")
+    plotter = cast(BlockPlotter, process_engine(DATASET_ENGINE))
+    try:
+        for sample in chunk.samples:
+            plot_params = chunk.plot_params._replace(view_angle=sample.view_angle)
+            if chunk.palettes:
+                palette = chunk.palettes[sample.palette_index]
+                plot_params = plot_params._replace(
+                    colors=palette.colors, edgecolors=palette.edgecolors
+                )
+            plotter.render_rgba(coordinates, plot_params, out=images[sample.position])
+    finally:
+        plotter.close()
+        images.flush()
+    return chunk.unfolding_id, len(chunk.samples)
+
+
+def export_dataset(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    plot_params: PlotParameters,
+    output_dir: str,
+    unfolding_ids: Optional[List[int]] = None,
+    views_per_unfolding: int = 1,
+    palettes: Optional[List[Palette]] = None,
+    jobs: int = 1,
+    seed: int = 0,
+    limits: WorkerLimits = WorkerLimits(),
+    profiler: Optional[RenderProfiler] = None,
+) -> str:
+    """Renders unfoldings into a memory-mapped uint8 image dataset.
+
+    The output directory receives 'images.npy' of shape (N, height, width, 4),
+    'labels.npy' with the unfolding ID of every image, 'views.npy' with its
+    elevation and azimuth, 'palettes.npy' with its palette index and
+    'metadata.json' describing the dataset.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        plot_params: A PlotParameters object containing the plot configuration.
+        output_dir: The directory receiving the dataset files.
+        unfolding_ids: An optional list of unfolding IDs. If None, all unfoldings are used.
+        views_per_unfolding: The number of views rendered per unfolding.
+        palettes: An optional list of palettes, each rendered for every view.
+        jobs: The number of worker processes.
+        seed: The seed for the random views.
+        limits: The limits after which worker processes are replaced.
+        profiler: An optional RenderProfiler that profiles every chunk.
+
+    Returns:
+        The path of the images array.
+
+    Raises:
+        ValueError: If the number of views or jobs is not positive, or no unfolding
+            is selected.
+    """
+    if views_per_unfolding < 1:
+        raise ValueError("The number of views per unfolding must be positive.")
+    if jobs < 1:
+        raise ValueError("The number of jobs must be positive.")
+
+    selected_ids = [
+        uid
+        for uid in dict.fromkeys(unfolding_ids if unfolding_ids is not None else data)
+        if uid in data
+    ]
+    if not selected_ids:
+        raise ValueError("No unfoldings selected for the dataset.")
+    samples = plan_samples(
+        selected_ids,
+        plot_params.view_angle,
+        views_per_unfolding,
+        len(palettes) if palettes else 0,
+        seed,
+    )
+    height, width = raster_size(plot_params)
+
+    os.makedirs(output_dir, exist_ok=True)
+    images_path = os.path.join(output_dir, IMAGES_FILE)
+    images = np.lib.format.open_memmap(
+        images_path, mode="w+", dtype=np.uint8, shape=(len(samples), height, width, 4)
+    )
+    del images
+    np.save(
+        os.path.join(output_dir, LABELS_FILE),
+        np.array([sample.unfolding_id for sample in samples], dtype=np.int32),
+    )
+    np.save(
+        os.path.join(output_dir, VIEWS_FILE),
+        np.array([sample.view_angle for sample in samples], dtype=np.float32).reshape(
+            -1, 2
+        ),
+    )
+    np.save(
+        os.path.join(output_dir, PALETTES_FILE),
+        np.array([sample.palette_index for sample in samples], dtype=np.int16),
+    )
+    with open(os.path.join(output_dir, METADATA_FILE), "w") as metadata:
+        json.dump(
+            {
+                "shape": [len(samples), height, width, 4],
+                "unfolding_ids": selected_ids,
+                "views_per_unfolding": views_per_unfolding,
+                "palettes": [palette.name for palette in palettes or []],
+                "dpi": plot_params.dpi,
+                "seed": seed,
+            },
+            metadata,
+            indent=2,
+        )
+
+    chunks = [
+        DatasetChunk(images_path, unfolding_id, list(group), plot_params, palettes)
+        for unfolding_id, group in itertools.groupby(
+            samples, key=lambda sample: sample.unfolding_id
+        )
+    ]
+    for unfolding_id, count in run_chunks(chunks, data, jobs, limits, profiler):
+        logger.info(f"Rendered {count} images of unfolding {unfolding_id}")
+
+    logger.info(f"Saved dataset of {len(samples)} images to '{output_dir}'")
+    return images_path
+
+
+def run_chunks(
+    chunks: List[DatasetChunk],
+    data: Mapping[int, List[Tuple[int, int, int]]],
+    jobs: int,
+    limits: WorkerLimits = WorkerLimits(),
+    profiler: Optional[RenderProfiler] = None,
+) -> Iterator[Tuple[int, int]]:
+    """Renders chunks in this process or in a pool of worker processes.
+
+    Every worker warms up its plotter once when it starts and reads the
+    coordinates from a shared catalogue, see `map_shared`.
+
+    Args:
+        chunks: The chunks to render.
+        data: A mapping of unfolding IDs to lists of block coordinates.
+        jobs: The number of worker processes. With 1, chunks render in this process.
+        limits: The limits after which worker processes are replaced.
+        profiler: An optional RenderProfiler that profiles every chunk separately,
+            in whichever process renders it.
+
+    Yields:
+        The unfolding ID and number of samples of every finished chunk.
+    """
+    if jobs == 1 or len(chunks) <= 1:
+        for position, chunk in enumerate(chunks):
+            with optional_profile(profiler, f"task_{position}"):
+                result = render_chunk(chunk, data)
+            yield result
+        return
+    for _, result in map_shared(
+        render_chunk,
+        chunks,
+        {chunk.unfolding_id: data[chunk.unfolding_id] for chunk in chunks},
+        jobs,
+        functools.partial(warm_engine, DATASET_ENGINE, ["png"]),
+        limits,
+        profiler,
+    ):
+        yield result
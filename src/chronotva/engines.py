@@ -0,0 +1,219 @@
+import importlib
+import importlib.metadata
+import io
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Protocol,
+    Tuple,
+    Union,
+)
+
+from .tesseract import PlotParameters
+
+ENTRY_POINT_GROUP = "chronotva.engines"
+DEFAULT_ENGINE = "matplotlib"
+
+# Built-in engines are imported only when they are created, so that choosing an
+# engine never pays for importing the others.
+BUILTIN_ENGINES: Dict[str, Tuple[str, str]] = {
+    "matplotlib": (".tesseract", "BlockPlotter"),
+    "native-raster": (".native", "RasterEngine"),
+    "native-vector": (".native", "VectorEngine"),
+}
+
+
+class RenderEngine(Protocol):
+    """The interface every render engine implements.
+
+    A render runs in three stages: `prepare` builds the colorless scene of an
+    unfolding's geometry and view, `draw` applies the colors of the plot and
+    `encode` writes the result in an output format. `plot_3d_blocks` runs all
+    three stages for one output. Engines may cache prepared scenes, so that
+    rendering the same geometry in other colors or formats only repeats the
+    later stages.
+
+    Attributes:
+        name: The name of the engine, used by --engine and in metrics.
+        formats: The output formats the engine can encode.
+        cache_hits: The number of scenes served from the scene cache.
+        cache_misses: The number of scenes that had to be prepared.
+    """
+
+    name: str
+    formats: Tuple[str, ...]
+    cache_hits: int
+    cache_misses: int
+
+    def prepare(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> Any: ...
+
+    def draw(self, scene: Any, plot_params: PlotParameters) -> Any: ...
+
+    def encode(
+        self,
+        drawing: Any,
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None: ...
+
+    def plot_3d_blocks(
+        self,
+        coordinates: List[Tuple[int, int, int]],
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None: ...
+
+    def close(self) -> None: ...
+
+
+EngineFactory = Callable[..., RenderEngine]
+
+registered_engines: Dict[str, EngineFactory] = {}
+# The engines of this process, see `process_engine`.
+process_engines: Dict[str, RenderEngine] = {}
+
+
+def register_engine(name: str, factory: EngineFactory) -> None:
+    """Registers a render engine under a name.
+
+    Engines of installed packages can instead be registered as entry points of
+    the 'chronotva.engines' group, which are only loaded when they are used.
+
+    Args:
+        name: The name of the engine.
+        factory: A callable returning a new engine. It receives the keyword
+            argument scene_cache_size.
+    """
+    registered_engines[name] = factory
+
+
+def entry_points() -> Dict[str, Any]:
+    """Returns the engine entry points of installed packages without loading them.
+
+    Returns:
+        A dictionary mapping engine names to their entry points.
+    """
+    found = importlib.metadata.entry_points()
+    if hasattr(found, "select"):
+        group = found.select(group=ENTRY_POINT_GROUP)
+    else:  # Python 3.9
+        group = found.get(ENTRY_POINT_GROUP, [])  # type: ignore
+    return {entry_point.name: entry_point for entry_point in group}
+
+
+def engine_names() -> List[str]:
+    """Returns the names of all available engines.
+
+    Returns:
+        The built-in, registered and entry point engines.
+    """
+    return list(dict.fromkeys([*BUILTIN_ENGINES, *registered_engines, *entry_points()]))
+
+
+def create_engine(
+    name: str = DEFAULT_ENGINE, scene_cache_size: int = 0
+) -> RenderEngine:
+    """Creates a render engine by name.
+
+    Registered engines take precedence over built-in ones. Entry points are only
+    searched if no other engine has the name.
+
+    Args:
+        name: The name of the engine.
+        scene_cache_size: The number of prepared scenes the engine keeps for reuse.
+
+    Returns:
+        The new engine.
+
+    Raises:
+        ValueError: If no engine has the name.
+    """
+    factory: EngineFactory
+    if name in registered_engines:
+        factory = registered_engines[name]
+    elif name in BUILTIN_ENGINES:
+        module_name, attribute = BUILTIN_ENGINES[name]
+        factory = getattr(importlib.import_module(module_name, __package__), attribute)
+    else:
+        entry_point = entry_points().get(name)
+        if entry_point is None:
+            raise ValueError(
+                f"Unknown engine: '{name}'. Options: {', '.join(engine_names())}."
+            )
+        factory = entry_point.load()
+    return factory(scene_cache_size=scene_cache_size)
+
+
+def check_formats(engine: RenderEngine, output_formats: List[str]) -> None:
+    """Checks that an engine can encode all requested output formats.
+
+    Args:
+        engine: The render engine.
+        output_formats: The requested output formats.
+
+    Raises:
+        ValueError: If the engine does not support one of the formats.
+    """
+    for output_format in output_formats:
+        if output_format not in engine.formats:
+            raise ValueError(
+                f"The '{engine.name}' engine cannot write {output_format}. Options: {', '.join(engine.formats)}."
+            )
+
+
+def process_engine(name: str = DEFAULT_ENGINE) -> RenderEngine:
+    """Returns the engine of this process with the given name, creating it once.
+
+    Pool workers render all their tasks with one engine, so that its imports,
+    fonts and other setup are paid once per process. The engine keeps one
+    prepared scene; call its `close` after a task to drop it.
+
+    Args:
+        name: The name of the engine.
+
+    Returns:
+        The engine.
+
+    Raises:
+        ValueError: If no engine has the name.
+    """
+    engine = process_engines.get(name)
+    if engine is None:
+        engine = process_engines[name] = create_engine(name, scene_cache_size=1)
+    return engine
+
+
+def warm_engine(name: str, output_formats: Iterable[str]) -> None:
+    """Prepares the engine of this process by rendering a single block once.
+
+    Used as pool initializer, so that the first task of every worker does not
+    pay for importing backends, loading fonts and building figure machinery.
+
+    Args:
+        name: The name of the engine.
+        output_formats: The output formats to warm up.
+    """
+    engine = process_engine(name)
+    plot_params = PlotParameters(
+        colors=[(1, 1, 1, 1)],
+        edgecolors=[(0, 0, 0, 1)],
+        view_angle=(30, 22.5),
+        dpi=10,
+        transparent=True,
+        shade=True,
+        show_axes=False,
+        bbox_inches="tight",
+        height=1.0,
+        width=1.0,
+    )
+    for output_format in output_formats:
+        engine.plot_3d_blocks([(0, 0, 0)], plot_params, output_format, io.BytesIO())
+    engine.close()
@@ -0,0 +1,310 @@
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, cast
+
+import numpy as np
+
+Extent = Tuple[float, float, float]
+Bounds = Tuple[Tuple[float, float], Tuple[float, float], Tuple[float, float]]
+
+UNIT_CUBE_CORNERS = np.array(
+    [(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=float
+)
+
+# The faces of a unit cube in the order used by mplot3d's bar3d: bottom, top,
+# front (-y), back (+y), left (-x) and right (+x). Every face lists its corners
+# counter-clockwise as seen from outside the cube.
+UNIT_CUBE_FACES = np.array(
+    [
+        [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)],
+        [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)],
+        [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)],
+        [(0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0)],
+        [(0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)],
+        [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)],
+    ],
+    dtype=float,
+)
+UNIT_CUBE_NORMALS = np.array(
+    [(0, 0, -1), (0, 0, 1), (0, -1, 0), (0, 1, 0), (-1, 0, 0), (1, 0, 0)],
+    dtype=float,
+)
+
+
+class Faces(NamedTuple):
+    """Quadrilateral faces of unit cubes.
+
+    Attributes:
+        vertices: An array of shape (F, 4, 3) with the corners of every face,
+            counter-clockwise as seen from outside.
+        normals: An array of shape (F, 3) with the outward unit normal of every face.
+        blocks: An array of shape (F,) with the index of the cube of every face.
+    """
+
+    vertices: np.ndarray
+    normals: np.ndarray
+    blocks: np.ndarray
+
+
+def cube_faces(coordinates: List[Tuple[int, int, int]]) -> Faces:
+    """Returns all six faces of unit cubes placed at the given coordinates.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+
+    Returns:
+        The faces, six per cube in cube order.
+    """
+    origins = np.asarray(coordinates, dtype=float).reshape(-1, 1, 1, 3)
+    count = origins.shape[0]
+    return Faces(
+        vertices=(origins + UNIT_CUBE_FACES).reshape(-1, 4, 3),
+        normals=np.tile(UNIT_CUBE_NORMALS, (count, 1)),
+        blocks=np.repeat(np.arange(count), len(UNIT_CUBE_FACES)),
+    )
+
+
+def exposed_faces(coordinates: List[Tuple[int, int, int]]) -> Faces:
+    """Returns the faces of unit cubes that are not glued to a neighbouring cube.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+
+    Returns:
+        The outer faces, in cube order.
+    """
+    faces = cube_faces(coordinates)
+    origins = np.asarray(coordinates, dtype=np.int64).reshape(-1, 3)
+    lower = origins.min(axis=0) - 1
+    span = origins.max(axis=0) - lower + 2
+
+    def encode(points: np.ndarray) -> np.ndarray:
+        shifted = points - lower
+        codes: np.ndarray = (shifted[:, 0] * span[1] + shifted[:, 1]) * span[
+            2
+        ] + shifted[:, 2]
+        return codes
+
+    neighbours = origins[faces.blocks] + faces.normals.astype(np.int64)
+    exposed = ~np.isin(encode(neighbours), encode(origins))
+    return Faces(faces.vertices[exposed], faces.normals[exposed], faces.blocks[exposed])
+
+
+def coplanar_rectangles(
+    faces: Faces, groups: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Combines adjacent unit faces that lie in one plane into rectangles.
+
+    The faces of every plane are greedily combined into maximal rectangles,
+    growing each rectangle along the first in-plane axis and then the second.
+
+    Args:
+        faces: Unit faces, e.g. from `exposed_faces`.
+        groups: An optional array of shape (F,) with a group of every face.
+            Only faces of the same group are combined.
+
+    Returns:
+        An array of shape (R, 4, 3) with the corners of the rectangles,
+        counter-clockwise as seen from outside, and an array of shape (F,) with
+        the index of the rectangle every face belongs to.
+    """
+    axes = np.abs(faces.normals).argmax(axis=1).tolist()
+    lower = faces.vertices.min(axis=1).tolist()
+    directions = faces.normals.sum(axis=1).tolist()
+    group_list = [0] * len(axes) if groups is None else groups.tolist()
+    # The cells of every plane are keyed by (v, u), so that sorting them visits
+    # the plane row by row.
+    planes: Dict[Tuple[int, float, float, int], Dict[Tuple[float, float], int]] = {}
+    for index, (axis, direction, corner, group) in enumerate(
+        zip(axes, directions, lower, group_list)
+    ):
+        cells = planes.setdefault((axis, direction, corner[axis], group), {})
+        cells[(corner[(axis + 2) % 3], corner[(axis + 1) % 3])] = index
+
+    vertices: List[List[List[float]]] = []
+    members = np.zeros(len(axes), dtype=np.int64)
+    for (axis, direction, plane, _), cells in planes.items():
+        u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+        for v, u in sorted(cells):
+            if (v, u) not in cells:
+                continue
+            width = 1
+            while (v, u + width) in cells:
+                width += 1
+            height = 1
+            while all((v + height, u + i) in cells for i in range(width)):
+                height += 1
+            for j in range(height):
+                for i in range(width):
+                    members[cells.pop((v + j, u + i))] = len(vertices)
+
+            outline = [(u, v), (u + width, v), (u + width, v + height), (u, v + height)]
+            if direction < 0:
+                outline = outline[:1] + outline[:0:-1]
+            rectangle = []
+            for corner_u, corner_v in outline:
+                point = [0.0, 0.0, 0.0]
+                point[axis], point[u_axis], point[v_axis] = plane, corner_u, corner_v
+                rectangle.append(point)
+            vertices.append(rectangle)
+
+    return np.array(vertices, dtype=float).reshape(-1, 4, 3), members
+
+
+def merge_coplanar_faces(faces: Faces, groups: Optional[np.ndarray] = None) -> Faces:
+    """Merges adjacent unit faces that lie in one plane and face the same way.
+
+    Args:
+        faces: Unit faces, e.g. from `exposed_faces`.
+        groups: An optional array of shape (F,) with a group of every face.
+            Only faces of the same group are merged.
+
+    Returns:
+        The rectangles from `coplanar_rectangles` as faces. Every rectangle keeps
+        the cube index of its first unit face.
+    """
+    vertices, members = coplanar_rectangles(faces, groups)
+    firsts = np.unique(members, return_index=True)[1]
+    return Faces(
+        vertices=vertices,
+        normals=faces.normals[firsts],
+        blocks=faces.blocks[firsts],
+    )
+
+
+def unique_edges(faces: Faces) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns every edge of a set of faces once.
+
+    Edges shared by several faces, such as the seam between two neighbouring
+    cubes, are only returned for the first face that has them.
+
+    Args:
+        faces: Faces, e.g. from `exposed_faces`.
+
+    Returns:
+        An array of shape (E, 2, 3) with the end points of the edges, in the
+        order of the faces and of their outlines, and an array of shape (E,)
+        with the index of the first face of every edge.
+    """
+    corners = faces.vertices.shape[1]
+    starts = faces.vertices.reshape(-1, 3)
+    ends = np.roll(faces.vertices, -1, axis=1).reshape(-1, 3)
+    points, inverse = np.unique(
+        np.concatenate([starts, ends]), axis=0, return_inverse=True
+    )
+    start_ids, end_ids = inverse.reshape(2, -1)
+    codes = np.minimum(start_ids, end_ids) * len(points) + np.maximum(
+        start_ids, end_ids
+    )
+    firsts = np.sort(np.unique(codes, return_index=True)[1])
+    return np.stack([starts[firsts], ends[firsts]], axis=1), firsts // corners
+
+
+def cube_vertices(coordinates: List[Tuple[int, int, int]]) -> np.ndarray:
+    """Returns the corner vertices of unit cubes placed at the given coordinates.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+
+    Returns:
+        An array of shape (8 * len(coordinates), 3) with every cube corner.
+    """
+    origins = np.asarray(coordinates, dtype=float).reshape(-1, 1, 3)
+    vertices: np.ndarray = (origins + UNIT_CUBE_CORNERS).reshape(-1, 3)
+    return vertices
+
+
+def grid_offsets(lower: np.ndarray, upper: np.ndarray, gap: float) -> np.ndarray:
+    """Places boxes side by side on a square grid in the x-y plane.
+
+    Every grid cell is as wide as the widest box plus the gap, and every box is
+    moved so that its minimum corner lies at the corner of its cell, at z = 0.
+
+    Args:
+        lower: An array of shape (N, 3) with the minimum corner of every box.
+        upper: An array of shape (N, 3) with the maximum corner of every box.
+        gap: The space between neighbouring cells.
+
+    Returns:
+        An array of shape (N, 3) with the translation of every box, filling the
+        grid row by row.
+    """
+    if len(lower) == 0:
+        return np.zeros((0, 3))
+    spacing = float((upper - lower)[:, :2].max()) + gap
+    columns = math.ceil(math.sqrt(len(lower)))
+    rows, cells = np.divmod(np.arange(len(lower)), columns)
+    corners = np.stack([cells * spacing, rows * spacing, np.zeros(len(lower))], axis=1)
+    offsets: np.ndarray = corners - lower
+    return offsets
+
+
+def coordinate_bounds(
+    coordinates: List[Tuple[int, int, int]],
+) -> Bounds:
+    """Computes the axis-aligned bounds of unit cubes placed at the given coordinates.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+
+    Returns:
+        A (lower, upper) pair for each of the x, y and z axes.
+    """
+    origins = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    lower = origins.min(axis=0)
+    upper = origins.max(axis=0) + 1
+    return cast(
+        Bounds, tuple((float(low), float(high)) for low, high in zip(lower, upper))
+    )
+
+
+def uniform_extent(
+    coordinate_sets: Iterable[List[Tuple[int, int, int]]],
+) -> Optional[Extent]:
+    """Computes the largest span along each axis over several sets of cubes.
+
+    Args:
+        coordinate_sets: An iterable of coordinate lists, e.g. the selected unfoldings.
+
+    Returns:
+        The largest (x, y, z) span, or None if no coordinates are given.
+    """
+    spans = [
+        [upper - lower for lower, upper in coordinate_bounds(coordinates)]
+        for coordinates in coordinate_sets
+        if coordinates
+    ]
+    if not spans:
+        return None
+    x_span, y_span, z_span = np.max(spans, axis=0)
+    return float(x_span), float(y_span), float(z_span)
+
+
+def centered_bounds(
+    coordinates: List[Tuple[int, int, int]], extent: Optional[Extent] = None
+) -> Bounds:
+    """Computes axis bounds for the given cubes, optionally with a fixed extent.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+        extent: An optional (x, y, z) span shared by several plots. The bounds are
+            centered on the cubes and widened to this span. If None, the bounds fit
+            the cubes exactly.
+
+    Returns:
+        A (lower, upper) pair for each of the x, y and z axes.
+    """
+    bounds = coordinate_bounds(coordinates)
+    if extent is None:
+        return bounds
+    return cast(
+        Bounds,
+        tuple(
+            ((lower + upper - span) / 2, (lower + upper + span) / 2)
+            for (lower, upper), span in zip(bounds, extent)
+        ),
+    )
@@ -0,0 +1,218 @@
+import contextlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, Iterator, List, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+class TaskTimeout(Exception):
+    """Raised when a task runs longer than its time limit."""
+
+
+class RenderFailures(RuntimeError):
+    """Raised at the end of a run in which some tasks failed on every attempt."""
+
+
+class TaskFailure(NamedTuple):
+    """A task that failed on every attempt.
+
+    Attributes:
+        unfolding_id: The ID of the unfolding the task rendered.
+        attempts: The number of attempts made.
+        error: A description of the last error.
+    """
+
+    unfolding_id: int
+    attempts: int
+    error: str
+
+
+class RunJournal:
+    """An append-only record of the finished tasks of a run.
+
+    Every finished or failed task is appended as one JSON line and flushed to
+    disk at once, so the journal survives an interrupted run and tells a
+    resumed run which outputs are already complete.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        """Opens the journal.
+
+        Args:
+            path: The path of the journal file.
+            resume: Whether to keep the entries of an earlier run and append to
+                them. Otherwise the journal starts empty.
+        """
+        self.path = path
+        self.completed: Set[str] = set()
+        if resume and os.path.exists(path):
+            with open(path) as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line of an interrupted run may be cut short.
+                        continue
+                    if entry.get("event") == "done":
+                        self.completed.update(entry.get("outputs", []))
+        self.file = open(path, "a" if resume else "w")
+
+    def is_done(self, outputs: List[str]) -> bool:
+        """Returns whether outputs were all completed by an earlier run.
+
+        Args:
+            outputs: The names of the outputs.
+
+        Returns:
+            True if every output is recorded as complete.
+        """
+        return bool(outputs) and self.completed.issuperset(outputs)
+
+    def append(self, event: str, unfolding_id: int, **fields: object) -> None:
+        """Appends an entry and flushes it to disk.
+
+        Args:
+            event: The kind of entry, 'done' or 'failed'.
+            unfolding_id: The ID of the unfolding of the task.
+            **fields: Further fields of the entry.
+        """
+        entry = {"event": event, "unfolding_id": unfolding_id, **fields}
+        entry["time"] = round(time.time(), 3)
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_done(self, unfolding_id: int, outputs: List[str]) -> None:
+        """Records a task whose outputs were all written.
+
+        Args:
+            unfolding_id: The ID of the unfolding of the task.
+            outputs: The names of the written outputs.
+        """
+        self.append("done", unfolding_id, outputs=outputs)
+        self.completed.update(outputs)
+
+    def record_failure(self, failure: TaskFailure) -> None:
+        """Records a task that failed on every attempt.
+
+        Args:
+            failure: The failure.
+        """
+        self.append(
+            "failed",
+            failure.unfolding_id,
+            attempts=failure.attempts,
+            error=failure.error,
+        )
+
+    def close(self) -> None:
+        """Closes the journal file."""
+        self.file.close()
+
+
+def check_time_limit(seconds: Optional[float]) -> None:
+    """Checks that a time limit is valid and can be enforced.
+
+    Args:
+        seconds: The time limit, or None for no limit.
+
+    Raises:
+        ValueError: If the limit is not positive, or the platform lacks
+            SIGALRM to enforce it.
+    """
+    if seconds is None:
+        return
+    if seconds <= 0:
+        raise ValueError("The task timeout must be positive.")
+    if not hasattr(signal, "SIGALRM"):
+        raise ValueError("Task timeouts need SIGALRM, which this platform lacks.")
+
+
+@contextlib.contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """Interrupts the enclosed block if it runs longer than a time limit.
+
+    The limit relies on SIGALRM, so it only applies in the main thread on
+    platforms that have it; elsewhere a warning is logged and the block runs
+    without a limit. Code that does not return to the interpreter, such as a
+    long call into a C library, is only interrupted once it does.
+
+    Args:
+        seconds: The time limit, or None for no limit.
+
+    Yields:
+        None.
+
+    Raises:
+        TaskTimeout: If the block runs longer than the limit.
+    """
+    if seconds is None:
+        yield
+        return
+    if (
+        not hasattr(signal, "SIGALRM")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        logger.warning(
+            "Cannot enforce the time limit of %g seconds without SIGALRM"
+            " in the main thread; running without it",
+            seconds,
+        )
+        yield
+        return
+
+    def interrupt(signum: int, frame: object) -> None:
+        raise TaskTimeout(f"Timed out after {seconds:g} seconds")
+
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_with_retries(
+    task: Callable[[], None],
+    unfolding_id: int,
+    retries: int = 0,
+    timeout: Optional[float] = None,
+    on_error: Optional[Callable[[], None]] = None,
+) -> Optional[TaskFailure]:
+    """Runs a task until it succeeds or has failed too often.
+
+    Exceptions of the task are logged and retried, so that one failing task
+    does not end the run. Interrupts such as Ctrl+C are not caught.
+
+    Args:
+        task: The task.
+        unfolding_id: The ID of the unfolding the task renders.
+        retries: The number of further attempts after a failure.
+        timeout: An optional time limit in seconds for every attempt.
+        on_error: An optional function run after every failed attempt, e.g.
+            to discard the state of the render engine.
+
+    Returns:
+        None if an attempt succeeded, otherwise the last failure.
+    """
+    for attempt in range(1, retries + 2):
+        try:
+            with time_limit(timeout):
+                task()
+            return None
+        except Exception as error:
+            description = f"{type(error).__name__}: {error}"
+            logger.warning(
+                f"Attempt {attempt} of {retries + 1} failed for unfolding {unfolding_id}. Error: {description}"
+            )
+            if on_error is not None:
+                on_error()
+    return TaskFailure(unfolding_id, retries + 1, description)
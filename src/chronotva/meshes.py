@@ -0,0 +1,451 @@
+import json
+import logging
+import os
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .geometry import exposed_faces, grid_offsets, merge_coplanar_faces
+
+logger = logging.getLogger(__name__)
+
+MESH_FORMATS = ("obj", "stl", "glb")
+CATALOGUE_NAME = "catalogue"
+CATALOGUE_GAP = 1.0
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_INT = 5125
+GLTF_TRIANGLES = 4
+# Rotates the z-up unfolding coordinates into glTF's y-up frame.
+GLTF_Y_UP = np.array([[1, 0, 0], [0, 0, -1], [0, 1, 0]], dtype=np.float32)
+
+STL_TRIANGLE = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")]
+)
+
+
+class Mesh(NamedTuple):
+    """A triangle mesh with a shared vertex buffer.
+
+    Attributes:
+        vertices: A float32 array of shape (V, 3) with every distinct vertex.
+        triangles: A uint32 array of shape (T, 3) of vertex indices, counter-clockwise
+            as seen from outside.
+        normals: A float32 array of shape (T, 3) with the outward normal of every
+            triangle.
+    """
+
+    vertices: np.ndarray
+    triangles: np.ndarray
+    normals: np.ndarray
+
+
+class PlacedMesh(NamedTuple):
+    """A named mesh and where it is placed in the exported file.
+
+    Attributes:
+        name: The name of the mesh, e.g. 'unfolding_1'.
+        mesh: The mesh.
+        offset: The (x, y, z) translation of the mesh.
+    """
+
+    name: str
+    mesh: Mesh
+    offset: Tuple[float, float, float]
+
+
+def build_mesh(coordinates: List[Tuple[int, int, int]]) -> Mesh:
+    """Builds the surface mesh of unit cubes placed at the given coordinates.
+
+    Faces glued between adjacent cubes are removed and coplanar faces are merged
+    into rectangles. A rectangle corner that lies on the edge of another
+    rectangle is inserted into that edge, so the mesh has no T-junctions and
+    stays watertight; rectangles with such extra points are triangulated by
+    `fan_triangles` or `clip_ears` instead of being split into two triangles.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the
+            minimum corner of each cube.
+
+    Returns:
+        The mesh, with vertices shared between all triangles.
+    """
+    rectangles = merge_coplanar_faces(exposed_faces(coordinates))
+    points = rectangles.vertices.reshape(-1, 3).astype(np.int64)
+    shifted = points - points.min(axis=0)
+    radix = int(shifted.max()) + 1
+    _, first, corner_indices = np.unique(
+        (shifted[:, 0] * radix + shifted[:, 1]) * radix + shifted[:, 2],
+        return_index=True,
+        return_inverse=True,
+    )
+    corners = points[first]
+    outlines = corner_indices.reshape(-1, 4)
+
+    # Every rectangle edge runs along one axis. A corner lies inside an edge if it
+    # matches the edge start on the other two axes and lies strictly between the
+    # edge ends on that one.
+    ends = np.roll(points.reshape(-1, 4, 3), -1, axis=1).reshape(-1, 3)
+    edge_axes = (points != ends).argmax(axis=1)
+    edge_range = np.arange(len(points))
+    starts_along = points[edge_range, edge_axes][:, np.newaxis]
+    ends_along = ends[edge_range, edge_axes][:, np.newaxis]
+    along = corners.T[edge_axes]
+    aligned = (
+        (corners[np.newaxis] == points[:, np.newaxis])
+        | (np.arange(3) == edge_axes[:, np.newaxis])[:, np.newaxis]
+    ).all(axis=2)
+    inner = (
+        aligned
+        & (along > np.minimum(starts_along, ends_along))
+        & (along < np.maximum(starts_along, ends_along))
+    )
+    split = inner.reshape(len(outlines), -1).any(axis=1)
+
+    simple = outlines[~split]
+    triangles = [simple[:, [0, 1, 2]], simple[:, [0, 2, 3]]]
+    owners = [np.flatnonzero(~split)] * 2
+
+    edges, inserted = np.nonzero(inner)
+    distances = np.abs(along - starts_along)[edges, inserted]
+    order = np.lexsort((distances, edges))
+    extra_points: Dict[int, List[int]] = {}
+    for edge, corner in zip(edges[order].tolist(), inserted[order].tolist()):
+        extra_points.setdefault(edge, []).append(corner)
+    for index in np.flatnonzero(split).tolist():
+        edge_points = [extra_points.get(index * 4 + edge, []) for edge in range(4)]
+        outline = []
+        for edge in range(4):
+            outline.append(int(outlines[index, edge]))
+            outline += edge_points[edge]
+        fan = fan_triangles(outline, edge_points)
+        if fan is None:
+            fan = clip_ears(outline, corners)
+        triangles.append(np.array(fan).reshape(-1, 3))
+        owners.append(np.full(len(fan), index))
+
+    return Mesh(
+        vertices=corners.astype(np.float32),
+        triangles=np.concatenate(triangles).astype(np.uint32),
+        normals=rectangles.normals[np.concatenate(owners)].astype(np.float32),
+    )
+
+
+def fan_triangles(
+    outline: List[int], points: List[List[int]]
+) -> Optional[List[Tuple[int, int, int]]]:
+    """Triangulates a rectangle with extra edge points as a fan from one corner.
+
+    A fan is only free of degenerate triangles if neither edge at its corner
+    holds extra points.
+
+    Args:
+        outline: The vertex indices of the rectangle and its extra points,
+            counter-clockwise and starting at the first corner.
+        points: The extra points of each of the four edges.
+
+    Returns:
+        The len(outline) - 2 triangles as vertex indices, or None if every
+        corner touches an edge with extra points.
+    """
+    start = 0
+    for edge in range(4):
+        if not points[edge - 1] and not points[edge]:
+            fan = outline[start:] + outline[:start]
+            return [(fan[0], fan[i], fan[i + 1]) for i in range(1, len(fan) - 1)]
+        start += 1 + len(points[edge])
+    return None
+
+
+def clip_ears(outline: List[int], vertices: np.ndarray) -> List[Tuple[int, int, int]]:
+    """Triangulates a convex polygon whose edges may contain collinear points.
+
+    Ears are only cut at vertices that are not collinear with their neighbours
+    and whose removal leaves a polygon with area, so no triangle is degenerate
+    and every outline point stays a vertex.
+
+    Args:
+        outline: The vertex indices of the polygon, counter-clockwise.
+        vertices: The vertex positions.
+
+    Returns:
+        The len(outline) - 2 triangles as vertex indices.
+    """
+    points = vertices[outline]
+    in_plane = np.ptp(points, axis=0) > 0
+    projected: Dict[int, Tuple[float, float]] = dict(
+        zip(outline, map(tuple, points[:, in_plane].tolist()))
+    )
+
+    def collinear(a: int, b: int, c: int) -> bool:
+        (ax, ay), (bx, by), (cx, cy) = projected[a], projected[b], projected[c]
+        return abs((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) < 1e-9
+
+    remaining = list(outline)
+    triangles: List[Tuple[int, int, int]] = []
+    while len(remaining) > 3:
+        for position in range(len(remaining)):
+            previous, current, following = (
+                remaining[position - 1],
+                remaining[position],
+                remaining[(position + 1) % len(remaining)],
+            )
+            if collinear(previous, current, following):
+                continue
+            rest = remaining[:position] + remaining[position + 1 :]
+            if all(collinear(rest[0], rest[1], other) for other in rest[2:]):
+                continue
+            triangles.append((previous, current, following))
+            del remaining[position]
+            break
+    triangles.append((remaining[0], remaining[1], remaining[2]))
+    return triangles
+
+
+def layout_catalogue(meshes: Dict[str, Mesh]) -> List[PlacedMesh]:
+    """Places meshes on a square grid in the x-y plane, so that none overlap.
+
+    Args:
+        meshes: A dictionary mapping names to meshes.
+
+    Returns:
+        The placed meshes in the given order.
+    """
+    lower = np.array([mesh.vertices.min(axis=0) for mesh in meshes.values()])
+    upper = np.array([mesh.vertices.max(axis=0) for mesh in meshes.values()])
+    offsets = grid_offsets(lower, upper, CATALOGUE_GAP)
+    return [
+        PlacedMesh(name, mesh, (float(x), float(y), float(z)))
+        for (name, mesh), (x, y, z) in zip(meshes.items(), offsets)
+    ]
+
+
+def encode_obj(meshes: List[PlacedMesh]) -> bytes:
+    """Encodes meshes as a Wavefront OBJ file with one object per mesh.
+
+    Args:
+        meshes: The placed meshes.
+
+    Returns:
+        The OBJ file.
+    """
+    axis_normals = np.concatenate([np.eye(3), -np.eye(3)])
+    lines = ["# ChronoTVA unfolding meshes"]
+    lines += [f"vn {x:g} {y:g} {z:g}" for x, y, z in axis_normals]
+    vertex_base = 1
+    for placed in meshes:
+        mesh = placed.mesh
+        lines.append(f"o {placed.name}")
+        lines += [f"v {x:g} {y:g} {z:g}" for x, y, z in (mesh.vertices + placed.offset)]
+        normal_indices = (
+            np.abs(mesh.normals[:, np.newaxis] - axis_normals)
+            .sum(axis=2)
+            .argmin(axis=1)
+            + 1
+        )
+        lines += [
+            f"f {a}//{n} {b}//{n} {c}//{n}"
+            for (a, b, c), n in zip(
+                (mesh.triangles + vertex_base).tolist(), normal_indices.tolist()
+            )
+        ]
+        vertex_base += len(mesh.vertices)
+    return ("\n".join(lines) + "\n").encode()
+
+
+def encode_stl(meshes: List[PlacedMesh]) -> bytes:
+    """Encodes meshes as one binary STL file.
+
+    Args:
+        meshes: The placed meshes.
+
+    Returns:
+        The STL file.
+    """
+    records = np.zeros(
+        sum(len(placed.mesh.triangles) for placed in meshes), STL_TRIANGLE
+    )
+    start = 0
+    for placed in meshes:
+        mesh = placed.mesh
+        end = start + len(mesh.triangles)
+        records["normal"][start:end] = mesh.normals
+        records["vertices"][start:end] = (mesh.vertices + placed.offset)[mesh.triangles]
+        start = end
+    header = b"ChronoTVA unfolding meshes".ljust(80, b" ")
+    return header + struct.pack("<I", len(records)) + records.tobytes()
+
+
+def encode_glb(meshes: List[PlacedMesh]) -> bytes:
+    """Encodes meshes as a binary glTF 2.0 file with one node per mesh.
+
+    glTF is y-up, so the z-up unfolding coordinates are rotated accordingly.
+    No normals are stored: viewers compute flat normals, which lets all faces
+    share their vertices.
+
+    Args:
+        meshes: The placed meshes.
+
+    Returns:
+        The GLB file.
+    """
+    binary = bytearray()
+    gltf: Dict[str, List[Dict[str, object]]] = {
+        "buffers": [],
+        "bufferViews": [],
+        "accessors": [],
+        "meshes": [],
+        "nodes": [],
+    }
+    for placed in meshes:
+        positions = placed.mesh.vertices @ GLTF_Y_UP.T
+        indices = placed.mesh.triangles.astype(np.uint32)
+        accessor = len(gltf["accessors"])
+        for data, target in (
+            (positions.astype(np.float32), GLTF_ARRAY_BUFFER),
+            (indices, GLTF_ELEMENT_ARRAY_BUFFER),
+        ):
+            gltf["bufferViews"].append(
+                {
+                    "buffer": 0,
+                    "byteOffset": len(binary),
+                    "byteLength": data.nbytes,
+                    "target": target,
+                }
+            )
+            binary += data.tobytes()
+        gltf["accessors"] += [
+            {
+                "bufferView": accessor,
+                "componentType": GLTF_FLOAT,
+                "count": len(positions),
+                "type": "VEC3",
+                "min": positions.min(axis=0).tolist(),
+                "max": positions.max(axis=0).tolist(),
+            },
+            {
+                "bufferView": accessor + 1,
+                "componentType": GLTF_UNSIGNED_INT,
+                "count": indices.size,
+                "type": "SCALAR",
+            },
+        ]
+        gltf["meshes"].append(
+            {
+                "name": placed.name,
+                "primitives": [
+                    {
+                        "attributes": {"POSITION": accessor},
+                        "indices": accessor + 1,
+                        "mode": GLTF_TRIANGLES,
+                    }
+                ],
+            }
+        )
+        gltf["nodes"].append(
+            {
+                "name": placed.name,
+                "mesh": len(gltf["meshes"]) - 1,
+                "translation": (GLTF_Y_UP @ np.array(placed.offset)).tolist(),
+            }
+        )
+    gltf["buffers"].append({"byteLength": len(binary)})
+    document = {
+        "asset": {"version": "2.0", "generator": "chronotva"},
+        "scene": 0,
+        "scenes": [{"nodes": list(range(len(gltf["nodes"])))}],
+        **gltf,
+    }
+    return pack_glb(json.dumps(document, separators=(",", ":")).encode(), bytes(binary))
+
+
+def pack_glb(document: bytes, binary: bytes) -> bytes:
+    """Packs a glTF JSON document and its binary buffer into a GLB container.
+
+    Args:
+        document: The glTF JSON document.
+        binary: The content of the first buffer.
+
+    Returns:
+        The GLB file.
+    """
+    document += b" " * (-len(document) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = 12 + 8 + len(document) + 8 + len(binary)
+    return (
+        struct.pack("<III", GLB_MAGIC, 2, length)
+        + struct.pack("<II", len(document), GLB_JSON_CHUNK)
+        + document
+        + struct.pack("<II", len(binary), GLB_BIN_CHUNK)
+        + binary
+    )
+
+
+ENCODERS = {"obj": encode_obj, "stl": encode_stl, "glb": encode_glb}
+
+
+def export_meshes(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    output_dir: str,
+    unfolding_ids: Optional[List[int]] = None,
+    mesh_formats: Optional[List[str]] = None,
+    catalogue: bool = False,
+) -> List[str]:
+    """Exports unfoldings as triangle meshes.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        output_dir: The directory receiving the mesh files.
+        unfolding_ids: An optional list of unfolding IDs. If None, all unfoldings are used.
+        mesh_formats: The file formats to write, out of 'obj', 'stl' and 'glb'.
+            Default: ['obj'].
+        catalogue: Whether to write all unfoldings side by side into one
+            'catalogue' file per format instead of one file per unfolding.
+
+    Returns:
+        The paths of the written files.
+
+    Raises:
+        ValueError: If a format is not supported or no unfolding is selected.
+    """
+    mesh_formats = mesh_formats or ["obj"]
+    for mesh_format in mesh_formats:
+        if mesh_format not in MESH_FORMATS:
+            raise ValueError(
+                f"Invalid mesh format: '{mesh_format}'. Options: {', '.join(MESH_FORMATS)}."
+            )
+    selected_ids = [
+        uid
+        for uid in dict.fromkeys(unfolding_ids if unfolding_ids is not None else data)
+        if uid in data
+    ]
+    if not selected_ids:
+        raise ValueError("No unfoldings selected for the mesh export.")
+
+    meshes = {f"unfolding_{uid}": build_mesh(data[uid]) for uid in selected_ids}
+    if catalogue:
+        files = {CATALOGUE_NAME: layout_catalogue(meshes)}
+    else:
+        files = {
+            name: [PlacedMesh(name, mesh, (0.0, 0.0, 0.0))]
+            for name, mesh in meshes.items()
+        }
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for mesh_format in mesh_formats:
+        for name, placed in files.items():
+            path = os.path.join(output_dir, f"{name}.{mesh_format}")
+            with open(path, "wb") as mesh_file:
+                mesh_file.write(ENCODERS[mesh_format](placed))
+            paths.append(path)
+    logger.info(
+        f"Saved {len(paths)} mesh files of {len(selected_ids)} unfoldings to '{output_dir}'"
+    )
+    return paths
@@ -0,0 +1,196 @@
+import os
+import time
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Sequence, Tuple
+
+METRIC_PREFIX = "chronotva"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, str]
+
+
+def escape_label_value(value: str) -> str:
+    """Escapes a label value for the Prometheus text exposition format.
+
+    Args:
+        value: The raw label value.
+
+    Returns:
+        The label value with backslashes, double quotes and newlines escaped.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """Formats label pairs as a Prometheus label set.
+
+    Args:
+        labels: A sequence of (name, value) pairs.
+
+    Returns:
+        The label set, e.g. '{format="svg",engine="matplotlib"}', or an empty
+        string if no labels are given.
+    """
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+class RenderMetrics:
+    """Collects render counters and histograms for node_exporter's textfile collector.
+
+    Counters and histograms are labelled by output format and render engine. The
+    metrics are written with `write_textfile`, which replaces the target file
+    atomically so the collector never reads a partially written file.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """Initializes empty metrics.
+
+        Args:
+            buckets: Upper bounds of the render duration histogram in seconds.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.images_rendered: DefaultDict[LabelKey, int] = defaultdict(int)
+        self.failures: DefaultDict[LabelKey, int] = defaultdict(int)
+        self.retries: DefaultDict[LabelKey, int] = defaultdict(int)
+        self.bytes_written: DefaultDict[LabelKey, int] = defaultdict(int)
+        self.render_seconds_sum: DefaultDict[LabelKey, float] = defaultdict(float)
+        self.render_seconds_buckets: Dict[LabelKey, List[int]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe_render(
+        self, output_format: str, engine: str, seconds: float, bytes_written: int
+    ) -> None:
+        """Records a successfully rendered image.
+
+        Args:
+            output_format: The file format of the image.
+            engine: The name of the engine that rendered the image.
+            seconds: The time spent rendering and saving the image.
+            bytes_written: The size of the written image in bytes.
+        """
+        key = (output_format, engine)
+        self.images_rendered[key] += 1
+        self.bytes_written[key] += bytes_written
+        self.render_seconds_sum[key] += seconds
+        counts = self.render_seconds_buckets.setdefault(key, [0] * len(self.buckets))
+        for index, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                counts[index] += 1
+
+    def record_failure(self, output_format: str, engine: str) -> None:
+        """Records a render that failed for good, after its last attempt.
+
+        Args:
+            output_format: The file format of the failed image.
+            engine: The name of the engine that failed to render the image.
+        """
+        self.failures[(output_format, engine)] += 1
+
+    def record_retry(self, output_format: str, engine: str) -> None:
+        """Records a failed render attempt that was retried.
+
+        Args:
+            output_format: The file format of the failed image.
+            engine: The name of the engine that failed to render the image.
+        """
+        self.retries[(output_format, engine)] += 1
+
+    def record_cache(self, hit: bool, count: int = 1) -> None:
+        """Records cache lookups.
+
+        Args:
+            hit: Whether the lookups were served from the cache.
+            count: The number of lookups to record.
+        """
+        if hit:
+            self.cache_hits += count
+        else:
+            self.cache_misses += count
+
+    def to_text(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            The metrics as text, terminated by a newline.
+        """
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[LabelKey, int]) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            for (output_format, engine), value in sorted(values.items()):
+                labels = format_labels([("format", output_format), ("engine", engine)])
+                lines.append(f"{METRIC_PREFIX}_{name}{labels} {value}")
+
+        counter(
+            "images_rendered_total",
+            "Images rendered successfully.",
+            self.images_rendered,
+        )
+        counter(
+            "render_failures_total",
+            "Renders that failed on their last attempt.",
+            self.failures,
+        )
+        counter(
+            "render_retries_total",
+            "Failed render attempts that were retried.",
+            self.retries,
+        )
+        counter(
+            "bytes_written_total", "Bytes of image data written.", self.bytes_written
+        )
+
+        name = f"{METRIC_PREFIX}_render_seconds"
+        lines.append(f"# HELP {name} Time spent rendering and saving one image.")
+        lines.append(f"# TYPE {name} histogram")
+        for key, counts in sorted(self.render_seconds_buckets.items()):
+            labels = [("format", key[0]), ("engine", key[1])]
+            for upper, count in zip(self.buckets, counts):
+                bucket_labels = format_labels(labels + [("le", repr(float(upper)))])
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            total = self.images_rendered[key]
+            lines.append(
+                f"{name}_bucket{format_labels(labels + [('le', '+Inf')])} {total}"
+            )
+            lines.append(
+                f"{name}_sum{format_labels(labels)} {self.render_seconds_sum[key]}"
+            )
+            lines.append(f"{name}_count{format_labels(labels)} {total}")
+
+        for name, help_text, value in (
+            (
+                "cache_hits_total",
+                "Cache lookups served from the cache.",
+                self.cache_hits,
+            ),
+            ("cache_misses_total", "Cache lookups that missed.", self.cache_misses),
+        ):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            lines.append(f"{METRIC_PREFIX}_{name} {value}")
+
+        name = f"{METRIC_PREFIX}_last_run_timestamp_seconds"
+        lines.append(f"# HELP {name} Unix time at which the metrics were written.")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {time.time()}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Writes the metrics to a `.prom` file, replacing it atomically.
+
+        Args:
+            path: The path of the `.prom` file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as textfile:
+            textfile.write(self.to_text())
+        os.replace(temporary_path, path)
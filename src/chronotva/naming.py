@@ -0,0 +1,202 @@
+import hashlib
+import math
+import ntpath
+import os
+import string
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+TEMPLATE_FIELDS = (
+    "id",
+    "view",
+    "elevation",
+    "azimuth",
+    "palette",
+    "size",
+    "format",
+    "hash",
+)
+DEFAULT_TEMPLATE = "unfolding_{id}.{format}"
+PALETTE_TEMPLATE = "unfolding_{id}_{palette}.{format}"
+MAX_FILES_PER_DIRECTORY = 4096
+SHARD_WIDTH = 2
+
+
+class OutputKey(NamedTuple):
+    """Identifies one output of a render run.
+
+    Attributes:
+        unfolding_id: The ID of the rendered unfolding.
+        view_angle: The elevation and azimuth angles of the view.
+        palette: The name of the palette, or None if no palettes are used.
+        output_format: The file format of the output.
+        size: The pixel size of the output, e.g. '1440x1920', or None if all
+            outputs of the run share one size.
+    """
+
+    unfolding_id: int
+    view_angle: Tuple[float, float]
+    palette: Optional[str]
+    output_format: str
+    size: Optional[str] = None
+
+
+def check_relative_path(path: str, description: str) -> None:
+    """Checks that a path stays inside the directory or archive it is relative to.
+
+    Args:
+        path: The path, with '/' or '\\' as separators.
+        description: What the path is, for the error message, e.g. 'Output name'.
+
+    Raises:
+        ValueError: If the path is absolute on any platform or has a '..'
+            component.
+    """
+    if (
+        os.path.isabs(path)
+        or path.startswith(("/", "\\"))
+        or ntpath.splitdrive(path)[0]
+    ):
+        raise ValueError(f"{description} must be a relative path: {path}")
+    if ".." in path.replace("\\", "/").split("/"):
+        raise ValueError(f"{description} must not contain '..' components: {path}")
+
+
+def validate_template(template: str) -> None:
+    """Checks that an output template only uses known fields.
+
+    Args:
+        template: A str.format template, e.g. 'unfolding_{id}.{format}'.
+
+    Raises:
+        ValueError: If the template is malformed, uses unknown or positional fields,
+            or is an absolute path or has a '..' component.
+    """
+    try:
+        fields = [
+            field
+            for _, field, _, _ in string.Formatter().parse(template)
+            if field is not None
+        ]
+    except ValueError as error:
+        raise ValueError(f"Invalid output template: {template}. Error: {error}")
+    for field in fields:
+        if field not in TEMPLATE_FIELDS:
+            raise ValueError(
+                f"Invalid output template field: '{{{field}}}'. Options: {', '.join(TEMPLATE_FIELDS)}."
+            )
+    # Outputs must stay inside the output directory or archive.
+    check_relative_path(template, "Output template")
+
+
+def output_hash(key: OutputKey) -> str:
+    """Returns a stable hash of an output key.
+
+    Args:
+        key: The output key.
+
+    Returns:
+        The first 12 hex digits of the SHA-256 of the key.
+    """
+    parts = [key.unfolding_id, *key.view_angle, key.palette, key.output_format]
+    if key.size is not None:
+        parts.append(key.size)
+    identity = "|".join(str(part) for part in parts)
+    return hashlib.sha256(identity.encode()).hexdigest()[:12]
+
+
+def auto_shard_depth(count: int) -> int:
+    """Returns the number of shard directory levels needed for the given outputs.
+
+    Every level splits the outputs into 256 directories, and sharding only starts
+    once a flat directory would hold more than MAX_FILES_PER_DIRECTORY files.
+
+    Args:
+        count: The number of outputs.
+
+    Returns:
+        The number of shard directory levels.
+    """
+    if count <= MAX_FILES_PER_DIRECTORY:
+        return 0
+    return math.ceil(math.log(count / MAX_FILES_PER_DIRECTORY, 16**SHARD_WIDTH))
+
+
+class OutputNamer:
+    """Names outputs from a template and shards them into hashed subdirectories."""
+
+    def __init__(self, template: str, shard_depth: Optional[int] = None) -> None:
+        """Initializes the namer.
+
+        Args:
+            template: A str.format template using the fields of TEMPLATE_FIELDS.
+            shard_depth: The number of hashed subdirectory levels. If None, the depth
+                is chosen from the number of outputs by `auto_shard_depth`.
+
+        Raises:
+            ValueError: If the template is invalid or the shard depth is negative.
+        """
+        validate_template(template)
+        if shard_depth is not None and shard_depth < 0:
+            raise ValueError("The shard depth must not be negative.")
+        self.template = template
+        self.shard_depth = shard_depth
+
+    def name(self, key: OutputKey, shard_depth: int = 0) -> str:
+        """Returns the relative path of an output.
+
+        Args:
+            key: The output key.
+            shard_depth: The number of hashed subdirectory levels.
+
+        Returns:
+            The relative path, using '/' as separator.
+
+        Raises:
+            ValueError: If a field value, e.g. a palette name, makes the path
+                absolute or gives it a '..' component.
+        """
+        digest = output_hash(key)
+        elevation, azimuth = key.view_angle
+        name = self.template.format(
+            id=key.unfolding_id,
+            view=f"{elevation:g}_{azimuth:g}",
+            elevation=f"{elevation:g}",
+            azimuth=f"{azimuth:g}",
+            palette=key.palette or "",
+            size=key.size or "",
+            format=key.output_format,
+            hash=digest,
+        )
+        # The template is checked, but the field values are not.
+        check_relative_path(name, "Output name")
+        shards = [
+            digest[level * SHARD_WIDTH : (level + 1) * SHARD_WIDTH]
+            for level in range(shard_depth)
+        ]
+        return "/".join(shards + [name])
+
+    def plan(self, keys: Iterable[OutputKey]) -> Dict[OutputKey, str]:
+        """Names all outputs of a run at once.
+
+        Args:
+            keys: The keys of all outputs.
+
+        Returns:
+            A dictionary mapping every key to its relative path.
+
+        Raises:
+            ValueError: If the template gives two outputs the same name, or a
+                name that leaves the output directory.
+        """
+        key_list: List[OutputKey] = list(dict.fromkeys(keys))
+        depth = (
+            self.shard_depth
+            if self.shard_depth is not None
+            else auto_shard_depth(len(key_list))
+        )
+        names = {key: self.name(key, depth) for key in key_list}
+        if len(set(names.values())) != len(names):
+            raise ValueError(
+                f"Output template '{self.template}' gives several outputs the same name. Add fields such as {{palette}}, {{view}} or {{format}}."
+            )
+        return names
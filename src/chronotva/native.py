@@ -0,0 +1,703 @@
+import abc
+import io
+import itertools
+import logging
+import math
+import zlib
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .geometry import (
+    Faces,
+    centered_bounds,
+    coplanar_rectangles,
+    exposed_faces,
+    unique_edges,
+)
+from .raster import RASTER_FORMATS, encode_pixels
+from .sinks import write_bytes
+from .svg import SVG_FORMATS, finish_svg
+from .tesseract import PlotParameters, scene_key
+from .visibility import resolve_visibility
+
+logger = logging.getLogger(__name__)
+
+POINTS_PER_INCH = 72
+LINE_WIDTH_POINTS = 1.0
+# The light of mplot3d's bar3d shading: azimuth 225 and altitude 19.4712 degrees.
+LIGHT_DIRECTION = np.array([-2, -2, 1], dtype=float) / 3
+SUPERSAMPLING = 2
+# The share of the figure spanned by the axis box in mplot3d, so that native
+# images come out at the same scale as matplotlib's.
+AXES_FILL = 0.72
+
+
+class NativeScene(NamedTuple):
+    """The projected faces of an unfolding, ready to be colored and encoded.
+
+    All lengths are in inches, with the origin in the top left corner of the
+    image and y pointing down.
+
+    Attributes:
+        polygons: An array of shape (F, 4, 2) with the corners of the visible
+            faces, ordered back to front.
+        shading: An array of shape (F,) with the shading factor of every face.
+        blocks: An array of shape (F,) with the index of the block of every face.
+        size: The (width, height) of the image.
+        fragments: For every face, the convex (K, 2) fragments that are not
+            hidden by other faces, or None if visibility was not resolved.
+            Coplanar neighbours of one color are merged, and their fragments
+            belong to the first of them.
+        edges: For every face, the visible parts of the edges it owns as (P, 2)
+            polylines, or None if visibility was not resolved. Every edge is
+            owned by one face. Closed polylines end with their first point.
+    """
+
+    polygons: np.ndarray
+    shading: np.ndarray
+    blocks: np.ndarray
+    size: Tuple[float, float]
+    fragments: Optional[List[List[np.ndarray]]] = None
+    edges: Optional[List[List[np.ndarray]]] = None
+
+
+class NativeDrawing(NamedTuple):
+    """A scene with the colors of a plot applied.
+
+    Attributes:
+        scene: The projected scene.
+        facecolors: An array of shape (F, 4) with the RGBA fill of every face.
+        edgecolors: An array of shape (F, 4) with the RGBA outline of every face.
+    """
+
+    scene: NativeScene
+    facecolors: np.ndarray
+    edgecolors: np.ndarray
+
+
+def view_basis(view_angle: Tuple[float, float]) -> np.ndarray:
+    """Returns the camera axes of a view with mplot3d's elevation and azimuth.
+
+    Args:
+        view_angle: The elevation and azimuth angles in degrees.
+
+    Returns:
+        An array of shape (3, 3) whose rows point right, up and towards the viewer.
+    """
+    elevation, azimuth = np.radians(view_angle)
+    toward = np.array(
+        [
+            np.cos(elevation) * np.cos(azimuth),
+            np.cos(elevation) * np.sin(azimuth),
+            np.sin(elevation),
+        ]
+    )
+    right = np.array([-np.sin(azimuth), np.cos(azimuth), 0.0])
+    return np.stack([right, np.cross(toward, right), toward])
+
+
+def color_period(plot_params: PlotParameters) -> int:
+    """Returns after how many blocks the face and edge colors of a plot repeat.
+
+    Args:
+        plot_params: A PlotParameters object containing the colors.
+
+    Returns:
+        The least common multiple of the numbers of face and edge colors.
+    """
+    period = len(plot_params.colors) * len(plot_params.edgecolors)
+    return period // math.gcd(len(plot_params.colors), len(plot_params.edgecolors))
+
+
+def project_scene(
+    coordinates: List[Tuple[int, int, int]],
+    plot_params: PlotParameters,
+    resolve_hidden: bool = False,
+) -> NativeScene:
+    """Projects the visible block faces orthographically onto the image.
+
+    Faces glued between adjacent blocks and faces pointing away from the viewer
+    are dropped, and the remaining faces are sorted back to front by depth. The
+    axis box, widened to the plot's extent, is scaled to fit the figure, so that
+    a shared extent draws every unfolding at the same scale.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+        plot_params: A PlotParameters object containing the plot configuration.
+        resolve_hidden: Whether to also clip every face against the faces in
+            front of it, see `resolve_visibility`. Coplanar neighbouring faces
+            of blocks with the same colors are merged into rectangles first,
+            and edges shared by two faces are kept once.
+
+    Returns:
+        The projected scene.
+    """
+    basis = view_basis(plot_params.view_angle)
+    faces = exposed_faces(coordinates)
+    visible = faces.normals @ basis[2] > 1e-9
+    vertices = faces.vertices[visible]
+    normals = faces.normals[visible]
+
+    projected = vertices @ basis.T
+    order = np.argsort(projected[:, :, 2].mean(axis=1), kind="stable")
+    polygons = projected[order, :, :2] * (1, -1)
+
+    box = np.array(
+        list(itertools.product(*centered_bounds(coordinates, plot_params.extent)))
+    )
+    box_points = (box @ basis[:2].T) * (1, -1)
+    box_lower, box_upper = box_points.min(axis=0), box_points.max(axis=0)
+    pad = LINE_WIDTH_POINTS / POINTS_PER_INCH
+    figure_size = np.array([plot_params.width, plot_params.height])
+    scale = AXES_FILL * float(np.min(figure_size / (box_upper - box_lower)))
+
+    if plot_params.bbox_inches == "tight":
+        # With a shared extent, the whole axis box is kept, so that every
+        # unfolding gets the same frame.
+        if plot_params.extent is not None:
+            lower, upper = box_lower, box_upper
+        else:
+            lower = polygons.reshape(-1, 2).min(axis=0)
+            upper = polygons.reshape(-1, 2).max(axis=0)
+        size = (upper - lower) * scale + 2 * pad
+        offset = pad - lower * scale
+    else:
+        size = figure_size
+        offset = (figure_size - (box_upper - box_lower) * scale) / 2 - box_lower * scale
+
+    shading = (
+        0.65 + 0.35 * (normals[order] @ LIGHT_DIRECTION)
+        if plot_params.shade
+        else np.ones(len(order))
+    )
+    blocks = faces.blocks[visible][order]
+    fragments: Optional[List[List[np.ndarray]]] = None
+    edges: Optional[List[List[np.ndarray]]] = None
+    if resolve_hidden:
+        ordered = Faces(vertices[order], normals[order], blocks)
+        rectangles, members = coplanar_rectangles(
+            ordered, blocks % color_period(plot_params)
+        )
+        segments, owners = unique_edges(ordered)
+        # Shared corners are projected once, so that the visible edges can be
+        # joined by comparing their end points.
+        points, inverse = np.unique(
+            segments.reshape(-1, 3), axis=0, return_inverse=True
+        )
+        merged_fragments, merged_edges = resolve_visibility(
+            rectangles @ basis.T,
+            (points @ basis.T)[inverse.reshape(-1)].reshape(-1, 2, 3),
+            members[owners],
+        )
+        fragments, edges = [[] for _ in order], [[] for _ in order]
+        for rectangle, face in enumerate(np.unique(members, return_index=True)[1]):
+            fragments[face] = [
+                fragment * (1, -1) * scale + offset
+                for fragment in merged_fragments[rectangle]
+            ]
+            edges[face] = [
+                polyline * (1, -1) * scale + offset
+                for polyline in merged_edges[rectangle]
+            ]
+    return NativeScene(
+        polygons=polygons * scale + offset,
+        shading=shading,
+        blocks=blocks,
+        size=(float(size[0]), float(size[1])),
+        fragments=fragments,
+        edges=edges,
+    )
+
+
+def hex_color(rgba: np.ndarray) -> str:
+    """Formats the RGB part of a color as '#rrggbb'.
+
+    Args:
+        rgba: An RGBA color with components between 0 and 1.
+
+    Returns:
+        The hexadecimal color.
+    """
+    red, green, blue = (int(round(float(c) * 255)) for c in np.clip(rgba[:3], 0, 1))
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def shows_visible_parts(drawing: NativeDrawing) -> bool:
+    """Returns whether a drawing can be drawn as the visible parts of its faces.
+
+    Only opaque faces hide what lies behind them, so drawings with translucent
+    faces are drawn whole in painter's order instead.
+
+    Args:
+        drawing: A drawing returned by `NativeEngine.draw`.
+
+    Returns:
+        Whether the scene has resolved visibility and all faces are opaque.
+    """
+    return drawing.scene.fragments is not None and bool(
+        np.all(drawing.facecolors[:, 3] >= 1)
+    )
+
+
+def edge_groups(drawing: NativeDrawing) -> Dict[Tuple[float, ...], List[np.ndarray]]:
+    """Collects the visible outline polylines of a drawing by edge color.
+
+    Args:
+        drawing: A drawing with resolved visibility.
+
+    Returns:
+        A dictionary mapping RGBA edge colors, in order of first use, to lists of
+        (P, 2) polylines.
+    """
+    groups: Dict[Tuple[float, ...], List[np.ndarray]] = {}
+    for polylines, edgecolor in zip(drawing.scene.edges or [], drawing.edgecolors):
+        if polylines:
+            groups.setdefault(tuple(edgecolor.tolist()), []).extend(polylines)
+    return groups
+
+
+def polyline_points(polyline: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """Splits a polyline into its distinct points and whether it is closed.
+
+    Args:
+        polyline: A (P, 2) polyline. Closed polylines end with their first point.
+
+    Returns:
+        The points without the repeated first point, and whether the polyline
+        is closed.
+    """
+    closed = len(polyline) > 2 and bool(np.array_equal(polyline[0], polyline[-1]))
+    return (polyline[:-1] if closed else polyline), closed
+
+
+class NativeEngine(abc.ABC):
+    """Base class of the engines that project and draw the blocks themselves.
+
+    Native engines skip matplotlib's figure machinery: the visible faces are
+    projected with NumPy once per geometry and view and drawn directly. They
+    draw no axes, so show_axes is ignored. Subclasses implement `encode`.
+    """
+
+    name = "native"
+    formats: Tuple[str, ...] = ()
+    resolves_hidden = False
+
+    def __init__(self, scene_cache_size: int = 0) -> None:
+        """Initializes the engine.
+
+        Args:
+            scene_cache_size: The number of projected scenes to keep for reuse.
+        """
+        self.scene_cache_size = scene_cache_size
+        self.scenes: "OrderedDict[Tuple[Hashable, ...], NativeScene]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def prepare(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> NativeScene:
+        """Returns the projected scene for the given geometry and view.
+
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            The projected scene, from the cache if possible.
+        """
+        key = scene_key(coordinates, plot_params)
+        if self.resolves_hidden:
+            key += (color_period(plot_params),)
+        scene = self.scenes.get(key)
+        if scene is not None:
+            self.cache_hits += 1
+            self.scenes.move_to_end(key)
+            return scene
+
+        self.cache_misses += 1
+        scene = project_scene(coordinates, plot_params, self.resolves_hidden)
+        if self.scene_cache_size:
+            self.scenes[key] = scene
+            while len(self.scenes) > self.scene_cache_size:
+                self.scenes.popitem(last=False)
+        return scene
+
+    def draw(self, scene: NativeScene, plot_params: PlotParameters) -> NativeDrawing:
+        """Colors the faces of a scene like BlockPlotter.recolor.
+
+        Args:
+            scene: A scene returned by `prepare`.
+            plot_params: A PlotParameters object containing the colors.
+
+        Returns:
+            The colored scene.
+        """
+        colors = np.asarray(plot_params.colors, dtype=float)
+        edgecolors = np.asarray(plot_params.edgecolors, dtype=float)
+        facecolors = colors[scene.blocks % len(colors)]
+        facecolors[:, :3] *= scene.shading[:, np.newaxis]
+        return NativeDrawing(
+            scene, facecolors, edgecolors[scene.blocks % len(edgecolors)]
+        )
+
+    @abc.abstractmethod
+    def encode(
+        self,
+        drawing: NativeDrawing,
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None:
+        """Writes a drawing in an output format.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+            output_format: The file format of the output.
+            output_path: The file path or binary stream the output is saved to.
+        """
+
+    def plot_3d_blocks(
+        self,
+        coordinates: List[Tuple[int, int, int]],
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None:
+        """Plots 3D blocks using the provided coordinates and plot parameters.
+
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+            output_format: The file format for the output image.
+            output_path: The file path or binary stream the output image is saved to.
+
+        Raises:
+            TypeError: If coordinates are not provided as a list of tuples.
+            ValueError: If no coordinates are provided for plotting, or the engine
+                cannot write the format.
+        """
+        if not isinstance(coordinates, List):
+            raise TypeError("Coordinates must be a list of tuples.")
+
+        if not coordinates:
+            raise ValueError("No coordinates provided for plotting.")
+
+        if output_format not in self.formats:
+            raise ValueError(
+                f"The '{self.name}' engine cannot write {output_format}. Options: {', '.join(self.formats)}."
+            )
+
+        try:
+            scene = self.prepare(coordinates, plot_params)
+            self.encode(
+                self.draw(scene, plot_params), plot_params, output_format, output_path
+            )
+        except Exception as error:
+            logging.error(f"An error occurred while plotting: {error}")
+            raise
+
+    def close(self) -> None:
+        """Drops all cached scenes."""
+        self.scenes.clear()
+
+
+class RasterEngine(NativeEngine):
+    """Rasterizes the projected faces with Pillow, which matplotlib depends on.
+
+    Faces are filled at twice the resolution and downsampled for antialiasing.
+    """
+
+    name = "native-raster"
+    formats: Tuple[str, ...] = RASTER_FORMATS
+
+    def encode(
+        self,
+        drawing: NativeDrawing,
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None:
+        """Rasterizes a drawing and saves it as PNG or WebP.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+            output_format: The file format of the output, 'png' or 'webp'.
+            output_path: The file path or binary stream the output is saved to.
+        """
+        write_bytes(
+            output_path,
+            encode_pixels(
+                self.rasterize(drawing, plot_params), output_format, plot_params
+            ),
+        )
+
+    def rasterize(
+        self, drawing: NativeDrawing, plot_params: PlotParameters
+    ) -> np.ndarray:
+        """Fills the faces of a drawing into RGBA pixels.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            A uint8 array of shape (height, width, 4).
+        """
+        from PIL import Image, ImageDraw
+
+        scale = plot_params.dpi * SUPERSAMPLING
+        width, height = (
+            max(1, math.ceil(length * plot_params.dpi)) for length in drawing.scene.size
+        )
+        image = Image.new(
+            "RGBA",
+            (width * SUPERSAMPLING, height * SUPERSAMPLING),
+            (255, 255, 255, 0 if plot_params.transparent else 255),
+        )
+        canvas = ImageDraw.Draw(image, "RGBA")
+        line_width = max(1, round(LINE_WIDTH_POINTS / POINTS_PER_INCH * scale))
+        facecolors = np.round(np.clip(drawing.facecolors, 0, 1) * 255).astype(int)
+        edgecolors = np.round(np.clip(drawing.edgecolors, 0, 1) * 255).astype(int)
+        for polygon, facecolor, edgecolor in zip(
+            drawing.scene.polygons * scale, facecolors, edgecolors
+        ):
+            points = [tuple(point) for point in polygon.tolist()]
+            canvas.polygon(points, fill=tuple(facecolor))
+            canvas.line(
+                points + points[:1],
+                fill=tuple(edgecolor),
+                width=line_width,
+                joint="curve",
+            )
+        image = image.resize((width, height), Image.Resampling.BOX)
+        return np.asarray(image)
+
+
+class VectorEngine(NativeEngine):
+    """Writes the projected faces as SVG or PDF paths without matplotlib.
+
+    Visibility is resolved exactly: opaque drawings only contain the visible
+    fragments of every face, filled without outlines, followed by the visible
+    segments of the face outlines. Hidden faces are left out entirely, so the
+    result does not depend on a drawing order. Drawings with translucent faces
+    are written as whole faces in painter's order. Since visible fragments
+    never overlap, compact SVG output fills all fragments of one color as one
+    path.
+    """
+
+    name = "native-vector"
+    formats: Tuple[str, ...] = ("svg", "svgz", "pdf")
+    resolves_hidden = True
+
+    def encode(
+        self,
+        drawing: NativeDrawing,
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None:
+        """Writes a drawing as SVG, compressed SVG or PDF.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+            output_format: The file format of the output, 'svg', 'svgz' or 'pdf'.
+            output_path: The file path or binary stream the output is saved to.
+        """
+        data = (
+            finish_svg(
+                self.encode_svg(drawing, plot_params),
+                output_format,
+                plot_params.svg_precision,
+            )
+            if output_format in SVG_FORMATS
+            else self.encode_pdf(drawing, plot_params)
+        )
+        write_bytes(output_path, data)
+
+    def encode_svg(self, drawing: NativeDrawing, plot_params: PlotParameters) -> bytes:
+        """Encodes a drawing as an SVG document in points.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            The SVG document.
+        """
+        width, height = (length * POINTS_PER_INCH for length in drawing.scene.size)
+        lines = [
+            '<?xml version="1.0" encoding="utf-8" standalone="no"?>',
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.2f}pt" height="{height:.2f}pt" viewBox="0 0 {width:.2f} {height:.2f}" version="1.1">',
+        ]
+        if not plot_params.transparent:
+            lines.append(
+                f'<rect width="{width:.2f}" height="{height:.2f}" fill="#ffffff"/>'
+            )
+        if shows_visible_parts(drawing):
+            lines += self.svg_visible_parts(
+                drawing, merge_colors=plot_params.svg_precision is not None
+            )
+            lines.append("</svg>")
+            return ("\n".join(lines) + "\n").encode()
+        for polygon, facecolor, edgecolor in zip(
+            drawing.scene.polygons * POINTS_PER_INCH,
+            drawing.facecolors,
+            drawing.edgecolors,
+        ):
+            path = " L ".join(f"{x:.2f} {y:.2f}" for x, y in polygon)
+            lines.append(
+                f'<path d="M {path} Z" style="fill:{hex_color(facecolor)};fill-opacity:{facecolor[3]:g};'
+                f'stroke:{hex_color(edgecolor)};stroke-opacity:{edgecolor[3]:g};stroke-width:{LINE_WIDTH_POINTS:g};stroke-linejoin:round"/>'
+            )
+        lines.append("</svg>")
+        return ("\n".join(lines) + "\n").encode()
+
+    def svg_visible_parts(
+        self, drawing: NativeDrawing, merge_colors: bool = False
+    ) -> List[str]:
+        """Returns SVG paths for the visible parts of a drawing.
+
+        All fragments of a face form one path, so that no seams show between
+        them, and all outline segments of one color form another.
+
+        Args:
+            drawing: A drawing with resolved visibility.
+            merge_colors: Whether all fragments of one fill color form one path
+                instead of one path per face.
+
+        Returns:
+            The SVG path elements.
+        """
+        fills: Dict[Hashable, Tuple[str, List[np.ndarray]]] = {}
+        for index, (fragments, facecolor) in enumerate(
+            zip(drawing.scene.fragments or [], drawing.facecolors)
+        ):
+            if fragments:
+                fill = hex_color(facecolor)
+                key: Hashable = fill if merge_colors else index
+                fills.setdefault(key, (fill, []))[1].extend(fragments)
+        elements = []
+        for fill, fragments in fills.values():
+            path = " ".join(
+                "M "
+                + " L ".join(f"{x:.2f} {y:.2f}" for x, y in fragment * POINTS_PER_INCH)
+                + " Z"
+                for fragment in fragments
+            )
+            elements.append(f'<path d="{path}" style="fill:{fill};stroke:none"/>')
+        for edgecolor, polylines in edge_groups(drawing).items():
+            subpaths = []
+            for polyline in polylines:
+                points, closed = polyline_points(polyline * POINTS_PER_INCH)
+                subpaths.append(
+                    "M "
+                    + " L ".join(f"{x:.2f} {y:.2f}" for x, y in points)
+                    + (" Z" if closed else "")
+                )
+            path = " ".join(subpaths)
+            elements.append(
+                f'<path d="{path}" style="fill:none;stroke:{hex_color(np.array(edgecolor))};stroke-opacity:{edgecolor[3]:g};'
+                f'stroke-width:{LINE_WIDTH_POINTS:g};stroke-linecap:round;stroke-linejoin:round"/>'
+            )
+        return elements
+
+    def encode_pdf(self, drawing: NativeDrawing, plot_params: PlotParameters) -> bytes:
+        """Encodes a drawing as a single-page PDF document.
+
+        Args:
+            drawing: A drawing returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            The PDF document.
+        """
+        width, height = (length * POINTS_PER_INCH for length in drawing.scene.size)
+        alphas: "OrderedDict[Tuple[float, float], str]" = OrderedDict()
+        commands = [f"{LINE_WIDTH_POINTS:g} w 1 j"]
+        if not plot_params.transparent:
+            commands.append(f"1 1 1 rg 0 0 {width:.2f} {height:.2f} re f")
+        visible_parts = shows_visible_parts(drawing)
+        if visible_parts:
+            commands.append("1 J")
+            for fragments, facecolor in zip(
+                drawing.scene.fragments or [], drawing.facecolors
+            ):
+                if fragments:
+                    fill = " ".join(f"{c:.4g}" for c in np.clip(facecolor[:3], 0, 1))
+                    path = " ".join(
+                        " ".join(
+                            f"{x:.2f} {height - y:.2f} {'m' if index == 0 else 'l'}"
+                            for index, (x, y) in enumerate(fragment * POINTS_PER_INCH)
+                        )
+                        + " h"
+                        for fragment in fragments
+                    )
+                    commands.append(f"{fill} rg {path} f")
+            for edgecolor, polylines in edge_groups(drawing).items():
+                state = alphas.setdefault((1.0, edgecolor[3]), f"A{len(alphas)}")
+                stroke = " ".join(f"{c:.4g}" for c in np.clip(edgecolor[:3], 0, 1))
+                subpaths = []
+                for polyline in polylines:
+                    points, closed = polyline_points(polyline * POINTS_PER_INCH)
+                    subpaths.append(
+                        " ".join(
+                            f"{x:.2f} {height - y:.2f} {'m' if index == 0 else 'l'}"
+                            for index, (x, y) in enumerate(points)
+                        )
+                        + (" h" if closed else "")
+                    )
+                path = " ".join(subpaths)
+                commands.append(f"/{state} gs {stroke} RG {path} S")
+        for polygon, facecolor, edgecolor in zip(
+            [] if visible_parts else drawing.scene.polygons * POINTS_PER_INCH,
+            drawing.facecolors,
+            drawing.edgecolors,
+        ):
+            alpha = (float(facecolor[3]), float(edgecolor[3]))
+            state = alphas.setdefault(alpha, f"A{len(alphas)}")
+            fill = " ".join(f"{c:.4g}" for c in np.clip(facecolor[:3], 0, 1))
+            stroke = " ".join(f"{c:.4g}" for c in np.clip(edgecolor[:3], 0, 1))
+            path = " ".join(
+                f"{x:.2f} {height - y:.2f} {'m' if index == 0 else 'l'}"
+                for index, (x, y) in enumerate(polygon)
+            )
+            commands.append(f"/{state} gs {fill} rg {stroke} RG {path} h B")
+
+        content = zlib.compress("\n".join(commands).encode())
+        states = " ".join(
+            f"/{name} {index + 5} 0 R" for index, name in enumerate(alphas.values())
+        )
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+                f"/Contents 4 0 R /Resources << /ExtGState << {states} >> >> >>"
+            ).encode(),
+            f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode()
+            + content
+            + b"\nendstream",
+        ] + [
+            f"<< /Type /ExtGState /ca {fill_alpha:g} /CA {edge_alpha:g} >>".encode()
+            for fill_alpha, edge_alpha in alphas
+        ]
+
+        output = io.BytesIO()
+        output.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(output.tell())
+            output.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        xref = output.tell()
+        output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            output.write(f"{offset:010d} 00000 n \n".encode())
+        output.write(
+            f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        )
+        return output.getvalue()
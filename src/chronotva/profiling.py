@@ -0,0 +1,156 @@
+import contextlib
+import cProfile
+import glob
+import logging
+import os
+import pstats
+import uuid
+from contextlib import contextmanager
+from typing import ContextManager, Iterator, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".prof"
+MERGED_PROFILE = "merged.pstats"
+SUMMARY_FILE = "summary.txt"
+
+
+class RenderProfiler:
+    """Captures cProfile data for individual renders and merges it afterwards.
+
+    Every profiled section is dumped to its own `.prof` file inside the profile
+    directory, so sections may run in different processes as long as they share
+    the directory and run ID. `write_report` aggregates the dumps of the run into
+    a single report; dumps of earlier runs in the same directory are left out.
+    """
+
+    def __init__(
+        self, directory: str, limit: int = 30, run_id: Optional[str] = None
+    ) -> None:
+        """Initializes the profiler.
+
+        Args:
+            directory: Directory where `.prof` files and the report are written.
+            limit: Number of functions listed in the aggregated report.
+            run_id: An optional ID shared by all profilers of one run, e.g. in
+                worker processes. A new ID is generated if None.
+        """
+        self.directory = directory
+        self.limit = limit
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        os.makedirs(directory, exist_ok=True)
+
+    def profile_path(self, name: str) -> str:
+        """Returns the dump path for a profiled section.
+
+        The run ID and process ID are part of the file name so that equally named
+        sections profiled by different runs or processes never overwrite each
+        other.
+
+        Args:
+            name: The name of the profiled section, e.g. 'unfolding_1'.
+
+        Returns:
+            The path of the `.prof` file for the section.
+        """
+        return os.path.join(
+            self.directory, f"{name}.{self.run_id}.{os.getpid()}{PROFILE_SUFFIX}"
+        )
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Runs the enclosed block under cProfile and dumps the statistics.
+
+        Args:
+            name: The name of the profiled section, used for the dump file name.
+
+        Yields:
+            None. The statistics are written when the block exits.
+        """
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(self.profile_path(name))
+
+    def merge(self, stream: Optional[TextIO] = None) -> Optional[pstats.Stats]:
+        """Merges the `.prof` files of this run in the profile directory.
+
+        Args:
+            stream: Optional stream the returned statistics print to.
+
+        Returns:
+            The aggregated statistics, or None if nothing has been profiled.
+        """
+        paths = sorted(
+            glob.glob(
+                os.path.join(
+                    glob.escape(self.directory), f"*.{self.run_id}.*{PROFILE_SUFFIX}"
+                )
+            )
+        )
+        if not paths:
+            return None
+        return pstats.Stats(*paths, stream=stream)
+
+    def write_report(self) -> Optional[str]:
+        """Writes the aggregated statistics and a plain-text summary.
+
+        The merged statistics are dumped to 'merged.pstats' for tools such as
+        snakeviz; 'summary.txt' lists the top functions by cumulative time.
+
+        Returns:
+            The path of the summary file, or None if nothing has been profiled.
+        """
+        summary_path = os.path.join(self.directory, SUMMARY_FILE)
+        with open(summary_path, "w") as summary:
+            stats = self.merge(stream=summary)
+            if stats is None:
+                summary.write("No profiling data found.\n")
+                logger.warning(f"No profiling data found in '{self.directory}'")
+                return None
+            stats.dump_stats(os.path.join(self.directory, MERGED_PROFILE))
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.limit)
+        logger.info(f"Saved profile report '{summary_path}'")
+        return summary_path
+
+
+def optional_profile(
+    profiler: Optional[RenderProfiler], name: str
+) -> ContextManager[None]:
+    """Profiles a section if a profiler is given.
+
+    Args:
+        profiler: An optional RenderProfiler.
+        name: The name of the profiled section.
+
+    Returns:
+        The profiler's context for the section, or a context doing nothing.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.profile(name)
+
+
+@contextmanager
+def profile_run(directory: Optional[str]) -> Iterator[Optional[RenderProfiler]]:
+    """Creates the profiler of a run and writes its report when the run ends.
+
+    The report is written even if the run fails, e.g. because renders failed.
+
+    Args:
+        directory: The profile directory, or None to profile nothing.
+
+    Yields:
+        The profiler, or None without a directory.
+    """
+    if directory is None:
+        yield None
+        return
+    profiler = RenderProfiler(directory)
+    try:
+        yield profiler
+    finally:
+        profiler.write_report()
@@ -0,0 +1,349 @@
+import functools
+import io
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Tuple,
+    TypeVar,
+    Union,
+    runtime_checkable,
+)
+
+import numpy as np
+
+from .engines import RenderEngine
+from .sinks import ArchiveSink, DirectorySink, OutputRecord, write_bytes
+from .tesseract import PlotParameters
+
+RASTER_FORMATS = ("png", "webp")
+DEFAULT_PNG_COMPRESSION = 6
+# The number of jobs waiting for the encoder, each holding the images it writes.
+ENCODER_QUEUE_DEPTH = 2
+
+T = TypeVar("T")
+
+
+@runtime_checkable
+class RasterizingEngine(Protocol):
+    """A render engine that can hand out the pixels of a drawing.
+
+    Raster outputs of such engines are encoded by `encode_pixels`, so that the
+    encoding can run apart from the drawing, e.g. on a `BackgroundEncoder`.
+    """
+
+    name: str
+
+    def prepare(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> Any: ...
+
+    def draw(self, scene: Any, plot_params: PlotParameters) -> Any: ...
+
+    def rasterize(self, drawing: Any, plot_params: PlotParameters) -> np.ndarray: ...
+
+
+def check_raster_options(plot_params: PlotParameters) -> None:
+    """Checks the raster encoding options of plot parameters.
+
+    Args:
+        plot_params: The plot parameters.
+
+    Raises:
+        ValueError: If an option is not an integer in its range.
+    """
+    for description, value, low, high in (
+        ("PNG compression level", plot_params.png_compression, 0, 9),
+        ("number of PNG palette colors", plot_params.png_colors, 2, 256),
+        ("WebP quality", plot_params.webp_quality, 0, 100),
+    ):
+        if value is not None and (
+            not isinstance(value, int) or not low <= value <= high
+        ):
+            raise ValueError(
+                f"The {description} must be an integer from {low} to {high}."
+            )
+
+
+def encode_pixels(
+    pixels: np.ndarray, output_format: str, plot_params: PlotParameters
+) -> bytes:
+    """Encodes RGBA pixels as PNG or WebP with Pillow.
+
+    PNG images are compressed with the plot's zlib level and, if it sets a
+    number of palette colors, quantized to an indexed palette with alpha, which
+    suits the few flat colors and antialiased edges of the blocks. WebP images
+    are lossless unless the plot sets a quality.
+
+    Args:
+        pixels: A uint8 array of shape (height, width, 4).
+        output_format: 'png' or 'webp'.
+        plot_params: A PlotParameters object containing the encoding options.
+
+    Returns:
+        The encoded image.
+
+    Raises:
+        ValueError: If the format is not a raster format, or Pillow was built
+            without WebP support.
+    """
+    from PIL import Image, features
+
+    image = Image.fromarray(np.ascontiguousarray(pixels))
+    output = io.BytesIO()
+    dpi = (plot_params.dpi, plot_params.dpi)
+    if output_format == "png":
+        if plot_params.png_colors is not None:
+            image = image.quantize(
+                plot_params.png_colors, method=Image.Quantize.FASTOCTREE
+            )
+        compression = plot_params.png_compression
+        image.save(
+            output,
+            format="PNG",
+            dpi=dpi,
+            compress_level=(
+                DEFAULT_PNG_COMPRESSION if compression is None else compression
+            ),
+        )
+    elif output_format == "webp":
+        if not features.check("webp"):
+            raise ValueError(
+                "This Pillow build cannot write WebP. Install Pillow with libwebp, e.g. the wheels from PyPI."
+            )
+        quality = plot_params.webp_quality
+        image.save(
+            output,
+            format="WEBP",
+            dpi=dpi,
+            lossless=quality is None,
+            **({} if quality is None else {"quality": quality}),
+        )
+    else:
+        raise ValueError(
+            f"Invalid raster format: '{output_format}'. Options: {', '.join(RASTER_FORMATS)}."
+        )
+    return output.getvalue()
+
+
+def render_pixels(
+    engine: RasterizingEngine,
+    coordinates: List[Tuple[int, int, int]],
+    plot_params: PlotParameters,
+) -> np.ndarray:
+    """Prepares, draws and rasterizes an unfolding without encoding it.
+
+    Args:
+        engine: The render engine.
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+        plot_params: A PlotParameters object containing the plot configuration.
+
+    Returns:
+        The pixels, a uint8 array of shape (height, width, 4).
+    """
+    scene = engine.prepare(coordinates, plot_params)
+    return engine.rasterize(engine.draw(scene, plot_params), plot_params)
+
+
+class RasterCache:
+    """Keeps the pixels of the last drawing a render loop rasterized.
+
+    The raster formats of one drawing, e.g. PNG and WebP, are then encoded from
+    the same pixels, so the drawing is rasterized only once. The kept pixels are
+    read-only, since several encoders share them.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty cache."""
+        self.key: Optional[
+            Tuple[RasterizingEngine, List[Tuple[int, int, int]], PlotParameters]
+        ] = None
+        self.pixels: Optional[np.ndarray] = None
+
+    def pixels_for(
+        self,
+        engine: RasterizingEngine,
+        coordinates: List[Tuple[int, int, int]],
+        plot_params: PlotParameters,
+    ) -> np.ndarray:
+        """Returns the pixels of a drawing, rasterizing it unless it was the last one.
+
+        Args:
+            engine: The render engine.
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            The read-only pixels, a uint8 array of shape (height, width, 4).
+        """
+        if (
+            self.pixels is None
+            or self.key is None
+            or self.key[0] is not engine
+            or self.key[1] is not coordinates
+            or self.key[2] != plot_params
+        ):
+            self.pixels = None
+            pixels = render_pixels(engine, coordinates, plot_params)
+            pixels.flags.writeable = False
+            self.key, self.pixels = (engine, coordinates, plot_params), pixels
+        return self.pixels
+
+
+class PendingImage(NamedTuple):
+    """An image rendered into memory but not yet written to a sink.
+
+    Attributes:
+        name: The name of the image within the sink.
+        output_format: The file format of the image.
+        plot_params: The plot parameters, which hold the encoding options.
+        metadata: Optional fields describing the image, e.g. for an archive manifest.
+        content: The encoded image, or the RGBA pixels of a raster image that
+            is still to be encoded.
+        seconds: The time spent rendering the image so far.
+    """
+
+    name: str
+    output_format: str
+    plot_params: PlotParameters
+    metadata: Optional[Dict[str, Any]]
+    content: Union[bytes, np.ndarray]
+    seconds: float
+
+
+def render_image(
+    engine: RenderEngine,
+    coordinates: List[Tuple[int, int, int]],
+    plot_params: PlotParameters,
+    output_format: str,
+    name: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    cache: Optional[RasterCache] = None,
+) -> PendingImage:
+    """Renders one image into memory.
+
+    Raster images of a `RasterizingEngine` are only drawn, so that their
+    encoding can run apart from the drawing, e.g. on a `BackgroundEncoder`.
+    Other images are rendered completely.
+
+    Args:
+        engine: The render engine.
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+        plot_params: A PlotParameters object containing the plot configuration.
+        output_format: The file format for the output image.
+        name: The name of the image within the sink.
+        metadata: Optional fields describing the image, e.g. for an archive manifest.
+        cache: An optional RasterCache, which shares the pixels of a drawing
+            between its consecutive raster images.
+
+    Returns:
+        The rendered image.
+    """
+    start = time.perf_counter()
+    content: Union[bytes, np.ndarray]
+    if output_format in RASTER_FORMATS and isinstance(engine, RasterizingEngine):
+        content = (
+            cache.pixels_for(engine, coordinates, plot_params)
+            if cache is not None
+            else render_pixels(engine, coordinates, plot_params)
+        )
+    else:
+        buffer = io.BytesIO()
+        engine.plot_3d_blocks(coordinates, plot_params, output_format, buffer)
+        content = buffer.getvalue()
+    return PendingImage(
+        name,
+        output_format,
+        plot_params,
+        metadata,
+        content,
+        time.perf_counter() - start,
+    )
+
+
+def write_images(
+    sink: Union[DirectorySink, ArchiveSink], images: List[PendingImage]
+) -> List[Tuple[OutputRecord, float]]:
+    """Encodes rendered images and writes them to a sink.
+
+    All images are encoded before the first one is written, so that a failed
+    encoding leaves nothing of the images in the sink.
+
+    Args:
+        sink: The DirectorySink or ArchiveSink receiving the images.
+        images: The rendered images.
+
+    Returns:
+        The record of every written image and the total time spent rendering,
+        encoding and writing it.
+    """
+    encoded = []
+    for image in images:
+        start = time.perf_counter()
+        data = (
+            image.content
+            if isinstance(image.content, bytes)
+            else encode_pixels(image.content, image.output_format, image.plot_params)
+        )
+        encoded.append((image, data, image.seconds + time.perf_counter() - start))
+    written = []
+    for image, data, seconds in encoded:
+        start = time.perf_counter()
+        record = sink.write(
+            image.name, functools.partial(write_bytes, data=data), image.metadata
+        )
+        written.append((record, seconds + time.perf_counter() - start))
+    return written
+
+
+class BackgroundEncoder:
+    """Encodes and writes images on one background thread.
+
+    While the encoder compresses an image, which Pillow does without holding
+    the interpreter lock, the calling thread can already draw the next one.
+    Jobs run in the order they were submitted. At most `ENCODER_QUEUE_DEPTH`
+    jobs wait at a time, which bounds the memory held by drawn pixels.
+    """
+
+    def __init__(self, depth: int = ENCODER_QUEUE_DEPTH) -> None:
+        """Starts the encoder thread.
+
+        Args:
+            depth: The number of jobs that may wait for the encoder.
+        """
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chronotva-encoder"
+        )
+        self.pending: "Deque[Future[Any]]" = deque()
+
+    def submit(self, job: Callable[[], T]) -> "Future[T]":
+        """Queues a job, first waiting while too many jobs are queued.
+
+        Args:
+            job: The job, e.g. encoding an image and writing it to a sink.
+
+        Returns:
+            The future result of the job. Errors of the job are raised by its
+            `result`.
+        """
+        while self.pending and (
+            self.pending[0].done() or len(self.pending) >= self.depth
+        ):
+            # Waits for the oldest job without raising its error.
+            self.pending.popleft().exception()
+        future = self.executor.submit(job)
+        self.pending.append(future)
+        return future
+
+    def close(self) -> None:
+        """Waits for the running job, drops the queued ones and stops the thread."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
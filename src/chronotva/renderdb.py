@@ -0,0 +1,262 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from .tesseract import PlotParameters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    id INTEGER PRIMARY KEY,
+    unfolding_id INTEGER NOT NULL,
+    parameters TEXT NOT NULL,
+    parameters_hash TEXT NOT NULL,
+    format TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    location TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    render_seconds REAL NOT NULL,
+    rendered_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renders_by_parameters
+    ON renders (parameters_hash, unfolding_id, format, engine);
+CREATE INDEX IF NOT EXISTS renders_by_content ON renders (content_hash);
+"""
+COLUMNS = (
+    "unfolding_id",
+    "parameters",
+    "parameters_hash",
+    "format",
+    "engine",
+    "location",
+    "content_hash",
+    "bytes",
+    "render_seconds",
+    "rendered_at",
+)
+DEFAULT_BATCH_SIZE = 200
+
+
+class RenderRow(NamedTuple):
+    """One recorded output.
+
+    Attributes:
+        unfolding_id: The ID of the rendered unfolding.
+        parameters: The normalized plot parameters. See `normalize_parameters`.
+        parameters_hash: The SHA-256 of the normalized parameters.
+        output_format: The file format of the output.
+        engine: The name of the render engine.
+        location: Where the output was written, e.g. a file path or archive member.
+        content_hash: The SHA-256 of the output.
+        size: The size of the output in bytes.
+        render_seconds: The time spent rendering and saving the output.
+        rendered_at: When the output was written, in ISO 8601 format (UTC).
+    """
+
+    unfolding_id: int
+    parameters: str
+    parameters_hash: str
+    output_format: str
+    engine: str
+    location: str
+    content_hash: str
+    size: int
+    render_seconds: float
+    rendered_at: str
+
+
+def normalize_value(value: Any) -> Any:
+    """Converts a parameter value to a canonical JSON-compatible value.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The value with all numbers except booleans as floats and all
+        sequences as lists.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(item) for item in value]
+    return value
+
+
+def normalize_parameters(plot_params: PlotParameters) -> str:
+    """Returns a canonical JSON form of plot parameters.
+
+    Equal parameters always give the same text, e.g. whether a view angle was
+    given as an integer or a float, so it can be compared and hashed to find
+    outputs rendered with the same settings.
+
+    Args:
+        plot_params: The plot parameters.
+
+    Returns:
+        The parameters as compact JSON with sorted keys.
+    """
+    return json.dumps(
+        {name: normalize_value(value) for name, value in plot_params._asdict().items()},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+def file_sha256(path: str) -> str:
+    """Returns the SHA-256 of a file.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as output_file:
+        for block in iter(lambda: output_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RenderCatalogue:
+    """A SQLite database recording every rendered output.
+
+    Rows are collected in memory and written in one transaction per batch, so
+    recording costs little per output. The database uses write-ahead logging,
+    so it can be queried while a run records into it.
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """Opens or creates the database.
+
+        Args:
+            path: The path of the SQLite database file.
+            batch_size: The number of rows written per transaction.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.pending: List[RenderRow] = []
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def add(
+        self,
+        unfolding_id: int,
+        plot_params: PlotParameters,
+        output_format: str,
+        engine: str,
+        location: str,
+        content_hash: str,
+        size: int,
+        render_seconds: float,
+    ) -> None:
+        """Records an output, writing the batch once it is full.
+
+        Args:
+            unfolding_id: The ID of the rendered unfolding.
+            plot_params: The plot parameters of the output.
+            output_format: The file format of the output.
+            engine: The name of the render engine.
+            location: Where the output was written.
+            content_hash: The SHA-256 of the output.
+            size: The size of the output in bytes.
+            render_seconds: The time spent rendering and saving the output.
+        """
+        parameters = normalize_parameters(plot_params)
+        self.pending.append(
+            RenderRow(
+                unfolding_id,
+                parameters,
+                hashlib.sha256(parameters.encode()).hexdigest(),
+                output_format,
+                engine,
+                location,
+                content_hash,
+                size,
+                render_seconds,
+                datetime.datetime.now(datetime.timezone.utc).isoformat(
+                    timespec="seconds"
+                ),
+            )
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the collected rows in one transaction."""
+        if not self.pending:
+            return
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO renders ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                self.pending,
+            )
+        self.pending = []
+
+    def lookup(
+        self,
+        unfolding_id: int,
+        plot_params: PlotParameters,
+        output_format: str,
+        engine: str,
+    ) -> Optional[RenderRow]:
+        """Finds the latest output rendered with the same settings.
+
+        Args:
+            unfolding_id: The ID of the unfolding.
+            plot_params: The plot parameters.
+            output_format: The file format.
+            engine: The name of the render engine.
+
+        Returns:
+            The latest matching row, or None if there is none.
+        """
+        self.flush()
+        parameters = normalize_parameters(plot_params)
+        row = self.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM renders WHERE parameters_hash = ? AND unfolding_id = ? AND format = ? AND engine = ? ORDER BY id DESC LIMIT 1",
+            (
+                hashlib.sha256(parameters.encode()).hexdigest(),
+                unfolding_id,
+                output_format,
+                engine,
+            ),
+        ).fetchone()
+        return RenderRow(*row) if row is not None else None
+
+    def duplicates(self) -> List[Tuple[str, List[str]]]:
+        """Finds outputs with identical content at several locations.
+
+        Returns:
+            The content hashes that occur at more than one location, with their
+            sorted locations.
+        """
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT content_hash, location FROM renders WHERE content_hash IN (SELECT content_hash FROM renders GROUP BY content_hash HAVING COUNT(DISTINCT location) > 1) GROUP BY content_hash, location ORDER BY content_hash, location"
+        ).fetchall()
+        groups: List[Tuple[str, List[str]]] = []
+        for content_hash, location in rows:
+            if not groups or groups[-1][0] != content_hash:
+                groups.append((content_hash, []))
+            groups[-1][1].append(location)
+        return groups
+
+    def close(self) -> None:
+        """Writes the remaining rows and closes the database."""
+        self.flush()
+        self.connection.close()
+        logger.info(f"Recorded the outputs in '{self.path}'")
@@ -0,0 +1,368 @@
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import tempfile
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+
+from .profiling import RenderProfiler, optional_profile
+
+logger = logging.getLogger(__name__)
+
+COORDINATES_FILE = "coordinates.npy"
+INDEX_FILE = "index.npy"
+
+# The messages workers send about their tasks.
+TASK_STARTED = "started"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+# The message a worker sends before it exits at one of its limits.
+WORKER_RECYCLED = "recycled"
+# How often the pool checks for workers that exited, in seconds.
+POLL_SECONDS = 0.2
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+Coordinates = List[Tuple[int, int, int]]
+
+
+class SharedCatalogue(Mapping[int, Coordinates]):
+    """The block coordinates of unfoldings in memory-mapped files.
+
+    The catalogue is written once by the parent process and opened memory-mapped
+    by every worker, so all processes read the same pages instead of receiving
+    pickled copies of the coordinates with their tasks. It behaves like the
+    dictionary mapping unfolding IDs to block coordinates it was created from.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Opens a catalogue written by `create`.
+
+        Args:
+            directory: The directory holding the catalogue files.
+        """
+        self.directory = directory
+        self.coordinates = np.load(
+            os.path.join(directory, COORDINATES_FILE), mmap_mode="r"
+        )
+        self.ranges: Dict[int, Tuple[int, int]] = {
+            unfolding_id: (start, stop)
+            for unfolding_id, start, stop in np.load(
+                os.path.join(directory, INDEX_FILE)
+            ).tolist()
+        }
+
+    @classmethod
+    def create(
+        cls, data: Mapping[int, Coordinates], directory: str
+    ) -> "SharedCatalogue":
+        """Writes a catalogue and opens it.
+
+        Args:
+            data: A mapping of unfolding IDs to lists of block coordinates.
+            directory: The existing directory receiving the catalogue files.
+
+        Returns:
+            The opened catalogue.
+        """
+        counts = [len(coordinates) for coordinates in data.values()]
+        stops = np.cumsum(counts, dtype=np.int64)
+        np.save(
+            os.path.join(directory, INDEX_FILE),
+            np.stack(
+                [
+                    np.fromiter(data, dtype=np.int64, count=len(data)),
+                    stops - counts,
+                    stops,
+                ],
+                axis=1,
+            ).reshape(-1, 3),
+        )
+        np.save(
+            os.path.join(directory, COORDINATES_FILE),
+            np.array(
+                [point for coordinates in data.values() for point in coordinates],
+                dtype=np.int32,
+            ).reshape(-1, 3),
+        )
+        return cls(directory)
+
+    def __getitem__(self, unfolding_id: int) -> Coordinates:
+        start, stop = self.ranges[unfolding_id]
+        return [(x, y, z) for x, y, z in self.coordinates[start:stop].tolist()]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+
+class WorkerLimits(NamedTuple):
+    """Limits after which a pool worker is replaced by a fresh process.
+
+    Long-running matplotlib processes keep growing, so recycling workers keeps
+    the memory of long sweeps bounded.
+
+    Attributes:
+        max_tasks: The number of tasks after which a worker exits, or None.
+        max_memory: The resident memory in MiB above which a worker exits after
+            its current task, or None. Ignored where it cannot be measured.
+    """
+
+    max_tasks: Optional[int] = None
+    max_memory: Optional[int] = None
+
+
+def resident_memory() -> Optional[int]:
+    """Returns the resident memory of this process.
+
+    Returns:
+        The resident set size in bytes, the peak resident set size where only
+        that is available, or None where neither can be measured.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+# The state of a pool worker, set once by `init_worker` when the worker starts.
+worker_catalogue: Optional[SharedCatalogue] = None
+worker_items: List[Any] = []
+
+
+def init_worker(
+    directory: str, items: List[Any], initializer: Optional[Callable[[], None]]
+) -> None:
+    """Prepares a new pool worker.
+
+    Args:
+        directory: The directory of the shared catalogue.
+        items: The items of the pool, addressed by position in its tasks.
+        initializer: An optional function setting up the render context of the
+            process, such as importing and warming up the engine.
+    """
+    global worker_catalogue, worker_items
+    worker_catalogue = SharedCatalogue(directory)
+    worker_items = items
+    if initializer is not None:
+        initializer()
+
+
+def portable_error(error: Exception) -> Exception:
+    """Returns an exception that can be sent to the parent process.
+
+    Args:
+        error: The exception raised by a task.
+
+    Returns:
+        The exception itself if it can be pickled, otherwise a RuntimeError
+        with its description.
+    """
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def worker_loop(
+    function: Callable[[Any, Mapping[int, Coordinates]], Any],
+    directory: str,
+    items: List[Any],
+    initializer: Optional[Callable[[], None]],
+    limits: WorkerLimits,
+    tasks: Any,
+    results: Any,
+    profiler: Optional[RenderProfiler] = None,
+) -> None:
+    """Runs tasks in a worker process until it is stopped or reaches a limit.
+
+    The worker reports the start and outcome of every task, so that the pool
+    knows which task a worker was running if it dies, and announces when it
+    exits at a limit, so that the pool replaces it at once.
+
+    Args:
+        function: The function run on every item.
+        directory: The directory of the shared catalogue.
+        items: The items of the pool.
+        initializer: An optional function run once when the worker starts.
+        limits: The limits after which the worker exits.
+        tasks: The queue of item positions, ending with None.
+        results: The queue receiving (event, pid, position, value) messages.
+        profiler: An optional profiler of the run. Every task is dumped to its
+            own file, which the parent merges with those of the other workers.
+    """
+    init_worker(directory, items, initializer)
+    assert worker_catalogue is not None
+    pid = os.getpid()
+    completed = 0
+    while True:
+        position = tasks.get()
+        if position is None:
+            return
+        results.put((TASK_STARTED, pid, position, None))
+        try:
+            with optional_profile(profiler, f"task_{position}"):
+                value = function(worker_items[position], worker_catalogue)
+            results.put((TASK_DONE, pid, position, value))
+        except Exception as error:
+            results.put((TASK_FAILED, pid, position, portable_error(error)))
+        completed += 1
+        memory = resident_memory() if limits.max_memory is not None else None
+        if (limits.max_tasks is not None and completed >= limits.max_tasks) or (
+            memory is not None
+            and limits.max_memory is not None
+            and memory > limits.max_memory * 2**20
+        ):
+            usage = f" at {memory / 2**20:.0f} MiB" if memory is not None else ""
+            logger.info(f"Recycling worker {pid} after {completed} tasks{usage}")
+            results.put((WORKER_RECYCLED, pid, None, None))
+            return
+
+
+def map_shared(
+    function: Callable[[Item, Mapping[int, Coordinates]], Result],
+    items: List[Item],
+    data: Mapping[int, Coordinates],
+    jobs: int,
+    initializer: Optional[Callable[[], None]] = None,
+    limits: WorkerLimits = WorkerLimits(),
+    profiler: Optional[RenderProfiler] = None,
+) -> Iterator[Tuple[int, Result]]:
+    """Runs a function on every item in a pool of workers sharing the coordinates.
+
+    The coordinates are written to a temporary shared catalogue and the items
+    are handed to every worker once, when it starts, so each task only carries
+    the position of its item. Tasks are started in item order: every worker
+    pulls the next one from a shared queue as soon as it is idle, so that no
+    worker waits while others have tasks left over. A worker that reaches one
+    of the limits is replaced by a new one while tasks remain.
+
+    Args:
+        function: A module-level function called with an item and the catalogue.
+        items: The items.
+        data: A mapping of unfolding IDs to lists of block coordinates, holding
+            every unfolding the items need.
+        jobs: The number of worker processes.
+        initializer: An optional module-level function run once in every worker
+            before its first task.
+        limits: The limits after which workers are replaced.
+        profiler: An optional profiler whose run ID every worker dumps its tasks
+            under, so that `RenderProfiler.write_report` merges them.
+
+    Yields:
+        The position of every item and its result, in the order the items
+        finish.
+
+    Raises:
+        RuntimeError: If a worker dies while running a task.
+        Exception: Any exception raised by the function.
+    """
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    results = context.Queue()
+    for position in range(len(items)):
+        tasks.put(position)
+
+    with tempfile.TemporaryDirectory(prefix="chronotva-") as directory:
+        SharedCatalogue.create(data, directory)
+        workers: Dict[int, Any] = {}
+        running: Dict[int, int] = {}
+
+        def start_worker() -> None:
+            worker = context.Process(
+                target=worker_loop,
+                args=(
+                    function,
+                    directory,
+                    items,
+                    initializer,
+                    limits,
+                    tasks,
+                    results,
+                    profiler,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            assert worker.pid is not None
+            workers[worker.pid] = worker
+
+        try:
+            for _ in range(min(jobs, len(items))):
+                start_worker()
+            finished = 0
+            # Workers that died are found on every iteration, but only reported
+            # once the results queue is empty on a later poll, so that their
+            # last messages, which they flush before exiting, are read first.
+            exited: Set[int] = set()
+            while finished < len(items):
+                try:
+                    event, pid, position, value = results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    event = None
+                if event == TASK_STARTED:
+                    running[pid] = position
+                elif event == TASK_DONE:
+                    running.pop(pid, None)
+                    finished += 1
+                    yield position, value
+                elif event == TASK_FAILED:
+                    raise value
+                elif event == WORKER_RECYCLED:
+                    # Replaced right away, so the pool keeps its size while
+                    # results keep coming in.
+                    workers.pop(pid).join()
+                    if len(workers) < len(items) - finished:
+                        start_worker()
+                elif exited:
+                    pid = min(exited)
+                    task = (
+                        f" while rendering task {running[pid]}"
+                        if pid in running
+                        else ""
+                    )
+                    raise RuntimeError(
+                        f"A worker process exited with code {workers[pid].exitcode}{task}."
+                    )
+                exited = {
+                    pid
+                    for pid, worker in workers.items()
+                    if worker.exitcode is not None
+                }
+        finally:
+            for _ in workers:
+                tasks.put(None)
+            for worker in workers.values():
+                worker.join(timeout=POLL_SECONDS)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            tasks.close()
+            results.close()
@@ -0,0 +1,273 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+TAR_MODES = {
+    ".tar": "w|",
+    ".tar.gz": "w|gz",
+    ".tgz": "w|gz",
+    ".tar.bz2": "w|bz2",
+    ".tar.xz": "w|xz",
+}
+ZSTD_SUFFIXES = (".tar.zst", ".tar.zstd")
+STORED_FORMATS = ("png", "webp", "svgz")
+# The earliest time a zip member can have, used for all members of reproducible
+# archives. Their tar members have the modification time 0 instead.
+REPRODUCIBLE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+OutputTarget = Union[str, BinaryIO]
+Renderer = Callable[[OutputTarget], None]
+
+
+def write_bytes(output_path: OutputTarget, data: bytes) -> None:
+    """Writes encoded output to a file path or binary stream.
+
+    Args:
+        output_path: The file path or binary stream.
+        data: The encoded output.
+    """
+    if isinstance(output_path, str):
+        with open(output_path, "wb") as output_file:
+            output_file.write(data)
+    else:
+        output_path.write(data)
+
+
+class OutputRecord(NamedTuple):
+    """Describes a written output.
+
+    Attributes:
+        location: Where the output was written, e.g. a file path or archive member.
+        size: The size of the output in bytes.
+        sha256: The SHA-256 of the output if the sink computed it, otherwise None.
+    """
+
+    location: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class DirectorySink:
+    """Writes every output to its own file below an output directory."""
+
+    def __init__(self, directory: str) -> None:
+        """Initializes the sink.
+
+        Args:
+            directory: The directory receiving the outputs. It must already exist.
+        """
+        self.directory = directory
+
+    def prepare(self, names: Iterable[str]) -> None:
+        """Creates the subdirectories of all outputs of a run at once.
+
+        Args:
+            names: The names of all outputs, relative to the output directory.
+        """
+        directories = {
+            os.path.dirname(os.path.join(self.directory, name)) for name in names
+        }
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
+
+    def write(
+        self, name: str, render: Renderer, metadata: Optional[Dict[str, Any]] = None
+    ) -> OutputRecord:
+        """Renders an output straight into its file.
+
+        Args:
+            name: The file name of the output, relative to the output directory.
+            render: A callable that saves the output to the path it is given.
+            metadata: Unused; accepted for compatibility with ArchiveSink.
+
+        Returns:
+            The path and size of the written file.
+        """
+        path = os.path.join(self.directory, name)
+        render(path)
+        return OutputRecord(path, os.path.getsize(path) if os.path.exists(path) else 0)
+
+    def close(self) -> None:
+        """Does nothing; every file is complete once it has been written."""
+
+
+class ArchiveSink:
+    """Streams outputs from memory into a single tar or zip archive.
+
+    Supported archive types are '.zip', '.tar', '.tar.gz'/'.tgz', '.tar.bz2',
+    '.tar.xz' and '.tar.zst'. A 'manifest.json' member listing every output with
+    its size, SHA-256 and metadata is appended when the sink is closed.
+    """
+
+    def __init__(self, path: str, reproducible: bool = False) -> None:
+        """Opens the archive for writing.
+
+        Args:
+            path: The path of the archive. Its suffix selects the archive type.
+            reproducible: Whether to give every member, and the gzip header of
+                '.tar.gz' archives, a fixed time instead of the current one, so
+                equal outputs give byte-identical archives.
+
+        Raises:
+            ValueError: If the suffix is not supported, or zstandard is needed but
+                not installed.
+        """
+        self.path = path
+        self.reproducible = reproducible
+        self.entries: List[Dict[str, Any]] = []
+        self.zip_file: Optional[zipfile.ZipFile] = None
+        self.tar_file: Optional[tarfile.TarFile] = None
+        self.stream: Optional[Union[IO[bytes], gzip.GzipFile]] = None
+
+        lower_path = path.lower()
+        tar_mode = next(
+            (mode for suffix, mode in TAR_MODES.items() if lower_path.endswith(suffix)),
+            None,
+        )
+        if not lower_path.endswith((".zip", *ZSTD_SUFFIXES)) and tar_mode is None:
+            raise ValueError(
+                f"Unsupported archive type: '{path}'. Use .zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .tar.zst."
+            )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if lower_path.endswith(".zip"):
+            self.zip_file = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        elif lower_path.endswith(ZSTD_SUFFIXES):
+            self.stream = open_zstd_writer(path)
+            self.tar_file = tarfile.open(fileobj=self.stream, mode="w|")
+        elif reproducible and tar_mode == "w|gz":
+            # tarfile would write the current time into the gzip header.
+            self.stream = gzip.GzipFile(path, "wb", mtime=0)
+            self.tar_file = tarfile.open(fileobj=self.stream, mode="w|")
+        else:
+            self.tar_file = tarfile.open(path, mode=tar_mode)  # type: ignore[call-overload]
+
+    def prepare(self, names: Iterable[str]) -> None:
+        """Does nothing; archive members need no directories.
+
+        Args:
+            names: The names of all outputs of the run.
+        """
+
+    def write(
+        self, name: str, render: Renderer, metadata: Optional[Dict[str, Any]] = None
+    ) -> OutputRecord:
+        """Renders an output into memory and appends it to the archive.
+
+        Args:
+            name: The member name of the output inside the archive.
+            render: A callable that saves the output to the binary stream it is given.
+            metadata: Optional fields recorded with the output in the manifest.
+
+        Returns:
+            The archive member, its size and its SHA-256.
+        """
+        buffer = io.BytesIO()
+        render(buffer)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        self.add(name, data)
+        self.entries.append(
+            {"name": name, "bytes": len(data), "sha256": digest, **(metadata or {})}
+        )
+        return OutputRecord(f"{self.path}:{name}", len(data), digest)
+
+    def add(self, name: str, data: bytes) -> None:
+        """Appends a member to the archive.
+
+        Args:
+            name: The member name.
+            data: The member content.
+        """
+        if self.zip_file is not None:
+            compression = (
+                zipfile.ZIP_STORED
+                if name.rsplit(".", 1)[-1].lower() in STORED_FORMATS
+                else zipfile.ZIP_DEFLATED
+            )
+            zip_info = zipfile.ZipInfo(
+                name,
+                (
+                    REPRODUCIBLE_DATE_TIME
+                    if self.reproducible
+                    else time.localtime(time.time())[:6]
+                ),
+            )
+            zip_info.compress_type = compression
+            zip_info.external_attr = 0o644 << 16
+            self.zip_file.writestr(zip_info, data)
+        elif self.tar_file is not None:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 0 if self.reproducible else int(time.time())
+            info.mode = 0o644
+            self.tar_file.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        """Appends the manifest and closes the archive."""
+        manifest = json.dumps({"outputs": self.entries}, indent=2).encode()
+        self.add(MANIFEST_NAME, manifest)
+        if self.zip_file is not None:
+            self.zip_file.close()
+        if self.tar_file is not None:
+            self.tar_file.close()
+        if self.stream is not None:
+            self.stream.close()
+        logger.info(f"Saved archive '{self.path}' with {len(self.entries)} outputs")
+
+
+def open_zstd_writer(path: str) -> IO[bytes]:
+    """Opens a zstd-compressed file for streaming writes.
+
+    Python's own `compression.zstd` module is used where available (3.14+),
+    otherwise the optional `zstandard` package.
+
+    Args:
+        path: The path of the compressed file.
+
+    Returns:
+        A writable binary stream that compresses into the file.
+
+    Raises:
+        ValueError: If no zstd implementation is available.
+    """
+    try:
+        from compression import zstd  # type: ignore
+
+        return zstd.ZstdFile(path, "w")  # type: ignore[no-any-return]
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore
+    except ImportError:
+        raise ValueError(
+            "Writing .tar.zst archives requires the 'zstandard' package. Install it with 'pip install chronotva[zstd]'."
+        )
+    return zstandard.ZstdCompressor().stream_writer(  # type: ignore[no-any-return]
+        open(path, "wb")
+    )
@@ -0,0 +1,1030 @@
+import datetime
+import functools
+import heapq
+import itertools
+import logging
+import math
+import sys
+import time
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from .costs import CostModel, output_keys
+from .engines import (
+    DEFAULT_ENGINE,
+    check_formats,
+    create_engine,
+    process_engine,
+    warm_engine,
+)
+from .geometry import uniform_extent
+from .naming import OutputKey, OutputNamer
+from .profiling import RenderProfiler, optional_profile
+from .raster import (
+    BackgroundEncoder,
+    RasterCache,
+    check_raster_options,
+    render_image,
+    write_images,
+)
+from .shared import WorkerLimits, map_shared
+from .sinks import DirectorySink, OutputRecord
+from .tesseract import (
+    OUTPUT_FORMATS,
+    Palette,
+    PlotParameters,
+    parse_palettes,
+    parse_rgba_list,
+)
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+JOB_KEYS = (
+    "output_dir",
+    "unfolding_ids",
+    "jobs",
+    "output_template",
+    "shard_depth",
+    "max_tasks_per_worker",
+    "max_worker_memory",
+    "cost_model",
+)
+RENDER_DEFAULTS: Dict[str, Any] = {
+    "block_color": "230,230,230,1",
+    "edge_color": "25,25,25,1",
+    "dpi": 300,
+    "transparent": True,
+    "shade": False,
+    "show_axes": False,
+    "reproducible": False,
+    "svg_precision": None,
+    "png_compression": None,
+    "png_colors": None,
+    "webp_quality": None,
+    "whitespace_removal": True,
+    "uniform_scale": False,
+    "engine": DEFAULT_ENGINE,
+}
+BOOLEAN_RENDER_KEYS = (
+    "transparent",
+    "shade",
+    "show_axes",
+    "reproducible",
+    "whitespace_removal",
+    "uniform_scale",
+)
+SWEEP_KEYS = ("palettes", "views", "sizes", "formats")
+DEFAULT_VIEW = (30.0, 22.5)
+DEFAULT_SIZE = (1440, 1920)
+
+# Render times and output sizes of the default engine, measured on the default
+# data. Recorded timings and sizes of a cost model take precedence.
+SCENE_SECONDS = 0.045
+ENCODE_SECONDS = {
+    "png": 0.035,
+    "webp": 0.035,
+    "svg": 0.035,
+    "svgz": 0.037,
+    "pdf": 0.04,
+}
+SECONDS_PER_MEGAPIXEL = {
+    "png": 0.075,
+    "webp": 0.07,
+    "svg": 0.012,
+    "svgz": 0.012,
+    "pdf": 0.014,
+}
+OUTPUT_BYTES = {"png": 0, "webp": 0, "svg": 10500, "svgz": 1700, "pdf": 2200}
+# Raster sizes grow with the outline of the blocks, i.e. the root of the pixels.
+BYTES_PER_PIXEL_ROOT = {"png": 40, "webp": 13}
+
+
+class JobSpec(NamedTuple):
+    """A parameter sweep read from a job file.
+
+    Every selected unfolding is rendered in each combination of palette, view,
+    size and format.
+
+    Attributes:
+        output_dir: The directory receiving the outputs.
+        unfolding_ids: The IDs of the unfoldings to render, or None for all.
+        plot_params: The plot configuration shared by all renders.
+        palettes: The palettes, or an empty list to use the colors of plot_params.
+        views: The (elevation, azimuth) angles of the views.
+        sizes: The (width, height) sizes of the outputs in pixels.
+        formats: The file formats of the outputs.
+        jobs: The number of worker processes.
+        output_template: An optional template for the output names. See OutputNamer.
+        shard_depth: An optional number of hashed subdirectory levels.
+        engine: The name of the render engine. See `create_engine`.
+        limits: The limits after which worker processes are replaced.
+        cost_model: An optional JSON file with recorded render timings, used to
+            schedule and estimate the sweep and updated with its timings.
+    """
+
+    output_dir: str
+    unfolding_ids: Optional[List[int]]
+    plot_params: PlotParameters
+    palettes: List[Palette]
+    views: List[Tuple[float, float]]
+    sizes: List[Tuple[int, int]]
+    formats: List[str]
+    jobs: int = 1
+    output_template: Optional[str] = None
+    shard_depth: Optional[int] = None
+    engine: str = DEFAULT_ENGINE
+    limits: WorkerLimits = WorkerLimits()
+    cost_model: Optional[str] = None
+
+
+class SweepOutput(NamedTuple):
+    """One output of a sweep task.
+
+    Attributes:
+        palette: The palette of the output, or None to use the task's colors.
+        output_format: The file format of the output.
+        name: The name of the output, relative to the output directory.
+    """
+
+    palette: Optional[Palette]
+    output_format: str
+    name: str
+
+
+class RenderedOutput(NamedTuple):
+    """The measurements of a rendered output.
+
+    Attributes:
+        seconds: The time spent rendering and saving the output.
+        size: The size of the output in bytes.
+    """
+
+    seconds: float
+    size: int
+
+
+class SweepEstimate(NamedTuple):
+    """The predicted cost of a sweep.
+
+    Attributes:
+        outputs: The number of outputs.
+        tasks: The number of tasks.
+        workers: The number of worker processes that would run.
+        cpu_seconds: The total render time over all workers.
+        wall_seconds: The time until the last task finishes.
+        output_bytes: The total size of the outputs.
+    """
+
+    outputs: int
+    tasks: int
+    workers: int
+    cpu_seconds: float
+    wall_seconds: float
+    output_bytes: float
+
+
+class SweepTask(NamedTuple):
+    """The outputs of one unfolding that share a view and size.
+
+    All outputs of a task are rendered from one built scene, which is only
+    recolored for every palette and saved in every format.
+
+    Attributes:
+        output_dir: The directory receiving the outputs.
+        unfolding_id: The ID of the rendered unfolding.
+        plot_params: The plot configuration with the view and size of the task.
+        outputs: The outputs to render.
+        engine: The name of the render engine.
+    """
+
+    output_dir: str
+    unfolding_id: int
+    plot_params: PlotParameters
+    outputs: List[SweepOutput]
+    engine: str = DEFAULT_ENGINE
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    """Parses a pixel size of the form 'WIDTHxHEIGHT'.
+
+    Args:
+        value: The size, e.g. '800x600'.
+
+    Returns:
+        The width and height in pixels.
+
+    Raises:
+        ValueError: If the size is malformed or not positive.
+    """
+    try:
+        width, height = (int(part) for part in str(value).lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid size: '{value}'. Use WIDTHxHEIGHT in pixels.")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid size: '{value}'. The size must be positive.")
+    return width, height
+
+
+def format_size(size: Tuple[int, int]) -> str:
+    """Formats a pixel size as 'WIDTHxHEIGHT'.
+
+    Args:
+        size: The width and height in pixels.
+
+    Returns:
+        The formatted size.
+    """
+    return f"{size[0]}x{size[1]}"
+
+
+def check_keys(table: Dict[str, Any], allowed: Tuple[str, ...], section: str) -> None:
+    """Rejects unknown keys of a job file table, which are most likely typos.
+
+    Args:
+        table: The parsed table.
+        allowed: The known keys.
+        section: The name of the table, used in the error message.
+
+    Raises:
+        ValueError: If the table has an unknown key.
+    """
+    for key in table:
+        if key not in allowed:
+            raise ValueError(
+                f"Unknown key '{key}' in {section} of the job file. Options: {', '.join(allowed)}."
+            )
+
+
+def is_integer(value: Any) -> bool:
+    """Returns whether a job file value is an integer.
+
+    TOML booleans are parsed as bool, which is a subclass of int, so they are
+    excluded explicitly.
+
+    Args:
+        value: The parsed value.
+
+    Returns:
+        True for integers other than booleans.
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_job(
+    job: Dict[str, Any], data: Dict[int, List[Tuple[int, int, int]]]
+) -> JobSpec:
+    """Builds a sweep from a parsed job file.
+
+    The job file has top-level settings, a '[render]' table with the plot options
+    shared by all renders and a '[sweep]' table with the swept values:
+
+        output_dir = "output/sweep"
+        unfolding_ids = [1, 2, 3]
+        jobs = 4
+        max_tasks_per_worker = 200
+        max_worker_memory = 1024
+        cost_model = "costs.json"
+
+        [render]
+        dpi = 150
+        shade = true
+
+        [sweep]
+        palettes = ["grey=230,230,230,1", "brand=255,0,0,1/black"]
+        views = [[30, 22.5], [45, 45]]
+        sizes = ["800x600", "1600x1200"]
+        formats = ["png", "svg"]
+
+    Args:
+        job: The parsed TOML document.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates,
+            used for the uniform scale.
+
+    Returns:
+        The sweep.
+
+    Raises:
+        ValueError: If the job file has unknown keys or invalid values.
+    """
+    for table in ("render", "sweep"):
+        if not isinstance(job.get(table, {}), dict):
+            raise ValueError(f"[{table}] must be a table.")
+    render = dict(RENDER_DEFAULTS, **job.get("render", {}))
+    sweep = job.get("sweep", {})
+    check_keys(
+        {key: value for key, value in job.items() if key not in ("render", "sweep")},
+        JOB_KEYS,
+        "the top level",
+    )
+    check_keys(render, tuple(RENDER_DEFAULTS), "[render]")
+    check_keys(sweep, SWEEP_KEYS, "[sweep]")
+
+    unfolding_ids = job.get("unfolding_ids")
+    if unfolding_ids is not None and (
+        not isinstance(unfolding_ids, list)
+        or not all(is_integer(uid) for uid in unfolding_ids)
+    ):
+        raise ValueError("unfolding_ids must be a list of integers.")
+    jobs = job.get("jobs", 1)
+    if not is_integer(jobs) or jobs < 1:
+        raise ValueError("The number of jobs must be positive.")
+    for key in ("max_tasks_per_worker", "max_worker_memory"):
+        limit = job.get(key)
+        if limit is not None and (not is_integer(limit) or limit < 1):
+            raise ValueError(f"{key} must be a positive integer.")
+    shard_depth = job.get("shard_depth")
+    if shard_depth is not None and (not is_integer(shard_depth) or shard_depth < 0):
+        raise ValueError("shard_depth must be a non-negative integer.")
+    for key in ("output_dir", "output_template", "cost_model"):
+        if job.get(key) is not None and not isinstance(job[key], str):
+            raise ValueError(f"{key} must be a string.")
+    for key in SWEEP_KEYS:
+        if not isinstance(sweep.get(key, []), list):
+            raise ValueError(f"{key} in [sweep] must be a list.")
+    for key in BOOLEAN_RENDER_KEYS:
+        if not isinstance(render[key], bool):
+            raise ValueError(f"{key} must be true or false.")
+    for key in ("block_color", "edge_color", "engine"):
+        if not isinstance(render[key], str):
+            raise ValueError(f"{key} must be a string.")
+    dpi = render["dpi"]
+    if not is_integer(dpi) or dpi < 1:
+        raise ValueError("dpi must be a positive integer.")
+    precision = render["svg_precision"]
+    if precision is not None and (not is_integer(precision) or precision < 0):
+        raise ValueError("svg_precision must be a non-negative integer.")
+    for key in ("png_compression", "png_colors", "webp_quality"):
+        if isinstance(render[key], bool):
+            raise ValueError(f"{key} must be an integer.")
+
+    edge_colors = parse_rgba_list(render["edge_color"])
+    palette_strings = sweep.get("palettes", [])
+    if not all(isinstance(palette, str) for palette in palette_strings):
+        raise ValueError("Palettes must be strings.")
+    palettes = parse_palettes(palette_strings, edge_colors)
+    try:
+        views = [
+            (float(elevation), float(azimuth))
+            for elevation, azimuth in sweep.get("views", [DEFAULT_VIEW])
+        ]
+    except (TypeError, ValueError):
+        raise ValueError("Views must be [elevation, azimuth] pairs.")
+    sizes = [parse_size(size) for size in sweep.get("sizes", [])] or [DEFAULT_SIZE]
+    formats = [
+        str(output_format).lower() for output_format in sweep.get("formats", ["svg"])
+    ]
+    for output_format in formats:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Invalid output format: '{output_format}'. Options: {', '.join(OUTPUT_FORMATS)}."
+            )
+
+    extent = (
+        uniform_extent(select_coordinates(data, unfolding_ids).values())
+        if render["uniform_scale"]
+        else None
+    )
+    plot_params = PlotParameters(
+        colors=parse_rgba_list(render["block_color"]),
+        edgecolors=edge_colors,
+        view_angle=views[0],
+        dpi=render["dpi"],
+        transparent=render["transparent"],
+        shade=render["shade"],
+        show_axes=render["show_axes"],
+        bbox_inches="tight" if render["whitespace_removal"] else None,
+        height=sizes[0][1] / render["dpi"],
+        width=sizes[0][0] / render["dpi"],
+        extent=extent,
+        reproducible=render["reproducible"],
+        svg_precision=render["svg_precision"],
+        png_compression=render["png_compression"],
+        png_colors=render["png_colors"],
+        webp_quality=render["webp_quality"],
+    )
+    check_raster_options(plot_params)
+    return JobSpec(
+        output_dir=job.get("output_dir")
+        or datetime.datetime.now().strftime("output/%Y%m%d_%H%M%S"),
+        unfolding_ids=unfolding_ids,
+        plot_params=plot_params,
+        palettes=palettes,
+        views=list(dict.fromkeys(views)),
+        sizes=list(dict.fromkeys(sizes)),
+        formats=list(dict.fromkeys(formats)),
+        jobs=jobs,
+        output_template=job.get("output_template"),
+        shard_depth=shard_depth,
+        engine=render["engine"],
+        limits=WorkerLimits(
+            job.get("max_tasks_per_worker"), job.get("max_worker_memory")
+        ),
+        cost_model=job.get("cost_model"),
+    )
+
+
+def load_job(path: str, data: Dict[int, List[Tuple[int, int, int]]]) -> JobSpec:
+    """Reads a sweep from a TOML job file.
+
+    Args:
+        path: The path of the job file.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+
+    Returns:
+        The sweep. See `parse_job` for the file layout.
+
+    Raises:
+        ValueError: If the job file is not valid TOML or not a valid sweep.
+    """
+    with open(path, "rb") as job_file:
+        try:
+            job = tomllib.load(job_file)
+        except tomllib.TOMLDecodeError as error:
+            raise ValueError(f"Invalid job file '{path}'. Error: {error}")
+    return parse_job(job, data)
+
+
+def select_coordinates(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    unfolding_ids: Optional[List[int]] = None,
+) -> Dict[int, List[Tuple[int, int, int]]]:
+    """Selects the unfoldings of a sweep.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        unfolding_ids: An optional list of unfolding IDs. Unknown IDs are ignored.
+
+    Returns:
+        The requested subset of the data, or all of it if no IDs are given.
+    """
+    if unfolding_ids is None:
+        return data
+    return {uid: data[uid] for uid in dict.fromkeys(unfolding_ids) if uid in data}
+
+
+def default_template(spec: JobSpec) -> str:
+    """Returns an output template naming every swept value that varies.
+
+    Args:
+        spec: The sweep.
+
+    Returns:
+        A template such as 'unfolding_{id}_{palette}_{view}.{format}'.
+    """
+    fields = ["unfolding_{id}"]
+    if spec.palettes:
+        fields.append("{palette}")
+    if len(spec.views) > 1:
+        fields.append("{view}")
+    if len(spec.sizes) > 1:
+        fields.append("{size}")
+    return "_".join(fields) + ".{format}"
+
+
+def plan_tasks(
+    spec: JobSpec, data: Dict[int, List[Tuple[int, int, int]]]
+) -> List[SweepTask]:
+    """Expands a sweep into tasks.
+
+    Renders sharing an unfolding, view and size form one task, so that their
+    geometry and camera are built once and reused for every palette and format.
+
+    Args:
+        spec: The sweep.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+
+    Returns:
+        The tasks in sweep order.
+
+    Raises:
+        ValueError: If the output template is invalid or gives two outputs the
+            same name.
+    """
+    namer = OutputNamer(
+        spec.output_template or default_template(spec), spec.shard_depth
+    )
+    palettes: List[Optional[Palette]] = list(spec.palettes) or [None]
+    groups = list(
+        itertools.product(
+            select_coordinates(data, spec.unfolding_ids), spec.views, spec.sizes
+        )
+    )
+    planned = [
+        (
+            unfolding_id,
+            view,
+            size,
+            [
+                (
+                    palette,
+                    OutputKey(
+                        unfolding_id,
+                        view,
+                        palette.name if palette is not None else None,
+                        output_format,
+                        format_size(size),
+                    ),
+                )
+                for palette in palettes
+                for output_format in spec.formats
+            ],
+        )
+        for unfolding_id, view, size in groups
+    ]
+    names = namer.plan(key for *_, task_keys in planned for _, key in task_keys)
+
+    tasks = []
+    for unfolding_id, view, size, task_keys in planned:
+        plot_params = spec.plot_params._replace(
+            view_angle=view,
+            width=size[0] / spec.plot_params.dpi,
+            height=size[1] / spec.plot_params.dpi,
+        )
+        outputs = [
+            SweepOutput(palette, key.output_format, names[key])
+            for palette, key in task_keys
+        ]
+        tasks.append(
+            SweepTask(
+                spec.output_dir,
+                unfolding_id,
+                plot_params,
+                outputs,
+                spec.engine,
+            )
+        )
+    return tasks
+
+
+def task_size(task: SweepTask) -> Tuple[int, int]:
+    """Returns the pixel size of a task's outputs.
+
+    Args:
+        task: The task.
+
+    Returns:
+        The (width, height) in pixels.
+    """
+    plot_params = task.plot_params
+    return (
+        round(plot_params.width * plot_params.dpi),
+        round(plot_params.height * plot_params.dpi),
+    )
+
+
+def task_keys(task: SweepTask) -> List[List[str]]:
+    """Returns the cost model keys of every output of a task.
+
+    Args:
+        task: The task.
+
+    Returns:
+        The keys of every output. See `output_keys`.
+    """
+    return [
+        output_keys(
+            task.engine,
+            task.unfolding_id,
+            output.output_format,
+            task.plot_params.dpi,
+            task_size(task),
+        )
+        for output in task.outputs
+    ]
+
+
+def estimate_output_seconds(
+    task: SweepTask, model: Optional[CostModel] = None
+) -> List[float]:
+    """Estimates the time a worker spends on every output of a task.
+
+    Without recorded timings, the first output covers building the scene and
+    every output covers its drawing and encoding, which grow with the pixel
+    count of the figure, most of all for PNG.
+
+    Args:
+        task: The task.
+        model: An optional cost model with recorded timings, which take
+            precedence over the built-in estimates.
+
+    Returns:
+        The estimated time in seconds of every output.
+    """
+    plot_params = task.plot_params
+    megapixels = plot_params.width * plot_params.height * plot_params.dpi**2 / 1e6
+    costs = [
+        ENCODE_SECONDS[output.output_format]
+        + SECONDS_PER_MEGAPIXEL[output.output_format] * megapixels
+        for output in task.outputs
+    ]
+    if costs:
+        costs[0] += SCENE_SECONDS
+    if model is None:
+        return costs
+    return [model.estimate(keys, cost) for keys, cost in zip(task_keys(task), costs)]
+
+
+def estimate_output_bytes(
+    task: SweepTask, model: Optional[CostModel] = None
+) -> List[float]:
+    """Estimates the size of every output of a task.
+
+    Without recorded sizes, vector outputs have a fixed size and PNG outputs
+    grow with the length of the drawn edges, about the square root of the
+    pixel count.
+
+    Args:
+        task: The task.
+        model: An optional cost model with recorded sizes, which take
+            precedence over the built-in estimates.
+
+    Returns:
+        The estimated size in bytes of every output.
+    """
+    width, height = task_size(task)
+    sizes = [
+        OUTPUT_BYTES[output.output_format]
+        + (
+            BYTES_PER_PIXEL_ROOT[output.output_format] * math.sqrt(width * height)
+            if output.output_format in BYTES_PER_PIXEL_ROOT
+            else 0
+        )
+        for output in task.outputs
+    ]
+    if model is None:
+        return sizes
+    return [
+        model.estimate_size(keys, size) for keys, size in zip(task_keys(task), sizes)
+    ]
+
+
+def estimate_task_seconds(task: SweepTask, model: Optional[CostModel] = None) -> float:
+    """Estimates the time a worker spends on a task.
+
+    Args:
+        task: The task.
+        model: An optional cost model with recorded timings.
+
+    Returns:
+        The estimated time in seconds.
+    """
+    return sum(estimate_output_seconds(task, model))
+
+
+def schedule_tasks(
+    tasks: List[SweepTask], model: Optional[CostModel] = None
+) -> List[SweepTask]:
+    """Orders tasks longest expected first.
+
+    Workers pull the next task whenever they finish one, so starting with the
+    longest tasks leaves only short ones to balance the end of the run.
+
+    Args:
+        tasks: The tasks.
+        model: An optional cost model with recorded timings.
+
+    Returns:
+        The tasks by decreasing estimated time, in plan order among equals.
+    """
+    return sorted(tasks, key=lambda task: -estimate_task_seconds(task, model))
+
+
+def estimate_runtime(
+    tasks: List[SweepTask], jobs: int, model: Optional[CostModel] = None
+) -> float:
+    """Estimates the wall time of a sweep.
+
+    Simulates the workers pulling the scheduled tasks in order, each as soon as
+    it is idle.
+
+    Args:
+        tasks: The tasks of the sweep.
+        jobs: The number of worker processes.
+        model: An optional cost model with recorded timings.
+
+    Returns:
+        The estimated wall time in seconds.
+    """
+    finish_times = [0.0] * min(jobs, len(tasks))
+    for task in schedule_tasks(tasks, model):
+        heapq.heapreplace(
+            finish_times, finish_times[0] + estimate_task_seconds(task, model)
+        )
+    return max(finish_times, default=0.0)
+
+
+def render_task(
+    task: SweepTask, data: Mapping[int, List[Tuple[int, int, int]]]
+) -> List[RenderedOutput]:
+    """Renders the outputs of a task from one built scene.
+
+    Args:
+        task: The task to render.
+        data: A mapping of unfolding IDs to lists of block coordinates.
+
+    Returns:
+        The render time and size of every output.
+    """
+    coordinates = data[task.unfolding_id]
+    plotter = process_engine(task.engine)
+    sink = DirectorySink(task.output_dir)
+    # Every output is encoded and written on a background thread while the next
+    # one is drawn.
+    encoder = BackgroundEncoder()
+    # The raster formats of every palette share its pixels.
+    rasters = RasterCache()
+    queued: "List[Future[List[Tuple[OutputRecord, float]]]]" = []
+    rendered = []
+    try:
+        for output in task.outputs:
+            plot_params = (
+                task.plot_params._replace(
+                    colors=output.palette.colors, edgecolors=output.palette.edgecolors
+                )
+                if output.palette is not None
+                else task.plot_params
+            )
+            image = render_image(
+                plotter,
+                coordinates,
+                plot_params,
+                output.output_format,
+                output.name,
+                cache=rasters,
+            )
+            queued.append(
+                encoder.submit(functools.partial(write_images, sink, [image]))
+            )
+        for future in queued:
+            for record, seconds in future.result():
+                rendered.append(RenderedOutput(seconds, record.size))
+                logger.info(f"Saved '{record.location}'")
+    finally:
+        encoder.close()
+        plotter.close()
+    return rendered
+
+
+def run_tasks(
+    tasks: List[SweepTask],
+    data: Mapping[int, List[Tuple[int, int, int]]],
+    jobs: int,
+    limits: WorkerLimits = WorkerLimits(),
+    profiler: Optional[RenderProfiler] = None,
+) -> Iterator[Tuple[SweepTask, List[RenderedOutput]]]:
+    """Renders tasks in this process or in a pool of worker processes.
+
+    Tasks are started in the given order. Every worker warms up its engine once
+    when it starts and renders all its tasks with it, reading the coordinates
+    from a shared catalogue. Workers reaching a limit are replaced. See
+    `map_shared`.
+
+    Args:
+        tasks: The tasks to render.
+        data: A mapping of unfolding IDs to lists of block coordinates.
+        jobs: The number of worker processes. With 1, tasks render in this process.
+        limits: The limits after which worker processes are replaced.
+        profiler: An optional RenderProfiler that profiles every task separately,
+            in whichever process renders it.
+
+    Yields:
+        Every finished task with the render time and size of its outputs.
+    """
+    if jobs == 1 or len(tasks) <= 1:
+        for position, task in enumerate(tasks):
+            with optional_profile(profiler, f"task_{position}"):
+                rendered = render_task(task, data)
+            yield task, rendered
+        return
+    unfolding_ids = dict.fromkeys(task.unfolding_id for task in tasks)
+    output_formats = dict.fromkeys(
+        output.output_format for task in tasks for output in task.outputs
+    )
+    for position, rendered in map_shared(
+        render_task,
+        tasks,
+        {uid: data[uid] for uid in unfolding_ids},
+        jobs,
+        functools.partial(warm_engine, tasks[0].engine, list(output_formats)),
+        limits,
+        profiler,
+    ):
+        yield tasks[position], rendered
+
+
+def estimate_sweep(
+    tasks: List[SweepTask], jobs: int, model: Optional[CostModel] = None
+) -> SweepEstimate:
+    """Predicts the cost of a sweep without rendering anything.
+
+    Args:
+        tasks: The tasks of the sweep.
+        jobs: The number of worker processes.
+        model: An optional cost model with recorded timings and sizes.
+
+    Returns:
+        The predicted cost.
+    """
+    return SweepEstimate(
+        outputs=sum(len(task.outputs) for task in tasks),
+        tasks=len(tasks),
+        workers=min(jobs, max(len(tasks), 1)),
+        cpu_seconds=sum(estimate_task_seconds(task, model) for task in tasks),
+        wall_seconds=estimate_runtime(tasks, jobs, model),
+        output_bytes=sum(
+            size for task in tasks for size in estimate_output_bytes(task, model)
+        ),
+    )
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a duration as 'H:MM:SS', rounded up to whole seconds.
+
+    Args:
+        seconds: The duration in seconds.
+
+    Returns:
+        The formatted duration.
+    """
+    return str(datetime.timedelta(seconds=math.ceil(seconds)))
+
+
+def format_bytes(size: float) -> str:
+    """Formats a size with a binary unit, e.g. '1.5 MiB'.
+
+    Args:
+        size: The size in bytes.
+
+    Returns:
+        The formatted size.
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def write_plan(
+    tasks: List[SweepTask],
+    estimate: SweepEstimate,
+    model: Optional[CostModel] = None,
+    stream: Optional[TextIO] = None,
+) -> None:
+    """Writes every planned output and the predicted cost of a sweep.
+
+    Every output is listed on a tab-separated line with its unfolding, view,
+    size, palette, format, estimated time and size and name, followed by the
+    totals.
+
+    Args:
+        tasks: The tasks of the sweep, in plan order.
+        estimate: The predicted cost of the tasks.
+        model: An optional cost model with recorded timings and sizes.
+        stream: The stream the plan is written to. Defaults to standard output.
+    """
+    stream = stream or sys.stdout
+    stream.write("unfolding\tview\tsize\tpalette\tformat\tseconds\tbytes\tname\n")
+    for task in tasks:
+        elevation, azimuth = task.plot_params.view_angle
+        for output, seconds, size in zip(
+            task.outputs,
+            estimate_output_seconds(task, model),
+            estimate_output_bytes(task, model),
+        ):
+            palette = output.palette.name if output.palette is not None else "-"
+            stream.write(
+                f"{task.unfolding_id}\t{elevation:g}_{azimuth:g}\t{format_size(task_size(task))}\t{palette}\t{output.output_format}\t{seconds:.3f}\t{size:.0f}\t{output.name}\n"
+            )
+    stream.write(
+        f"Outputs: {estimate.outputs} in {estimate.tasks} tasks\n"
+        f"CPU time: {format_duration(estimate.cpu_seconds)}\n"
+        f"Wall time on {estimate.workers} workers: {format_duration(estimate.wall_seconds)}\n"
+        f"Output size: {format_bytes(estimate.output_bytes)}\n"
+    )
+
+
+def prepare_job(
+    spec: JobSpec, data: Dict[int, List[Tuple[int, int, int]]], jobs: int
+) -> Tuple[List[SweepTask], CostModel]:
+    """Validates a sweep and plans its tasks.
+
+    Args:
+        spec: The sweep.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        jobs: The number of worker processes.
+
+    Returns:
+        The tasks in plan order and the cost model of the sweep.
+
+    Raises:
+        ValueError: If the number of jobs is not positive, the engine cannot write
+            a format or the output names are invalid.
+    """
+    if jobs < 1:
+        raise ValueError("The number of jobs must be positive.")
+    engine = create_engine(spec.engine)
+    check_formats(engine, spec.formats)
+    engine.close()
+    return plan_tasks(spec, data), CostModel(spec.cost_model)
+
+
+def dry_run_job(
+    spec: JobSpec,
+    data: Dict[int, List[Tuple[int, int, int]]],
+    jobs: Optional[int] = None,
+    stream: Optional[TextIO] = None,
+) -> SweepEstimate:
+    """Plans a sweep and writes its outputs and predicted cost without rendering.
+
+    The estimates use the timings and sizes recorded in the cost model of the
+    sweep where there are any, and the built-in estimates otherwise. Nothing is
+    written to the output directory or the cost model.
+
+    Args:
+        spec: The sweep.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        jobs: An optional number of worker processes overriding the job file.
+        stream: The stream the plan is written to. Defaults to standard output.
+
+    Returns:
+        The predicted cost.
+
+    Raises:
+        ValueError: If the number of jobs is not positive, the engine cannot write
+            a format or the output names are invalid.
+    """
+    jobs = jobs if jobs is not None else spec.jobs
+    tasks, model = prepare_job(spec, data, jobs)
+    estimate = estimate_sweep(tasks, jobs, model)
+    write_plan(tasks, estimate, model, stream)
+    return estimate
+
+
+def run_job(
+    spec: JobSpec,
+    data: Dict[int, List[Tuple[int, int, int]]],
+    jobs: Optional[int] = None,
+    profiler: Optional[RenderProfiler] = None,
+) -> int:
+    """Plans and renders a sweep.
+
+    The planned number of outputs and tasks and the estimated runtime and size
+    are logged before rendering starts. Tasks are dispatched longest expected
+    first. With a cost model file, the estimates use its recorded timings and
+    sizes and the measurements of this run are added to it.
+
+    Args:
+        spec: The sweep.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        jobs: An optional number of worker processes overriding the job file.
+        profiler: An optional RenderProfiler that profiles every task.
+
+    Returns:
+        The number of rendered outputs.
+
+    Raises:
+        ValueError: If the number of jobs is not positive, the engine cannot write
+            a format or the output names are invalid.
+    """
+    jobs = jobs if jobs is not None else spec.jobs
+    tasks, model = prepare_job(spec, data, jobs)
+    tasks = schedule_tasks(tasks, model)
+    estimate = estimate_sweep(tasks, jobs, model)
+    logger.info(
+        f"Planned {estimate.outputs} outputs in {estimate.tasks} tasks on {estimate.workers} workers, estimated runtime {format_duration(estimate.wall_seconds)} and size {format_bytes(estimate.output_bytes)}"
+    )
+
+    DirectorySink(spec.output_dir).prepare(
+        output.name for task in tasks for output in task.outputs
+    )
+    rendered = 0
+    try:
+        for task, measured in run_tasks(tasks, data, jobs, spec.limits, profiler):
+            rendered += len(measured)
+            for keys, output in zip(task_keys(task), measured):
+                model.record(keys, output.seconds, output.size)
+            logger.info(
+                f"Rendered {len(measured)} outputs of unfolding {task.unfolding_id} ({rendered}/{estimate.outputs})"
+            )
+    finally:
+        model.save()
+    logger.info(f"Saved {rendered} outputs to '{spec.output_dir}'")
+    return rendered
@@ -1,12 +1,50 @@
+import io
+import itertools
 import logging
-from typing import List, NamedTuple, Optional, Tuple, cast
+from collections import OrderedDict
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
 import matplotlib.pyplot as plt  # type: ignore
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
+from matplotlib.collections import PolyCollection  # type: ignore
 from matplotlib.colors import to_rgba  # type: ignore
-from mpl_toolkits.mplot3d import Axes3D  # type: ignore
+from matplotlib.figure import Figure  # type: ignore
+from matplotlib.transforms import Bbox  # type: ignore
+from mpl_toolkits.mplot3d import Axes3D, proj3d  # type: ignore
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection  # type: ignore
+
+from .geometry import Extent, centered_bounds, cube_vertices
+from .sinks import write_bytes
+from .svg import finish_svg
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_FORMATS = ("png", "webp", "svg", "svgz", "pdf")
+# Metadata that leaves out the creation time of reproducible outputs, and the
+# fixed salt of the IDs matplotlib generates for SVG clip paths and glyphs.
+REPRODUCIBLE_METADATA: Dict[str, Dict[str, Any]] = {
+    "svg": {"Date": None},
+    "svgz": {"Date": None},
+    "pdf": {"CreationDate": None},
+}
+HASH_SALT = "chronotva"
+# Output pixels added to every side of the analytic crop box beyond half the
+# edge width, which antialiasing and pixel snapping draw the edges into.
+CROP_PAD_PIXELS = 2
+
 
 class PlotParameters(NamedTuple):
     """Container for plot parameters.
@@ -22,6 +60,19 @@ class PlotParameters(NamedTuple):
         bbox_inches: To use 'tight' and remove whitespace or not.
         height: Height of the output image in inches.
         width: Width of the output image in inches.
+        extent: The (x, y, z) axis spans shared by all plots, so that every
+            unfolding is drawn at the same scale. If None, the axes fit each
+            unfolding exactly.
+        reproducible: Whether equal inputs must give byte-identical outputs, which
+            leaves out timestamps and derives generated IDs from the content.
+        svg_precision: The number of decimals of coordinates in compact SVG
+            output, or None for the engine's full SVG output. See `compact_svg`.
+        png_compression: The zlib level of PNG output from 0 to 9, or None for
+            the default of 6.
+        png_colors: The number of colors of an indexed PNG palette, or None for
+            full RGBA PNG output. See `encode_pixels`.
+        webp_quality: The quality of lossy WebP output from 0 to 100, or None for
+            lossless WebP output.
     """
 
     colors: List[Tuple[float, float, float, float]]
@@ -34,6 +85,12 @@ class PlotParameters(NamedTuple):
     bbox_inches: Optional[str]
     height: float
     width: float
+    extent: Optional[Extent] = None
+    reproducible: bool = False
+    svg_precision: Optional[int] = None
+    png_compression: Optional[int] = None
+    png_colors: Optional[int] = None
+    webp_quality: Optional[int] = None
 
 
 def parse_rgba_list(color_string: str) -> List[Tuple[float, float, float, float]]:
@@ -70,22 +127,235 @@ def parse_rgba_list(color_string: str) -> List[Tuple[float, float, float, float]
     return rgba_list
 
 
+class Palette(NamedTuple):
+    """A named color scheme for the blocks and their edges.
+
+    Attributes:
+        name: The name of the palette, used in output file names.
+        colors: A list of RGBA color tuples for the blocks.
+        edgecolors: A list of RGBA color tuples for the edges of the blocks.
+    """
+
+    name: str
+    colors: List[Tuple[float, float, float, float]]
+    edgecolors: List[Tuple[float, float, float, float]]
+
+
+def parse_palette(
+    palette_string: str,
+    default_name: str,
+    default_edgecolors: List[Tuple[float, float, float, float]],
+) -> Palette:
+    """Parses a palette of the form '[NAME=]BLOCK_COLORS[/EDGE_COLORS]'.
+
+    Block and edge colors use the format accepted by `parse_rgba_list`.
+
+    Args:
+        palette_string: The palette specification, e.g. 'brand=255,0,0,1;red/black'.
+        default_name: The name used if the specification does not name the palette.
+        default_edgecolors: The edge colors used if the specification has none.
+
+    Returns:
+        The parsed palette.
+
+    Raises:
+        ValueError: If the palette name is empty or a color is invalid.
+    """
+    name, separator, colors = palette_string.partition("=")
+    if not separator:
+        name, colors = default_name, palette_string
+    elif not name:
+        raise ValueError(f"Invalid palette: {palette_string}. Error: empty name.")
+
+    block_colors, separator, edge_colors = colors.partition("/")
+    return Palette(
+        name=name,
+        colors=parse_rgba_list(block_colors),
+        edgecolors=parse_rgba_list(edge_colors) if separator else default_edgecolors,
+    )
+
+
+def parse_palettes(
+    palette_strings: Iterable[str],
+    default_edgecolors: List[Tuple[float, float, float, float]],
+) -> List[Palette]:
+    """Parses palettes, naming unnamed ones 'palette1', 'palette2' and so on.
+
+    Args:
+        palette_strings: The palette specifications. See `parse_palette`.
+        default_edgecolors: The edge colors of palettes that have none.
+
+    Returns:
+        The parsed palettes.
+
+    Raises:
+        ValueError: If a palette is invalid or two palettes share a name.
+    """
+    palettes = [
+        parse_palette(palette, f"palette{index}", default_edgecolors)
+        for index, palette in enumerate(palette_strings, start=1)
+    ]
+    names = [palette.name for palette in palettes]
+    if len(set(names)) != len(names):
+        raise ValueError("Palette names must be unique.")
+    return palettes
+
+
+def raster_size(plot_params: PlotParameters) -> Tuple[int, int]:
+    """Returns the pixel size of a figure rendered with the given parameters.
+
+    Args:
+        plot_params: A PlotParameters object containing the plot configuration.
+
+    Returns:
+        The (height, width) of the rendered figure in pixels, without cropping.
+    """
+    figure = Figure(
+        figsize=(plot_params.width, plot_params.height), dpi=plot_params.dpi
+    )
+    width, height = FigureCanvasAgg(figure).get_width_height()
+    return height, width
+
+
+def projected_bbox(fig: Figure, axes: Axes3D, vertices: np.ndarray, dpi: float) -> Bbox:
+    """Computes the bounding box of projected points without drawing the figure.
+
+    The points, e.g. the cube corners, are projected with the current view of
+    the axes and padded by
+    half the widest edge line plus `CROP_PAD_PIXELS`, and the box is rounded
+    outward to whole output pixels. This keeps the antialiased edges inside the
+    image without the extra draw pass matplotlib needs to measure a tight box.
+
+    Args:
+        fig: The figure containing the axes.
+        axes: The 3D axes holding the blocks, with the view already set.
+        vertices: An array of shape (N, 3) with the points that must be visible.
+        dpi: The resolution the figure is saved with.
+
+    Returns:
+        The bounding box in inches, suitable for savefig's bbox_inches.
+    """
+    axes.apply_aspect()
+    xs, ys, _ = proj3d.proj_transform(
+        vertices[:, 0], vertices[:, 1], vertices[:, 2], axes.get_proj()
+    )
+    points = axes.transData.transform(np.column_stack([xs, ys]))
+    linewidth = max(
+        (
+            max(collection.get_linewidths(), default=0)
+            for collection in axes.collections
+        ),
+        default=0,
+    )
+    # The corners in output pixels, where edges are drawn and rounded.
+    corners = points / fig.dpi * dpi
+    pad = linewidth / 2 * dpi / 72 + CROP_PAD_PIXELS
+    return Bbox(
+        [
+            np.floor(corners.min(axis=0) - pad) / dpi,
+            np.ceil(corners.max(axis=0) + pad) / dpi,
+        ]
+    )
+
+
+class PixelBuffer(io.BytesIO):
+    """A binary stream keeping the raw RGBA image savefig writes as an array.
+
+    For the 'rgba' format, matplotlib writes the buffer of its renderer, which
+    has the shape (height, width, 4) of the cropped image, in a single call.
+    """
+
+    pixels: np.ndarray
+
+    def write(self, data: Any) -> int:
+        """Keeps a copy of the written pixels.
+
+        Args:
+            data: The renderer's buffer.
+
+        Returns:
+            The number of bytes written.
+        """
+        self.pixels = np.array(data, dtype=np.uint8)
+        return int(self.pixels.nbytes)
+
+
+class Scene(NamedTuple):
+    """A built figure whose blocks can be recolored and saved repeatedly.
+
+    Attributes:
+        figure: The matplotlib figure holding the 3D axes.
+        collections: One Poly3DCollection with six faces per block.
+        shading: The per-face shading factors of every block, in face order.
+        bbox_inches: The crop box passed to savefig.
+    """
+
+    figure: Figure
+    collections: List[Poly3DCollection]
+    shading: List[np.ndarray]
+    bbox_inches: Union[Bbox, str, None]
+
+
+def scene_key(
+    coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+) -> Tuple[Hashable, ...]:
+    """Returns the cache key of the geometry drawn for the given plot.
+
+    The key covers everything that changes the projected geometry, but not the
+    colors, which are applied to a cached scene by recoloring its faces.
+
+    Args:
+        coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+        plot_params: A PlotParameters object containing the plot configuration.
+
+    Returns:
+        A hashable key.
+    """
+    return (
+        tuple(coordinates),
+        plot_params.view_angle,
+        plot_params.shade,
+        plot_params.show_axes,
+        plot_params.bbox_inches,
+        plot_params.height,
+        plot_params.width,
+        plot_params.extent,
+        # The crop box is rounded to output pixels.
+        plot_params.dpi,
+    )
+
+
 class BlockPlotter:
     """
     A class for plotting 3D blocks based on provided coordinates.
+
+    This is the 'matplotlib' render engine, drawing the blocks with mplot3d.
+    Built scenes can be kept in a small cache keyed by geometry and view, so that
+    rendering the same unfolding with other colors or formats only recolors the
+    existing faces instead of rebuilding the figure.
     """
 
-    def __init__(
-        self,
-    ) -> None:
-        pass
+    name = "matplotlib"
+    formats = OUTPUT_FORMATS
+
+    def __init__(self, scene_cache_size: int = 0) -> None:
+        """Initializes the plotter.
+
+        Args:
+            scene_cache_size: The number of built scenes to keep for reuse. With the
+                default of 0 every figure is closed right after it is saved.
+        """
+        self.scene_cache_size = scene_cache_size
+        self.scenes: "OrderedDict[Tuple[Hashable, ...], Scene]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def plot_3d_blocks(
         self,
         coordinates: List[Tuple[int, int, int]],
         plot_params: PlotParameters,
         output_format: str,
-        output_path: str,
+        output_path: Union[str, BinaryIO],
     ) -> None:
         """Plots 3D blocks using the provided coordinates and plot parameters.
 
@@ -93,7 +363,7 @@ class BlockPlotter:
             coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
             plot_params: A PlotParameters object containing the plot configuration.
             output_format: The file format for the output image (e.g., 'png', 'svg', 'pdf').
-            output_path: The file path where the output image will be saved.
+            output_path: The file path or binary stream the output image is saved to.
 
         Raises:
             TypeError: If coordinates are not provided as a list of tuples.
@@ -106,52 +376,301 @@ class BlockPlotter:
         if not coordinates:
             raise ValueError("No coordinates provided for plotting.")
 
+        scene: Optional[Scene] = None
         try:
-            fig = plt.figure(figsize=(plot_params.width, plot_params.height))
-            axes: Axes3D = cast(Axes3D, fig.add_subplot(111, projection="3d"))
-
-            for i, (x, y, z) in enumerate(coordinates):
-                color = plot_params.colors[i % len(plot_params.colors)]
-                edgecolor = plot_params.edgecolors[i % len(plot_params.edgecolors)]
-
-                axes.bar3d(
-                    x,
-                    y,
-                    z,
-                    dx=1,
-                    dy=1,
-                    dz=1,
-                    color=color,
-                    edgecolor=edgecolor,
-                    shade=plot_params.shade,
+            scene = self.prepare(coordinates, plot_params)
+            self.encode(
+                self.draw(scene, plot_params), plot_params, output_format, output_path
+            )
+
+        except Exception as error:
+            logging.error(f"An error occurred while plotting: {error}")
+            raise
+
+        finally:
+            if scene is not None and not self.scene_cache_size:
+                plt.close(scene.figure)
+
+    def render_rgba(
+        self,
+        coordinates: List[Tuple[int, int, int]],
+        plot_params: PlotParameters,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Renders 3D blocks into an RGBA pixel array without encoding an image file.
+
+        The whole figure is rendered at the plot's size and DPI; whitespace is not
+        cropped, so that every render of the same size has the same shape.
+
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+            out: An optional uint8 array of shape (height, width, 4) that receives the
+                pixels in place, e.g. a slice of a memory-mapped dataset.
+
+        Returns:
+            The rendered pixels, which is `out` if it was given.
+
+        Raises:
+            TypeError: If coordinates are not provided as a list of tuples.
+            ValueError: If no coordinates are provided for plotting, or `out` has
+                the wrong shape.
+        """
+        if not isinstance(coordinates, List):
+            raise TypeError("Coordinates must be a list of tuples.")
+
+        if not coordinates:
+            raise ValueError("No coordinates provided for plotting.")
+
+        scene: Optional[Scene] = None
+        try:
+            scene = self.get_scene(coordinates, plot_params)
+            self.recolor(scene, plot_params)
+
+            figure = scene.figure
+            figure.set_dpi(plot_params.dpi)
+            patches = [figure.patch] + [axes.patch for axes in figure.axes]
+            alphas = [patch.get_alpha() for patch in patches]
+            for patch in patches:
+                patch.set_alpha(0 if plot_params.transparent else 1)
+            try:
+                canvas = cast(FigureCanvasAgg, figure.canvas)
+                canvas.draw()
+                pixels: np.ndarray = np.asarray(canvas.buffer_rgba())
+            finally:
+                for patch, alpha in zip(patches, alphas):
+                    patch.set_alpha(alpha)
+
+            if out is None:
+                out = np.empty_like(pixels)
+            elif out.shape != pixels.shape:
+                raise ValueError(
+                    f"Output array has shape {out.shape}, expected {pixels.shape}."
                 )
+            out[...] = pixels
+            return out
+
+        except Exception as error:
+            logging.error(f"An error occurred while plotting: {error}")
+            raise
 
-            if not plot_params.show_axes:
-                axes.axis("off")
+        finally:
+            if scene is not None and not self.scene_cache_size:
+                plt.close(scene.figure)
 
-            axes.set_box_aspect(
-                [
-                    upper - lower
-                    for lower, upper in (
-                        getattr(axes, f"get_{dim}lim")() for dim in "xyz"
-                    )
-                ]
-            )
+    def prepare(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> Scene:
+        """Returns the scene for the given geometry and view, from the cache if possible.
 
-            axes.view_init(*plot_params.view_angle)
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
 
-            plt.tight_layout()
-            plt.savefig(
+        Returns:
+            A scene that still has to be drawn with the plot's colors.
+        """
+        return self.get_scene(coordinates, plot_params)
+
+    def draw(self, scene: Scene, plot_params: PlotParameters) -> Scene:
+        """Recolors a scene with the colors of the plot parameters.
+
+        Args:
+            scene: A scene returned by `prepare`.
+            plot_params: A PlotParameters object containing the colors.
+
+        Returns:
+            The recolored scene.
+        """
+        self.recolor(scene, plot_params)
+        return scene
+
+    def encode(
+        self,
+        drawing: Scene,
+        plot_params: PlotParameters,
+        output_format: str,
+        output_path: Union[str, BinaryIO],
+    ) -> None:
+        """Saves a drawn scene.
+
+        Args:
+            drawing: A scene returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+            output_format: The file format for the output image (e.g., 'png', 'svg', 'pdf').
+            output_path: The file path or binary stream the output image is saved to.
+        """
+        if output_format in ("png", "webp"):
+            # Imported here, since the raster module builds on this one.
+            from .raster import encode_pixels
+
+            write_bytes(
                 output_path,
-                bbox_inches=plot_params.bbox_inches,
+                encode_pixels(
+                    self.rasterize(drawing, plot_params), output_format, plot_params
+                ),
+            )
+            return
+        plt.figure(drawing.figure.number)
+        reproducible = plot_params.reproducible
+        rewrite = output_format == "svgz" or (
+            output_format == "svg" and plot_params.svg_precision is not None
+        )
+        buffer = io.BytesIO()
+        with plt.rc_context({"svg.hashsalt": HASH_SALT} if reproducible else {}):
+            plt.savefig(
+                buffer if rewrite else output_path,
+                bbox_inches=drawing.bbox_inches,
                 pad_inches=0,
                 dpi=plot_params.dpi,
                 transparent=plot_params.transparent,
-                format=output_format,
+                format="svg" if rewrite else output_format,
+                metadata=(
+                    REPRODUCIBLE_METADATA.get(output_format) if reproducible else None
+                ),
             )
+        if not rewrite:
+            return
+        write_bytes(
+            output_path,
+            finish_svg(buffer.getvalue(), output_format, plot_params.svg_precision),
+        )
 
-            plt.close(fig)
+    def rasterize(self, drawing: Scene, plot_params: PlotParameters) -> np.ndarray:
+        """Renders a drawn scene into RGBA pixels, cropped like the saved images.
 
-        except Exception as error:
-            logging.error(f"An error occurred while plotting: {error}")
-            raise
+        Args:
+            drawing: A scene returned by `draw`.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            A uint8 array of shape (height, width, 4).
+        """
+        plt.figure(drawing.figure.number)
+        buffer = PixelBuffer()
+        plt.savefig(
+            buffer,
+            bbox_inches=drawing.bbox_inches,
+            pad_inches=0,
+            dpi=plot_params.dpi,
+            transparent=plot_params.transparent,
+            format="rgba",
+        )
+        return buffer.pixels
+
+    def get_scene(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> Scene:
+        """Returns a cached scene for the given geometry and view, or builds one.
+
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            A scene that still has to be recolored with the plot's colors.
+        """
+        key = scene_key(coordinates, plot_params)
+        scene = self.scenes.get(key)
+        if scene is not None:
+            self.cache_hits += 1
+            self.scenes.move_to_end(key)
+            return scene
+
+        self.cache_misses += 1
+        scene = self.build_scene(coordinates, plot_params)
+        if self.scene_cache_size:
+            self.scenes[key] = scene
+            while len(self.scenes) > self.scene_cache_size:
+                _, evicted = self.scenes.popitem(last=False)
+                plt.close(evicted.figure)
+        return scene
+
+    def build_scene(
+        self, coordinates: List[Tuple[int, int, int]], plot_params: PlotParameters
+    ) -> Scene:
+        """Builds the figure, axes and block faces for the given geometry and view.
+
+        The blocks are drawn in white, so that their face colors hold the shading
+        factors that `recolor` later multiplies with the actual colors.
+
+        Args:
+            coordinates: A list of tuples representing the (x, y, z) coordinates of the blocks.
+            plot_params: A PlotParameters object containing the plot configuration.
+
+        Returns:
+            The built scene.
+        """
+        analytic_crop = plot_params.bbox_inches == "tight" and not plot_params.show_axes
+
+        fig = plt.figure(figsize=(plot_params.width, plot_params.height))
+        axes: Axes3D = cast(Axes3D, fig.add_subplot(111, projection="3d"))
+
+        bounds = centered_bounds(coordinates, plot_params.extent)
+        for dim, limits in zip("xyz", bounds):
+            getattr(axes, f"set_{dim}lim")(*limits)
+        axes.set_box_aspect([upper - lower for lower, upper in bounds])
+
+        collections = [
+            axes.bar3d(
+                x,
+                y,
+                z,
+                dx=1,
+                dy=1,
+                dz=1,
+                color=(1, 1, 1, 1),
+                shade=plot_params.shade,
+            )
+            for x, y, z in coordinates
+        ]
+        shading = [
+            np.asarray(PolyCollection.get_facecolor(collection))[:, 0].copy()
+            for collection in collections
+        ]
+
+        if not plot_params.show_axes:
+            axes.axis("off")
+
+        axes.view_init(*plot_params.view_angle)
+
+        bbox_inches: Union[Bbox, str, None]
+        if analytic_crop:
+            axes.set_position([0, 0, 1, 1])
+            # With a shared extent, the crop covers its whole axis box, which is
+            # the same frame for every unfolding.
+            vertices = (
+                np.array(list(itertools.product(*bounds)))
+                if plot_params.extent is not None
+                else cube_vertices(coordinates)
+            )
+            bbox_inches = projected_bbox(fig, axes, vertices, plot_params.dpi)
+        else:
+            plt.tight_layout()
+            bbox_inches = plot_params.bbox_inches
+
+        return Scene(fig, collections, shading, bbox_inches)
+
+    def recolor(self, scene: Scene, plot_params: PlotParameters) -> None:
+        """Applies the block and edge colors of the plot parameters to a scene.
+
+        Args:
+            scene: A scene built by `build_scene`.
+            plot_params: A PlotParameters object containing the colors.
+        """
+        for i, (collection, shading) in enumerate(
+            zip(scene.collections, scene.shading)
+        ):
+            color = np.asarray(plot_params.colors[i % len(plot_params.colors)])
+            facecolors = shading[:, np.newaxis] * color
+            facecolors[:, 3] = color[3]
+            collection.set_facecolor(facecolors)
+            collection.set_edgecolor(
+                plot_params.edgecolors[i % len(plot_params.edgecolors)]
+            )
+
+    def close(self) -> None:
+        """Closes all cached scenes."""
+        for scene in self.scenes.values():
+            plt.close(scene.figure)
+        self.scenes.clear()
@@ -0,0 +1,530 @@
+import base64
+import itertools
+import json
+import logging
+import os
+import string
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .geometry import (
+    UNIT_CUBE_CORNERS,
+    UNIT_CUBE_FACES,
+    UNIT_CUBE_NORMALS,
+    grid_offsets,
+)
+from .meshes import (
+    CATALOGUE_GAP,
+    GLTF_ARRAY_BUFFER,
+    GLTF_ELEMENT_ARRAY_BUFFER,
+    GLTF_FLOAT,
+    GLTF_TRIANGLES,
+    GLTF_Y_UP,
+    pack_glb,
+)
+from .native import LIGHT_DIRECTION
+from .tesseract import PlotParameters
+
+logger = logging.getLogger(__name__)
+
+VIEWER_FORMATS = ("glb", "html")
+GLTF_LINES = 1
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_INSTANCING = "EXT_mesh_gpu_instancing"
+
+
+class Catalogue(NamedTuple):
+    """The cubes of several unfoldings as instances of one unit cube.
+
+    Attributes:
+        offsets: An array of shape (N, 3) with the minimum corner of every cube,
+            with all unfoldings placed side by side on a grid.
+        ranges: A dictionary mapping every unfolding ID to the (first instance,
+            instance count) range of its cubes.
+    """
+
+    offsets: np.ndarray
+    ranges: Dict[int, Tuple[int, int]]
+
+
+def build_catalogue(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    unfolding_ids: Optional[List[int]] = None,
+) -> Catalogue:
+    """Lays out the cubes of the selected unfoldings as unit cube instances.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        unfolding_ids: An optional list of unfolding IDs. If None, all unfoldings are used.
+
+    Returns:
+        The catalogue.
+
+    Raises:
+        ValueError: If no unfolding is selected.
+    """
+    selected_ids = [
+        uid
+        for uid in dict.fromkeys(unfolding_ids if unfolding_ids is not None else data)
+        if uid in data and data[uid]
+    ]
+    if not selected_ids:
+        raise ValueError("No unfoldings selected for the viewer.")
+    origins = [
+        np.asarray(data[uid], dtype=float).reshape(-1, 3) for uid in selected_ids
+    ]
+    lower = np.array([cubes.min(axis=0) for cubes in origins])
+    upper = np.array([cubes.max(axis=0) + 1 for cubes in origins])
+    placements = grid_offsets(lower, upper, CATALOGUE_GAP)
+    offsets = np.concatenate(
+        [cubes + placement for cubes, placement in zip(origins, placements)]
+    )
+    counts = [len(cubes) for cubes in origins]
+    starts = np.cumsum([0] + counts[:-1]).tolist()
+    return Catalogue(
+        offsets=offsets.astype(np.float32),
+        ranges={
+            uid: (start, count)
+            for uid, start, count in zip(selected_ids, starts, counts)
+        },
+    )
+
+
+def unit_cube() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the unit cube mesh that every cube instance draws.
+
+    Every face has its own four vertices, so that it can be shaded flat.
+
+    Returns:
+        The (24, 3) vertex positions and (24, 3) vertex normals, the (36,)
+        triangle indices, counter-clockwise as seen from outside, and the (24,)
+        line indices of the cube edges.
+    """
+    positions = UNIT_CUBE_FACES.reshape(-1, 3)
+    normals = np.repeat(UNIT_CUBE_NORMALS, 4, axis=0)
+    triangles = (np.arange(6)[:, np.newaxis] * 4 + [0, 1, 2, 0, 2, 3]).reshape(-1)
+    vertex_of_corner = [
+        int(np.flatnonzero((positions == corner).all(axis=1))[0])
+        for corner in UNIT_CUBE_CORNERS
+    ]
+    lines = np.array(
+        [
+            (vertex_of_corner[first], vertex_of_corner[second])
+            for first, second in itertools.combinations(range(8), 2)
+            if np.abs(UNIT_CUBE_CORNERS[first] - UNIT_CUBE_CORNERS[second]).sum() == 1
+        ]
+    ).reshape(-1)
+    return positions, normals, triangles, lines
+
+
+def srgb_to_linear(color: Tuple[float, float, float, float]) -> List[float]:
+    """Converts an sRGB color to the linear color space of glTF materials.
+
+    Args:
+        color: An RGBA color with components between 0 and 1.
+
+    Returns:
+        The linear RGBA color. Alpha is unchanged.
+    """
+    rgb = np.asarray(color[:3], dtype=float)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return [*linear.round(6).tolist(), float(color[3])]
+
+
+def gltf_material(
+    name: str, color: Tuple[float, float, float, float]
+) -> Dict[str, object]:
+    """Returns a glTF material with a flat base color.
+
+    Args:
+        name: The name of the material.
+        color: The sRGB RGBA color.
+
+    Returns:
+        The material.
+    """
+    material: Dict[str, object] = {
+        "name": name,
+        "pbrMetallicRoughness": {
+            "baseColorFactor": srgb_to_linear(color),
+            "metallicFactor": 0.0,
+            "roughnessFactor": 1.0,
+        },
+    }
+    if color[3] < 1:
+        material["alphaMode"] = "BLEND"
+    return material
+
+
+def encode_viewer_glb(catalogue: Catalogue, plot_params: PlotParameters) -> bytes:
+    """Encodes a catalogue as a binary glTF file with one instanced unit cube.
+
+    The cube is drawn once per instance through the EXT_mesh_gpu_instancing
+    extension, so the file holds a single mesh and one translation per cube.
+    The extras of the node map every unfolding ID to its instance range.
+
+    Args:
+        catalogue: The catalogue.
+        plot_params: The plot parameters, whose first block and edge colors are
+            used for the faces and edges of every cube.
+
+    Returns:
+        The GLB file.
+    """
+    positions, normals, triangles, lines = unit_cube()
+    arrays = [
+        ((positions @ GLTF_Y_UP.T).astype(np.float32), GLTF_ARRAY_BUFFER),
+        ((normals @ GLTF_Y_UP.T).astype(np.float32), GLTF_ARRAY_BUFFER),
+        (triangles.astype(np.uint16), GLTF_ELEMENT_ARRAY_BUFFER),
+        (lines.astype(np.uint16), GLTF_ELEMENT_ARRAY_BUFFER),
+        ((catalogue.offsets @ GLTF_Y_UP.T).astype(np.float32), None),
+    ]
+    binary = bytearray()
+    buffer_views = []
+    for data, target in arrays:
+        view = {"buffer": 0, "byteOffset": len(binary), "byteLength": data.nbytes}
+        if target is not None:
+            view["target"] = target
+        buffer_views.append(view)
+        binary += data.tobytes()
+        binary += b"\0" * (-len(binary) % 4)
+    position_data = arrays[0][0]
+    accessors = [
+        {
+            "bufferView": 0,
+            "componentType": GLTF_FLOAT,
+            "count": len(positions),
+            "type": "VEC3",
+            "min": position_data.min(axis=0).tolist(),
+            "max": position_data.max(axis=0).tolist(),
+        },
+        {
+            "bufferView": 1,
+            "componentType": GLTF_FLOAT,
+            "count": len(normals),
+            "type": "VEC3",
+        },
+        {
+            "bufferView": 2,
+            "componentType": GLTF_UNSIGNED_SHORT,
+            "count": len(triangles),
+            "type": "SCALAR",
+        },
+        {
+            "bufferView": 3,
+            "componentType": GLTF_UNSIGNED_SHORT,
+            "count": len(lines),
+            "type": "SCALAR",
+        },
+        {
+            "bufferView": 4,
+            "componentType": GLTF_FLOAT,
+            "count": len(catalogue.offsets),
+            "type": "VEC3",
+        },
+    ]
+    document = {
+        "asset": {"version": "2.0", "generator": "chronotva"},
+        "extensionsUsed": [GLTF_INSTANCING],
+        "extensionsRequired": [GLTF_INSTANCING],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [
+            {
+                "name": "catalogue",
+                "mesh": 0,
+                "extensions": {GLTF_INSTANCING: {"attributes": {"TRANSLATION": 4}}},
+                "extras": {
+                    "unfoldings": {
+                        str(uid): list(span) for uid, span in catalogue.ranges.items()
+                    }
+                },
+            }
+        ],
+        "meshes": [
+            {
+                "name": "unit_cube",
+                "primitives": [
+                    {
+                        "attributes": {"POSITION": 0, "NORMAL": 1},
+                        "indices": 2,
+                        "material": 0,
+                        "mode": GLTF_TRIANGLES,
+                    },
+                    {
+                        "attributes": {"POSITION": 0},
+                        "indices": 3,
+                        "material": 1,
+                        "mode": GLTF_LINES,
+                    },
+                ],
+            }
+        ],
+        "materials": [
+            gltf_material("blocks", plot_params.colors[0]),
+            gltf_material("edges", plot_params.edgecolors[0]),
+        ],
+        "accessors": accessors,
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    return pack_glb(json.dumps(document, separators=(",", ":")).encode(), bytes(binary))
+
+
+def encode_viewer_html(catalogue: Catalogue, plot_params: PlotParameters) -> bytes:
+    """Encodes a catalogue as a self-contained HTML page with a WebGL 2 viewer.
+
+    The page draws one unit cube per instance from an embedded buffer of int16
+    cube offsets. It shows the whole catalogue or a single unfolding, and the
+    camera orbits with the mouse and zooms with the wheel.
+
+    Args:
+        catalogue: The catalogue.
+        plot_params: The plot parameters, whose first block and edge colors and
+            view angle are used.
+
+    Returns:
+        The HTML page.
+
+    Raises:
+        ValueError: If the catalogue does not fit into int16 offsets.
+    """
+    if np.abs(catalogue.offsets).max() > np.iinfo(np.int16).max:
+        raise ValueError("The catalogue is too large for the HTML viewer.")
+    positions, normals, triangles, lines = unit_cube()
+    elevation, azimuth = plot_params.view_angle
+    payload = {
+        "offsets": base64.b64encode(catalogue.offsets.astype("<i2").tobytes()).decode(),
+        "index": {str(uid): list(span) for uid, span in catalogue.ranges.items()},
+        "faces": positions[triangles].reshape(-1).astype(int).tolist(),
+        "normals": normals[triangles].reshape(-1).astype(int).tolist(),
+        "edges": positions[lines].reshape(-1).astype(int).tolist(),
+        "light": LIGHT_DIRECTION.round(6).tolist(),
+        "color": list(plot_params.colors[0]),
+        "edgeColor": list(plot_params.edgecolors[0]),
+        "elevation": elevation,
+        "azimuth": azimuth,
+    }
+    page = VIEWER_PAGE.substitute(
+        data=json.dumps(payload, separators=(",", ":")).replace("</", "<\\/")
+    )
+    return page.encode()
+
+
+def export_viewer(
+    data: Dict[int, List[Tuple[int, int, int]]],
+    output_path: str,
+    plot_params: PlotParameters,
+    unfolding_ids: Optional[List[int]] = None,
+) -> str:
+    """Exports unfoldings as one instanced glTF file or HTML viewer page.
+
+    Args:
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        output_path: The path of the '.glb' or '.html' file.
+        plot_params: The plot parameters providing colors and the initial view.
+        unfolding_ids: An optional list of unfolding IDs. If None, all unfoldings are used.
+
+    Returns:
+        The output path.
+
+    Raises:
+        ValueError: If the file suffix is not supported or no unfolding is selected.
+    """
+    viewer_format = os.path.splitext(output_path)[1].lower().lstrip(".")
+    if viewer_format not in VIEWER_FORMATS:
+        raise ValueError(
+            f"Unsupported viewer file: {output_path}. Options: {', '.join('.' + option for option in VIEWER_FORMATS)}."
+        )
+    catalogue = build_catalogue(data, unfolding_ids)
+    encode = encode_viewer_glb if viewer_format == "glb" else encode_viewer_html
+    content = encode(catalogue, plot_params)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, "wb") as viewer_file:
+        viewer_file.write(content)
+    logger.info(
+        f"Saved {len(catalogue.offsets)} cubes of {len(catalogue.ranges)} unfoldings to '{output_path}' ({len(content)} bytes)"
+    )
+    return output_path
+
+
+VIEWER_PAGE = string.Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>ChronoTVA unfoldings</title>
+<style>
+html, body { margin: 0; height: 100%; overflow: hidden; font: 14px sans-serif; }
+canvas { display: block; width: 100%; height: 100%; touch-action: none; }
+#controls { position: absolute; top: 8px; left: 8px; }
+</style>
+</head>
+<body>
+<div id="controls">
+<button id="previous">&lt;</button>
+<select id="unfolding"><option value="">All unfoldings</option></select>
+<button id="next">&gt;</button>
+</div>
+<canvas id="view"></canvas>
+<script id="catalogue" type="application/json">$data</script>
+<script>
+"use strict";
+const data = JSON.parse(document.getElementById("catalogue").textContent);
+const bytes = Uint8Array.from(atob(data.offsets), (c) => c.charCodeAt(0));
+const offsets = new Int16Array(bytes.buffer);
+const total = offsets.length / 3;
+const canvas = document.getElementById("view");
+const gl = canvas.getContext("webgl2", { antialias: true });
+if (!gl) document.body.textContent = "This viewer needs WebGL 2.";
+
+function compile(type, source) {
+  const shader = gl.createShader(type);
+  gl.shaderSource(shader, source);
+  gl.compileShader(shader);
+  return shader;
+}
+const program = gl.createProgram();
+gl.attachShader(program, compile(gl.VERTEX_SHADER, `#version 300 es
+in vec3 position; in vec3 normal; in vec3 offset;
+uniform mat4 camera; uniform vec3 light; uniform float shaded;
+out float shading;
+void main() {
+  gl_Position = camera * vec4(position + offset, 1.0);
+  shading = mix(1.0, 0.65 + 0.35 * dot(normal, light), shaded);
+}`));
+gl.attachShader(program, compile(gl.FRAGMENT_SHADER, `#version 300 es
+precision mediump float;
+uniform vec4 color; in float shading; out vec4 fragment;
+void main() { fragment = vec4(color.rgb * shading, color.a); }`));
+gl.linkProgram(program);
+gl.useProgram(program);
+const uniform = (name) => gl.getUniformLocation(program, name);
+const attribute = (name) => gl.getAttribLocation(program, name);
+
+function geometry(vertices, normals) {
+  const vao = gl.createVertexArray();
+  gl.bindVertexArray(vao);
+  for (const [name, values] of [["position", vertices], ["normal", normals]]) {
+    if (!values) continue;
+    gl.bindBuffer(gl.ARRAY_BUFFER, gl.createBuffer());
+    gl.bufferData(gl.ARRAY_BUFFER, new Float32Array(values), gl.STATIC_DRAW);
+    gl.enableVertexAttribArray(attribute(name));
+    gl.vertexAttribPointer(attribute(name), 3, gl.FLOAT, false, 0, 0);
+  }
+  gl.bindBuffer(gl.ARRAY_BUFFER, instances);
+  gl.enableVertexAttribArray(attribute("offset"));
+  gl.vertexAttribDivisor(attribute("offset"), 1);
+  return { vao, count: vertices.length / 3 };
+}
+const instances = gl.createBuffer();
+gl.bindBuffer(gl.ARRAY_BUFFER, instances);
+gl.bufferData(gl.ARRAY_BUFFER, offsets, gl.STATIC_DRAW);
+const faces = geometry(data.faces, data.normals);
+const edges = geometry(data.edges, null);
+
+let range = [0, total];
+let elevation = data.elevation, azimuth = data.azimuth, zoom = 1;
+let center = [0, 0, 0], radius = 1;
+function focus() {
+  const [start, count] = range;
+  const lower = [Infinity, Infinity, Infinity], upper = [-Infinity, -Infinity, -Infinity];
+  for (let i = start * 3; i < (start + count) * 3; i++) {
+    lower[i % 3] = Math.min(lower[i % 3], offsets[i]);
+    upper[i % 3] = Math.max(upper[i % 3], offsets[i] + 1);
+  }
+  center = lower.map((low, axis) => (low + upper[axis]) / 2);
+  radius = Math.hypot(...lower.map((low, axis) => upper[axis] - low)) / 2;
+  zoom = 1;
+}
+
+function cameraMatrix() {
+  const e = elevation * Math.PI / 180, a = azimuth * Math.PI / 180;
+  const back = [Math.cos(e) * Math.cos(a), Math.cos(e) * Math.sin(a), Math.sin(e)];
+  const right = [-Math.sin(a), Math.cos(a), 0];
+  const up = [-Math.sin(e) * Math.cos(a), -Math.sin(e) * Math.sin(a), Math.cos(e)];
+  const distance = 3 * radius * zoom, near = distance / 100, far = distance + 2 * radius;
+  const f = 1 / Math.tan(Math.PI / 8), aspect = canvas.width / canvas.height;
+  const eye = center.map((c, i) => c + back[i] * distance);
+  const dot = (v) => v[0] * eye[0] + v[1] * eye[1] + v[2] * eye[2];
+  const view = [
+    right[0], up[0], back[0], 0, right[1], up[1], back[1], 0,
+    right[2], up[2], back[2], 0, -dot(right), -dot(up), -dot(back), 1,
+  ];
+  const projection = [
+    f / aspect, 0, 0, 0, 0, f, 0, 0,
+    0, 0, (far + near) / (near - far), -1, 0, 0, 2 * far * near / (near - far), 0,
+  ];
+  const matrix = new Array(16).fill(0);
+  for (let column = 0; column < 4; column++)
+    for (let row = 0; row < 4; row++)
+      for (let k = 0; k < 4; k++)
+        matrix[column * 4 + row] += projection[k * 4 + row] * view[column * 4 + k];
+  return matrix;
+}
+
+function draw() {
+  canvas.width = canvas.clientWidth * devicePixelRatio;
+  canvas.height = canvas.clientHeight * devicePixelRatio;
+  gl.viewport(0, 0, canvas.width, canvas.height);
+  gl.clearColor(0, 0, 0, 0);
+  gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT);
+  gl.enable(gl.DEPTH_TEST);
+  gl.enable(gl.BLEND);
+  gl.blendFunc(gl.SRC_ALPHA, gl.ONE_MINUS_SRC_ALPHA);
+  gl.uniformMatrix4fv(uniform("camera"), false, cameraMatrix());
+  gl.uniform3fv(uniform("light"), data.light);
+  const [start, count] = range;
+  for (const [shape, mode, color, shaded] of [
+    [faces, gl.TRIANGLES, data.color, 1],
+    [edges, gl.LINES, data.edgeColor, 0],
+  ]) {
+    gl.bindVertexArray(shape.vao);
+    gl.bindBuffer(gl.ARRAY_BUFFER, instances);
+    gl.vertexAttribPointer(attribute("offset"), 3, gl.SHORT, false, 0, start * 6);
+    gl.uniform4fv(uniform("color"), color);
+    gl.uniform1f(uniform("shaded"), shaded);
+    if (shaded) gl.enable(gl.POLYGON_OFFSET_FILL); else gl.disable(gl.POLYGON_OFFSET_FILL);
+    gl.polygonOffset(1, 1);
+    gl.drawArraysInstanced(mode, 0, shape.count, count);
+  }
+}
+
+const select = document.getElementById("unfolding");
+for (const id of Object.keys(data.index)) select.add(new Option(`Unfolding $${id}`, id));
+function show(id) {
+  select.value = id;
+  range = id ? data.index[id] : [0, total];
+  focus();
+  draw();
+}
+select.onchange = () => show(select.value);
+function step(delta) {
+  const options = select.options.length;
+  show(select.options[(select.selectedIndex + delta + options) % options].value);
+}
+document.getElementById("previous").onclick = () => step(-1);
+document.getElementById("next").onclick = () => step(1);
+document.onkeydown = (event) => {
+  if (event.key === "ArrowLeft") step(-1);
+  if (event.key === "ArrowRight") step(1);
+};
+let dragging = null;
+canvas.onpointerdown = (event) => { dragging = [event.clientX, event.clientY]; canvas.setPointerCapture(event.pointerId); };
+canvas.onpointerup = () => { dragging = null; };
+canvas.onpointermove = (event) => {
+  if (!dragging) return;
+  azimuth -= (event.clientX - dragging[0]) / 2;
+  elevation = Math.max(-89, Math.min(89, elevation + (event.clientY - dragging[1]) / 2));
+  dragging = [event.clientX, event.clientY];
+  draw();
+};
+canvas.onwheel = (event) => { event.preventDefault(); zoom *= Math.exp(event.deltaY / 500); draw(); };
+window.onresize = draw;
+show("");
+</script>
+</body>
+</html>
+""")
@@ -0,0 +1,356 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Areas and distances below this are treated as zero, in the units of the
+# projected unit cubes.
+EPSILON = 1e-9
+
+Point = Tuple[float, float]
+Polygon = List[Point]
+
+
+def polygon_area(polygon: Sequence[Point]) -> float:
+    """Returns the signed area of a polygon, positive if counter-clockwise.
+
+    Args:
+        polygon: The corners of the polygon.
+
+    Returns:
+        The signed area.
+    """
+    area = 0.0
+    for (x0, y0), (x1, y1) in zip(polygon, [*polygon[1:], *polygon[:1]]):
+        area += x0 * y1 - x1 * y0
+    return area / 2
+
+
+def side(start: Point, end: Point, point: Point) -> float:
+    """Returns how far a point lies to the left of the directed line start-end.
+
+    Args:
+        start: A point on the line.
+        end: Another point on the line.
+        point: The point to test.
+
+    Returns:
+        The cross product of end - start and point - start, positive to the left.
+    """
+    return (end[0] - start[0]) * (point[1] - start[1]) - (end[1] - start[1]) * (
+        point[0] - start[0]
+    )
+
+
+def clip_half_plane(
+    polygon: Sequence[Point], start: Point, end: Point, keep_left: bool
+) -> Polygon:
+    """Clips a convex polygon to one side of a line (Sutherland-Hodgman).
+
+    Args:
+        polygon: The corners of the convex polygon.
+        start: A point on the line.
+        end: Another point on the line.
+        keep_left: Whether to keep the part left or right of start-end.
+
+    Returns:
+        The corners of the clipped polygon without repeated points, empty if
+        nothing remains.
+    """
+    sign = 1.0 if keep_left else -1.0
+    distances = [sign * side(start, end, point) for point in polygon]
+    clipped: Polygon = []
+    for index, (point, distance) in enumerate(zip(polygon, distances)):
+        following = polygon[(index + 1) % len(polygon)]
+        following_distance = distances[(index + 1) % len(polygon)]
+        if distance >= 0:
+            clipped.append(point)
+        if (distance > 0 > following_distance) or (distance < 0 < following_distance):
+            t = distance / (distance - following_distance)
+            clipped.append(
+                (
+                    point[0] + t * (following[0] - point[0]),
+                    point[1] + t * (following[1] - point[1]),
+                )
+            )
+    clipped = [
+        point
+        for index, point in enumerate(clipped)
+        if abs(point[0] - clipped[index - 1][0]) > EPSILON
+        or abs(point[1] - clipped[index - 1][1]) > EPSILON
+    ]
+    return clipped if abs(polygon_area(clipped)) > EPSILON else []
+
+
+def intersect_convex(polygon: Sequence[Point], clip: Sequence[Point]) -> Polygon:
+    """Returns the intersection of two convex counter-clockwise polygons.
+
+    Args:
+        polygon: The corners of the first polygon.
+        clip: The corners of the second polygon.
+
+    Returns:
+        The corners of the intersection, empty if the polygons only touch.
+    """
+    result: Polygon = list(polygon)
+    for start, end in zip(clip, [*clip[1:], *clip[:1]]):
+        result = clip_half_plane(result, start, end, keep_left=True)
+        if not result:
+            break
+    return result
+
+
+def subtract_convex(polygon: Sequence[Point], hole: Sequence[Point]) -> List[Polygon]:
+    """Removes a convex polygon from another one.
+
+    The polygon is cut along the edges of the hole one after another: the part
+    outside an edge is kept as a piece and the part inside is cut further, so
+    that what is left in the end lies inside the hole.
+
+    Args:
+        polygon: The corners of the convex counter-clockwise polygon.
+        hole: The corners of the convex counter-clockwise polygon to remove.
+
+    Returns:
+        Convex counter-clockwise pieces that together cover the difference.
+    """
+    pieces: List[Polygon] = []
+    remaining: Polygon = list(polygon)
+    for start, end in zip(hole, [*hole[1:], *hole[:1]]):
+        outside = clip_half_plane(remaining, start, end, keep_left=False)
+        if outside:
+            pieces.append(outside)
+        remaining = clip_half_plane(remaining, start, end, keep_left=True)
+        if not remaining:
+            break
+    return pieces
+
+
+def hidden_interval(
+    start: Point, end: Point, occluder: Sequence[Point]
+) -> Optional[Tuple[float, float]]:
+    """Returns the part of a segment strictly inside a convex polygon (Cyrus-Beck).
+
+    Segments running along the boundary of the polygon are not hidden by it.
+
+    Args:
+        start: The first end of the segment.
+        end: The second end of the segment.
+        occluder: The corners of the convex counter-clockwise polygon.
+
+    Returns:
+        The (first, last) parameters of the hidden part along start-end, or None
+        if no part of the segment lies inside the polygon.
+    """
+    first, last = 0.0, 1.0
+    for edge_start, edge_end in zip(occluder, [*occluder[1:], *occluder[:1]]):
+        length = float(
+            np.hypot(edge_end[0] - edge_start[0], edge_end[1] - edge_start[1])
+        )
+        start_distance = side(edge_start, edge_end, start) / length
+        end_distance = side(edge_start, edge_end, end) / length
+        if start_distance <= EPSILON and end_distance <= EPSILON:
+            return None
+        if start_distance < 0:
+            first = max(first, start_distance / (start_distance - end_distance))
+        elif end_distance < 0:
+            last = min(last, start_distance / (start_distance - end_distance))
+        if last - first <= EPSILON:
+            return None
+    return first, last
+
+
+def visible_intervals(
+    intervals: List[Tuple[float, float]], hidden: Tuple[float, float]
+) -> List[Tuple[float, float]]:
+    """Removes a hidden interval from a list of visible intervals.
+
+    Args:
+        intervals: The visible (first, last) parameter intervals.
+        hidden: The hidden (first, last) interval.
+
+    Returns:
+        The remaining visible intervals.
+    """
+    remaining = []
+    for first, last in intervals:
+        if hidden[0] - first > EPSILON:
+            remaining.append((first, min(last, hidden[0])))
+        if last - hidden[1] > EPSILON:
+            remaining.append((max(first, hidden[1]), last))
+    return remaining
+
+
+def interpolate(start: Point, end: Point, t: float) -> Point:
+    """Returns the point at parameter t along the segment start-end.
+
+    Args:
+        start: The point at t = 0.
+        end: The point at t = 1.
+        t: The parameter.
+
+    Returns:
+        The interpolated point.
+    """
+    return start[0] + t * (end[0] - start[0]), start[1] + t * (end[1] - start[1])
+
+
+def plane_depth(polygon: np.ndarray, point: Point) -> float:
+    """Returns the depth of a planar polygon's plane above a projected point.
+
+    Args:
+        polygon: An array of shape (N, 3) with the projected corners of the
+            polygon and their depths.
+        point: The projected point.
+
+    Returns:
+        The depth of the plane at the point.
+    """
+    origin = polygon[0]
+    normal = np.cross(polygon[1] - origin, polygon[2] - origin)
+    return float(
+        origin[2]
+        - (normal[0] * (point[0] - origin[0]) + normal[1] * (point[1] - origin[1]))
+        / normal[2]
+    )
+
+
+def chain_segments(segments: Sequence[Tuple[Point, Point]]) -> List[Polygon]:
+    """Joins segments that share end points into polylines.
+
+    Args:
+        segments: The (start, end) points of the segments. End points are only
+            joined if they are exactly equal.
+
+    Returns:
+        The polylines, each following the direction of its first segment.
+        Closed polylines end with their first point.
+    """
+    touching: Dict[Point, List[int]] = {}
+    for index, (start, end) in enumerate(segments):
+        touching.setdefault(start, []).append(index)
+        touching.setdefault(end, []).append(index)
+
+    used = [False] * len(segments)
+    polylines: List[Polygon] = []
+    for index, segment in enumerate(segments):
+        if used[index]:
+            continue
+        used[index] = True
+        polyline = list(segment)
+        # Extend the polyline forwards, then backwards from its first point.
+        for _ in range(2):
+            while True:
+                following = next(
+                    (other for other in touching[polyline[-1]] if not used[other]),
+                    None,
+                )
+                if following is None:
+                    break
+                used[following] = True
+                start, end = segments[following]
+                polyline.append(end if start == polyline[-1] else start)
+            polyline.reverse()
+        polylines.append(polyline)
+    return polylines
+
+
+def resolve_visibility(
+    polygons: np.ndarray,
+    segments: Optional[np.ndarray] = None,
+    owners: Optional[np.ndarray] = None,
+) -> Tuple[List[List[np.ndarray]], List[List[np.ndarray]]]:
+    """Finds the visible parts of opaque planar polygons in an orthographic view.
+
+    Every polygon is clipped against the polygons that overlap it in front,
+    so the visible parts of all polygons cover the image without overlapping
+    and can be drawn in any order. Which of two overlapping polygons is in front
+    is decided at the centroid of their overlap, which is exact for polygons
+    that do not pass through each other.
+
+    Args:
+        polygons: An array of shape (F, N, 3) with the corners of convex polygons
+            projected onto the image plane, counter-clockwise as seen by the
+            viewer, with the depth towards the viewer as third coordinate.
+        segments: An optional array of shape (E, 2, 3) with the projected edges
+            to draw. Defaults to the outlines of the polygons.
+        owners: An array of shape (E,) with the polygon every segment lies on,
+            required with segments. A segment is hidden where that polygon is.
+
+    Returns:
+        For every polygon, the list of its visible convex fragments as (K, 2)
+        arrays and the list of the visible parts of its segments as (P, 2)
+        polylines. Closed polylines end with their first point.
+    """
+    outlines: List[Polygon] = [
+        [(float(x), float(y)) for x, y in polygon[:, :2]] for polygon in polygons
+    ]
+    if segments is None or owners is None:
+        edge_list = [
+            (start, end)
+            for outline in outlines
+            for start, end in zip(outline, [*outline[1:], *outline[:1]])
+        ]
+        owner_list = [index for index, outline in enumerate(outlines) for _ in outline]
+    else:
+        edge_list = [
+            ((float(x0), float(y0)), (float(x1), float(y1)))
+            for (x0, y0), (x1, y1) in segments[:, :, :2].tolist()
+        ]
+        owner_list = owners.tolist()
+
+    lower = polygons[:, :, :2].min(axis=1)
+    upper = polygons[:, :, :2].max(axis=1)
+    overlapping = np.all(
+        (lower[:, np.newaxis] < upper[np.newaxis] - EPSILON)
+        & (lower[np.newaxis] < upper[:, np.newaxis] - EPSILON),
+        axis=2,
+    )
+    np.fill_diagonal(overlapping, False)
+
+    occluders: List[List[int]] = [[] for _ in outlines]
+    for back, front in zip(*np.nonzero(np.triu(overlapping))):
+        overlap = intersect_convex(outlines[back], outlines[front])
+        if not overlap:
+            continue
+        centroid = (
+            sum(x for x, _ in overlap) / len(overlap),
+            sum(y for _, y in overlap) / len(overlap),
+        )
+        if plane_depth(polygons[back], centroid) > plane_depth(
+            polygons[front], centroid
+        ):
+            back, front = front, back
+        occluders[back].append(front)
+
+    fragments: List[List[np.ndarray]] = []
+    for outline, hiding in zip(outlines, occluders):
+        pieces = [outline]
+        for occluder in hiding:
+            pieces = [
+                piece
+                for whole in pieces
+                for piece in subtract_convex(whole, outlines[occluder])
+            ]
+        fragments.append([np.array(piece) for piece in pieces])
+
+    # Visible pieces keep the exact end points of their segments where they
+    # reach them, so that pieces of neighbouring segments can be joined.
+    visible: List[List[Tuple[Point, Point]]] = [[] for _ in outlines]
+    for (start, end), owner in zip(edge_list, owner_list):
+        intervals = [(0.0, 1.0)]
+        for occluder in occluders[owner]:
+            hidden = hidden_interval(start, end, outlines[occluder])
+            if hidden is not None:
+                intervals = visible_intervals(intervals, hidden)
+        for first, last in intervals:
+            visible[owner].append(
+                (
+                    start if first <= EPSILON else interpolate(start, end, first),
+                    end if last >= 1 - EPSILON else interpolate(start, end, last),
+                )
+            )
+    edges = [
+        [np.array(polyline) for polyline in chain_segments(pieces)]
+        for pieces in visible
+    ]
+    return fragments, edges
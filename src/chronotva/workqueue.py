@@ -0,0 +1,521 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .journal import check_time_limit, time_limit
+from .sinks import DirectorySink
+from .sweep import (
+    JobSpec,
+    SweepOutput,
+    SweepTask,
+    prepare_job,
+    render_task,
+    schedule_tasks,
+)
+from .tesseract import Palette, PlotParameters
+
+logger = logging.getLogger(__name__)
+
+PENDING_DIR = "pending"
+LEASED_DIR = "leased"
+DONE_DIR = "done"
+FAILED_DIR = "failed"
+TEMPORARY_DIR = "tmp"
+CLOCK_FILE = "clock"
+TASK_SUFFIX = ".json"
+DEFAULT_LEASE_SECONDS = 300.0
+# How long an idle worker waits before looking for tasks again, in seconds.
+IDLE_SECONDS = 2.0
+
+
+def encode_task(task: SweepTask) -> Dict[str, Any]:
+    """Converts a sweep task to JSON-compatible values.
+
+    Args:
+        task: The task.
+
+    Returns:
+        A dictionary that `decode_task` turns back into the task.
+    """
+    return {
+        "output_dir": task.output_dir,
+        "unfolding_id": task.unfolding_id,
+        "plot_params": task.plot_params._asdict(),
+        "outputs": [
+            {
+                "palette": (
+                    output.palette._asdict() if output.palette is not None else None
+                ),
+                "output_format": output.output_format,
+                "name": output.name,
+            }
+            for output in task.outputs
+        ],
+        "engine": task.engine,
+    }
+
+
+def decode_colors(colors: List[List[float]]) -> List[Tuple[float, float, float, float]]:
+    """Converts JSON color lists back to RGBA tuples.
+
+    Args:
+        colors: The colors as lists of four numbers.
+
+    Returns:
+        The colors as RGBA tuples.
+    """
+    return [(red, green, blue, alpha) for red, green, blue, alpha in colors]
+
+
+def decode_task(entry: Dict[str, Any]) -> SweepTask:
+    """Converts the output of `encode_task` back to a sweep task.
+
+    Args:
+        entry: The encoded task.
+
+    Returns:
+        The task.
+    """
+    params = entry["plot_params"]
+    elevation, azimuth = params["view_angle"]
+    plot_params = PlotParameters(
+        **{
+            **params,
+            "colors": decode_colors(params["colors"]),
+            "edgecolors": decode_colors(params["edgecolors"]),
+            "view_angle": (elevation, azimuth),
+            "extent": (
+                tuple(params["extent"]) if params["extent"] is not None else None
+            ),
+        }
+    )
+    outputs = [
+        SweepOutput(
+            (
+                Palette(
+                    output["palette"]["name"],
+                    decode_colors(output["palette"]["colors"]),
+                    decode_colors(output["palette"]["edgecolors"]),
+                )
+                if output["palette"] is not None
+                else None
+            ),
+            output["output_format"],
+            output["name"],
+        )
+        for output in entry["outputs"]
+    ]
+    return SweepTask(
+        entry["output_dir"],
+        entry["unfolding_id"],
+        plot_params,
+        outputs,
+        entry["engine"],
+    )
+
+
+class Lease(NamedTuple):
+    """A task claimed by a worker.
+
+    Attributes:
+        name: The file name of the task in the queue.
+        entry: The queued entry with the encoded task and its attempts.
+        token: The unique token of this claim, which names the leased file.
+    """
+
+    name: str
+    entry: Dict[str, Any]
+    token: str
+
+
+def leased_name(name: str, token: str) -> str:
+    """Returns the file name of a task leased by a claim.
+
+    Args:
+        name: The file name of the task, ending with '.json'.
+        token: The token of the claim.
+
+    Returns:
+        The name with the token inserted before '.json'.
+    """
+    return f"{name[: -len(TASK_SUFFIX)]}.{token}{TASK_SUFFIX}"
+
+
+def task_name(leased: str) -> str:
+    """Strips the token from the file name of a leased task.
+
+    Args:
+        leased: A name returned by `leased_name`.
+
+    Returns:
+        The file name of the task.
+    """
+    return f"{leased[: -len(TASK_SUFFIX)].rsplit('.', 1)[0]}{TASK_SUFFIX}"
+
+
+class FileQueue:
+    """A work queue of task files in a directory shared by several hosts.
+
+    Tasks move between subdirectories by atomic renames: a worker claims a
+    pending task by renaming it into 'leased', which only one worker can do,
+    and renames it into 'done' or 'failed' when it is finished. Every claim
+    adds a unique token to the name of the leased file, so a worker whose
+    lease expired cannot renew, complete or fail the claim of another worker
+    that took the task over. The
+    modification time of a leased file is the lease: the worker renews it
+    while it renders, and a lease that has not been renewed for the lease
+    time is returned to 'pending', so the tasks of a worker that died are
+    taken up by the others. Lease times are measured against the clock of
+    the shared file system, so the clocks of the hosts need not agree.
+    """
+
+    def __init__(
+        self, directory: str, lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ) -> None:
+        """Opens a queue, creating its directories if needed.
+
+        Args:
+            directory: The queue directory. It must be on a file system that
+                renames files atomically, like any local or NFS file system.
+            lease_seconds: The time after which a lease that was not renewed
+                expires.
+        """
+        self.directory = directory
+        self.lease_seconds = lease_seconds
+        for subdirectory in (
+            PENDING_DIR,
+            LEASED_DIR,
+            DONE_DIR,
+            FAILED_DIR,
+            TEMPORARY_DIR,
+        ):
+            os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+
+    def path(self, state: str, name: str) -> str:
+        """Returns the path of a task file.
+
+        Args:
+            state: The subdirectory, e.g. PENDING_DIR.
+            name: The file name of the task.
+
+        Returns:
+            The path.
+        """
+        return os.path.join(self.directory, state, name)
+
+    def names(self, state: str) -> List[str]:
+        """Lists the task files in a subdirectory.
+
+        Args:
+            state: The subdirectory, e.g. PENDING_DIR.
+
+        Returns:
+            The sorted file names of the tasks.
+        """
+        return sorted(
+            name
+            for name in os.listdir(os.path.join(self.directory, state))
+            if name.endswith(TASK_SUFFIX)
+        )
+
+    def write(self, state: str, name: str, entry: Dict[str, Any]) -> None:
+        """Writes a task file atomically, so no worker sees it half written.
+
+        Args:
+            state: The subdirectory, e.g. PENDING_DIR.
+            name: The file name of the task.
+            entry: The entry with the encoded task.
+        """
+        partial = self.path(TEMPORARY_DIR, f"{uuid.uuid4().hex}{TASK_SUFFIX}")
+        with open(partial, "w") as task_file:
+            json.dump(entry, task_file)
+        os.replace(partial, self.path(state, name))
+
+    def put(self, name: str, task: SweepTask) -> None:
+        """Adds a pending task.
+
+        Args:
+            name: The file name of the task, ending with '.json'. Pending tasks
+                are claimed in the order of their names.
+            task: The task.
+        """
+        self.write(PENDING_DIR, name, {"task": encode_task(task), "errors": []})
+
+    def now(self) -> float:
+        """Returns the current time of the shared file system.
+
+        Returns:
+            The modification time of a freshly touched file in the queue.
+        """
+        clock = os.path.join(self.directory, CLOCK_FILE)
+        with open(clock, "a"):
+            os.utime(clock)
+        return os.stat(clock).st_mtime
+
+    def claim(self) -> Optional[Lease]:
+        """Claims the first pending task.
+
+        Returns:
+            The lease of the task, or None if no task is pending.
+        """
+        for name in self.names(PENDING_DIR):
+            token = uuid.uuid4().hex
+            pending = self.path(PENDING_DIR, name)
+            leased = self.path(LEASED_DIR, leased_name(name, token))
+            try:
+                # Renaming keeps the modification time, so the lease starts
+                # before the task is moved.
+                os.utime(pending)
+                os.rename(pending, leased)
+                with open(leased) as task_file:
+                    return Lease(name, json.load(task_file), token)
+            except FileNotFoundError:
+                # Another worker claimed the task first.
+                continue
+        return None
+
+    def leased_path(self, lease: Lease) -> str:
+        """Returns the path of the file of a lease.
+
+        Args:
+            lease: The lease.
+
+        Returns:
+            The path, which only exists while the lease is held.
+        """
+        return self.path(LEASED_DIR, leased_name(lease.name, lease.token))
+
+    def renew(self, lease: Lease) -> bool:
+        """Extends a lease.
+
+        Args:
+            lease: The lease.
+
+        Returns:
+            False if the lease has been lost because it expired.
+        """
+        try:
+            os.utime(self.leased_path(lease))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, lease: Lease) -> None:
+        """Marks a leased task as done.
+
+        Args:
+            lease: The lease of the task.
+        """
+        try:
+            os.rename(self.leased_path(lease), self.path(DONE_DIR, lease.name))
+        except FileNotFoundError:
+            logger.warning(
+                f"The lease of task '{lease.name}' expired before it was done; it may be rendered again."
+            )
+
+    def fail(self, lease: Lease, error: str, retries: int) -> bool:
+        """Returns a failed task to the queue, or marks it as failed.
+
+        Args:
+            lease: The lease of the task.
+            error: A description of the error.
+            retries: The number of times a task may fail and be queued again.
+
+        Returns:
+            True if the task was queued again. False if it was marked as failed,
+            or if the lease had been lost and the task is in other hands.
+        """
+        entry = {**lease.entry, "errors": [*lease.entry["errors"], error]}
+        retry = len(entry["errors"]) <= retries
+        # Taking the leased file away first makes sure the lease is still held,
+        # so a lost task is neither queued twice nor failed under another worker.
+        partial = self.path(TEMPORARY_DIR, f"{uuid.uuid4().hex}{TASK_SUFFIX}")
+        try:
+            os.rename(self.leased_path(lease), partial)
+        except FileNotFoundError:
+            logger.warning(
+                f"The lease of task '{lease.name}' expired before it failed; it may be rendered again."
+            )
+            return False
+        with open(partial, "w") as task_file:
+            json.dump(entry, task_file)
+        os.replace(partial, self.path(PENDING_DIR if retry else FAILED_DIR, lease.name))
+        return retry
+
+    def recover_expired(self) -> int:
+        """Returns the tasks of expired leases to the pending tasks.
+
+        Returns:
+            The number of recovered tasks.
+        """
+        deadline = self.now() - self.lease_seconds
+        recovered = 0
+        for leased_file in self.names(LEASED_DIR):
+            leased = self.path(LEASED_DIR, leased_file)
+            name = task_name(leased_file)
+            try:
+                if os.stat(leased).st_mtime >= deadline:
+                    continue
+                os.rename(leased, self.path(PENDING_DIR, name))
+            except FileNotFoundError:
+                continue
+            logger.warning(f"Recovered task '{name}' from an expired lease")
+            recovered += 1
+        return recovered
+
+    def counts(self) -> Dict[str, int]:
+        """Counts the tasks in every state.
+
+        Returns:
+            The number of pending, leased, done and failed tasks.
+        """
+        return {
+            state: len(self.names(state))
+            for state in (PENDING_DIR, LEASED_DIR, DONE_DIR, FAILED_DIR)
+        }
+
+
+def enqueue_job(
+    spec: JobSpec,
+    data: Dict[int, List[Tuple[int, int, int]]],
+    directory: str,
+) -> int:
+    """Plans a sweep and adds its tasks to a file queue instead of rendering.
+
+    The tasks are queued longest expected first, and the directories of the
+    outputs are created, so workers only write files into them. A relative
+    output directory is made absolute, so that workers in other working
+    directories write to the same place.
+
+    Args:
+        spec: The sweep. Its output directory must be shared by all workers.
+        data: A dictionary mapping unfolding IDs to lists of block coordinates.
+        directory: The queue directory.
+
+    Returns:
+        The number of queued tasks.
+
+    Raises:
+        ValueError: If the engine cannot write a format or the output names are
+            invalid.
+    """
+    spec = spec._replace(output_dir=os.path.abspath(spec.output_dir))
+    tasks, model = prepare_job(spec, data, 1)
+    tasks = schedule_tasks(tasks, model)
+    DirectorySink(spec.output_dir).prepare(
+        output.name for task in tasks for output in task.outputs
+    )
+    queue = FileQueue(directory)
+    for index, task in enumerate(tasks):
+        queue.put(f"{index:08d}_unfolding_{task.unfolding_id}{TASK_SUFFIX}", task)
+    logger.info(
+        f"Queued {len(tasks)} tasks with {sum(len(task.outputs) for task in tasks)} outputs in '{directory}'"
+    )
+    return len(tasks)
+
+
+class Heartbeat:
+    """Renews a lease in a background thread while its task renders."""
+
+    def __init__(self, queue: FileQueue, lease: Lease) -> None:
+        """Starts renewing the lease three times per lease time.
+
+        Args:
+            queue: The queue.
+            lease: The lease.
+        """
+        self.queue = queue
+        self.lease = lease
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Renews the lease until stopped or lost."""
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(self.lease):
+                logger.warning(f"Lost the lease of task '{self.lease.name}'")
+                return
+
+    def stop(self) -> None:
+        """Stops renewing the lease."""
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_worker(
+    directory: str,
+    data: Mapping[int, List[Tuple[int, int, int]]],
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    retries: int = 0,
+    task_timeout: Optional[float] = None,
+    wait: bool = False,
+) -> int:
+    """Renders tasks from a file queue until it is drained.
+
+    Any number of workers on hosts sharing the queue and output directories can
+    drain one queue together. Expired leases of workers that died are recovered
+    and their tasks rendered again.
+
+    Args:
+        directory: The queue directory.
+        data: A mapping of unfolding IDs to lists of block coordinates.
+        lease_seconds: The time after which a lease that was not renewed
+            expires. All workers of a queue should use the same.
+        retries: The number of times a failed task is queued again.
+        task_timeout: An optional time limit in seconds for every task. See
+            `time_limit`.
+        wait: Whether to keep waiting for new tasks when the queue is drained,
+            instead of exiting.
+
+    Returns:
+        The number of tasks this worker rendered.
+
+    Raises:
+        ValueError: If the lease time, retries or time limit are invalid.
+    """
+    if lease_seconds <= 0:
+        raise ValueError("The lease time must be positive.")
+    if retries < 0:
+        raise ValueError("The number of retries must not be negative.")
+    check_time_limit(task_timeout)
+    queue = FileQueue(directory, lease_seconds)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Worker {worker} is draining '{directory}'")
+    rendered = 0
+    while True:
+        queue.recover_expired()
+        lease = queue.claim()
+        if lease is None:
+            if not wait and not queue.names(LEASED_DIR):
+                break
+            # Leased tasks may still expire and be returned to the queue.
+            time.sleep(IDLE_SECONDS)
+            continue
+        task = decode_task(lease.entry["task"])
+        heartbeat = Heartbeat(queue, lease)
+        try:
+            with time_limit(task_timeout):
+                render_task(task, data)
+        except Exception as error:
+            description = f"{type(error).__name__}: {error}"
+            retried = queue.fail(lease, description, retries)
+            logger.warning(
+                f"Task '{lease.name}' failed{', queued again' if retried else ''}. Error: {description}"
+            )
+            continue
+        finally:
+            heartbeat.stop()
+        queue.complete(lease)
+        rendered += 1
+        logger.info(f"Rendered task '{lease.name}'")
+    counts = queue.counts()
+    logger.info(
+        f"Worker {worker} rendered {rendered} tasks; the queue has {counts[DONE_DIR]} done and {counts[FAILED_DIR]} failed tasks"
+    )
+    return rendered
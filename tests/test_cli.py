@@ -1,12 +1,21 @@
+import hashlib
+import json
 import os
+import shutil
+import sqlite3
 import sys
+import zipfile
 from pathlib import Path
-from typing import Any, List
+from typing import Any, BinaryIO, List, Optional
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
+from PIL import Image
 
 from src.chronotva.cli import main
+from src.chronotva.default_data import default_data
+from src.chronotva.shared import WorkerLimits
 
 
 @pytest.fixture
@@ -22,6 +31,17 @@ def run_cli_test(args: List[str], mock_plot: Any) -> None:
             main()
 
 
+def run_raster_cli_test(args: List[str], mock_plot: Any) -> MagicMock:
+    # Raster images are drawn as blank pixels and encoded for real. With raster
+    # formats, vector images are rendered into memory for the background encoder.
+    with patch(
+        "src.chronotva.raster.render_pixels",
+        return_value=np.zeros((2, 2, 4), dtype=np.uint8),
+    ) as mock_pixels:
+        run_cli_test(args, mock_plot)
+    return mock_pixels
+
+
 def test_default_behavior(temp_output_dir: Path) -> None:
     test_args = [
         "--output-dir",
@@ -147,6 +167,68 @@ def test_transparent_argument(temp_output_dir: Path) -> None:
     assert mock_plot.call_count == 261
 
 
+def test_reproducible_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--reproducible",
+        "--unfolding-ids",
+        "1,2",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert all(call.args[1].reproducible for call in mock_plot.call_args_list)
+
+
+def test_negative_svg_precision(temp_output_dir: Path) -> None:
+    test_args = ["--svg-precision", "-1", "--output-dir", str(temp_output_dir)]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_raster_arguments(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1",
+        "--output-format",
+        "png,webp",
+        "--png-compression",
+        "9",
+        "--png-colors",
+        "64",
+        "--webp-quality",
+        "80",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    mock_pixels = run_raster_cli_test(test_args, mock_plot)
+    mock_plot.assert_not_called()
+    # Both formats are encoded from one rasterization.
+    mock_pixels.assert_called_once()
+    plot_params = mock_pixels.call_args.args[2]
+    assert plot_params.png_compression == 9
+    assert plot_params.png_colors == 64
+    assert plot_params.webp_quality == 80
+    assert sorted(os.listdir(temp_output_dir)) == [
+        "unfolding_1.png",
+        "unfolding_1.webp",
+    ]
+
+
+def test_invalid_raster_arguments(temp_output_dir: Path) -> None:
+    for raster_args in (
+        ["--png-compression", "10"],
+        ["--png-colors", "1"],
+        ["--webp-quality", "101"],
+    ):
+        test_args = raster_args + ["--output-dir", str(temp_output_dir)]
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(test_args, MagicMock())
+        assert e.value.code == 2
+
+
 def test_shade_argument(temp_output_dir: Path) -> None:
     test_args = [
         "--shade",
@@ -308,7 +390,7 @@ def test_output_directory_creation() -> None:
     mock_plot = MagicMock()
     run_cli_test(test_args, mock_plot)
     assert os.path.exists("non_existing_dir")
-    os.rmdir("non_existing_dir")
+    shutil.rmtree("non_existing_dir")
 
 
 def test_unfolding_ids_valid(temp_output_dir: Path) -> None:
@@ -375,5 +457,707 @@ def test_unfolding_ids_empty(temp_output_dir: Path) -> None:
     assert mock_plot.call_count == expected_count
 
 
+def test_profile_argument(temp_output_dir: Path, tmp_path: Path) -> None:
+    profile_dir = tmp_path / "profile"
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--profile",
+        str(profile_dir),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_count == 2
+    prof_files = [name for name in os.listdir(profile_dir) if name.endswith(".prof")]
+    assert len(prof_files) == 2
+    assert (profile_dir / "summary.txt").exists()
+
+
+def test_metrics_file_argument(temp_output_dir: Path, tmp_path: Path) -> None:
+    metrics_path = tmp_path / "chronotva.prom"
+    test_args = [
+        "--unfolding-ids",
+        "1,2,5",
+        "--metrics-file",
+        str(metrics_path),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_count == 3
+    text = metrics_path.read_text()
+    assert 'chronotva_images_rendered_total{format="svg",engine="matplotlib"} 3' in text
+
+
+def test_metrics_file_written_on_failure(temp_output_dir: Path, tmp_path: Path) -> None:
+    metrics_path = tmp_path / "chronotva.prom"
+    test_args = [
+        "--unfolding-ids",
+        "1",
+        "--metrics-file",
+        str(metrics_path),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock(side_effect=RuntimeError("boom")))
+    assert e.value.code == 1
+    text = metrics_path.read_text()
+    assert 'chronotva_render_failures_total{format="svg",engine="matplotlib"} 1' in text
+
+
+def failing_plot(
+    failing_ids: List[int],
+    failing_format: Optional[str] = None,
+    failures: Optional[int] = None,
+) -> Any:
+    # Fails the renders of the given unfoldings, optionally only in one format
+    # and only the first few times.
+    remaining = {uid: failures for uid in failing_ids}
+
+    def plot(coordinates: Any, params: Any, fmt: str, target: BinaryIO) -> None:
+        for uid, count in remaining.items():
+            if (
+                coordinates == default_data[uid]
+                and failing_format in (None, fmt)
+                and count != 0
+            ):
+                remaining[uid] = None if count is None else count - 1
+                raise RuntimeError("boom")
+        target.write(b"data")
+
+    return MagicMock(side_effect=plot)
+
+
+def test_profile_report_of_failed_run(temp_output_dir: Path, tmp_path: Path) -> None:
+    profile_dir = tmp_path / "profile"
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--profile",
+        str(profile_dir),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, failing_plot([2]))
+    assert e.value.code == 1
+    assert (profile_dir / "summary.txt").exists()
+
+
+def test_failing_unfolding_is_isolated(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2,3",
+        "--retries",
+        "1",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = failing_plot([2])
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, mock_plot)
+    assert e.value.code == 1
+    # The failing unfolding is tried twice, the others are still rendered.
+    assert mock_plot.call_count == 4
+    assert sorted(os.listdir(temp_output_dir)) == [
+        "journal.jsonl",
+        "unfolding_1.svg",
+        "unfolding_3.svg",
+    ]
+
+    # A resumed run only renders what is missing and removes the journal.
+    mock_plot = failing_plot([])
+    run_cli_test([*test_args, "--resume"], mock_plot)
+    assert mock_plot.call_count == 1
+    assert sorted(os.listdir(temp_output_dir)) == [
+        "unfolding_1.svg",
+        "unfolding_2.svg",
+        "unfolding_3.svg",
+    ]
+
+
+@pytest.mark.parametrize("failures", [1, None])
+def test_retry_with_archive(tmp_path: Path, failures: Optional[int]) -> None:
+    archive_path = tmp_path / "out.zip"
+    test_args = [
+        "--unfolding-ids",
+        "1,3",
+        "--output-format",
+        "png,svg",
+        "--retries",
+        "1",
+        "--archive",
+        str(archive_path),
+    ]
+    mock_plot = failing_plot([3], "svg", failures)
+    if failures is None:
+        with pytest.raises(SystemExit):
+            run_raster_cli_test(test_args, mock_plot)
+    else:
+        run_raster_cli_test(test_args, mock_plot)
+    # Only the outputs of a successful attempt are written, each once.
+    with zipfile.ZipFile(archive_path) as archive:
+        names = archive.namelist()
+        manifest = json.loads(archive.read("manifest.json"))
+    expected = ["unfolding_1.png", "unfolding_1.svg"]
+    if failures is not None:
+        expected += ["unfolding_3.png", "unfolding_3.svg"]
+    assert names == expected + ["manifest.json"]
+    assert [entry["name"] for entry in manifest["outputs"]] == expected
+
+
+@pytest.mark.parametrize(
+    "failures, expected",
+    [
+        (1, ["render_retries_total{labels} 1"]),
+        (None, ["render_retries_total{labels} 2", "render_failures_total{labels} 1"]),
+    ],
+)
+def test_metrics_count_retries_separately(
+    temp_output_dir: Path, tmp_path: Path, failures: Optional[int], expected: List[str]
+) -> None:
+    metrics_path = tmp_path / "chronotva.prom"
+    test_args = [
+        "--unfolding-ids",
+        "1,3",
+        "--retries",
+        "2",
+        "--metrics-file",
+        str(metrics_path),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = failing_plot([3], None, failures)
+    if failures is None:
+        with pytest.raises(SystemExit):
+            run_cli_test(test_args, mock_plot)
+    else:
+        run_cli_test(test_args, mock_plot)
+    labels = '{format="svg",engine="matplotlib"}'
+    lines = [
+        line
+        for line in metrics_path.read_text().splitlines()
+        if line.startswith(("chronotva_render_retries", "chronotva_render_failures"))
+    ]
+    assert sorted(lines) == sorted(
+        f"chronotva_{line.format(labels=labels)}" for line in expected
+    )
+
+
+def test_recovery_arguments_invalid(temp_output_dir: Path, tmp_path: Path) -> None:
+    for recovery_args in (
+        ["--retries", "-1"],
+        ["--task-timeout", "0"],
+        ["--resume", "--archive", str(tmp_path / "images.zip")],
+    ):
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(
+                [*recovery_args, "--output-dir", str(temp_output_dir)], MagicMock()
+            )
+        assert e.value.code == 2
+    # Without an output directory, there is no journal to resume from.
+    mock_plot = MagicMock()
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(["--resume"], mock_plot)
+    assert e.value.code == 2
+    mock_plot.assert_not_called()
+
+
+def test_task_timeout_without_sigalrm(
+    temp_output_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Where the time limit cannot be enforced, the option is rejected.
+    monkeypatch.delattr("signal.SIGALRM", raising=False)
+    mock_plot = MagicMock()
+    for test_args in (
+        ["--task-timeout", "60", "--output-dir", str(temp_output_dir)],
+        ["worker", "--queue", str(tmp_path), "--task-timeout", "60"],
+    ):
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(test_args, mock_plot)
+        assert e.value.code == 2
+    mock_plot.assert_not_called()
+
+
+def test_uniform_scale_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,4",
+        "--uniform-scale",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_count == 2
+    extents = {call.args[1].extent for call in mock_plot.call_args_list}
+    assert extents == {(3.0, 4.0, 4.0)}
+
+
+@pytest.mark.parametrize("engine", ["matplotlib", "native-raster"])
+def test_uniform_scale_gives_equal_frames(temp_output_dir: Path, engine: str) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,4,100",
+        "--uniform-scale",
+        "--output-format",
+        "png",
+        "--dpi",
+        "50",
+        "--engine",
+        engine,
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    # The images are rendered for real; only vector output would be mocked.
+    run_cli_test(test_args, MagicMock())
+    sizes = {
+        Image.open(os.path.join(root, name)).size
+        for root, _, names in os.walk(temp_output_dir)
+        for name in names
+        if name.endswith(".png")
+    }
+    assert len(sizes) == 1
+
+
+def test_default_scale_has_no_extent(temp_output_dir: Path) -> None:
+    test_args = ["--unfolding-ids", "1", "--output-dir", str(temp_output_dir)]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_args.args[1].extent is None
+
+
+def test_palettes_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2,5",
+        "--palettes",
+        "brand=255,0,0,1/0,0,0,1",
+        "blue",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_count == 6
+    first, second = mock_plot.call_args_list[:2]
+    assert first.args[1].colors == [(1, 0, 0, 1)]
+    assert first.args[1].edgecolors == [(0, 0, 0, 1)]
+    assert second.args[1].edgecolors == [(25 / 255, 25 / 255, 25 / 255, 1)]
+    assert os.path.exists(temp_output_dir / "unfolding_1_brand.svg")
+    assert os.path.exists(temp_output_dir / "unfolding_1_palette2.svg")
+
+
+def test_palettes_duplicate_names(temp_output_dir: Path) -> None:
+    test_args = [
+        "--palettes",
+        "a=red",
+        "a=blue",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_multiple_output_formats(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--output-format",
+        "png,svg,pdf",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock(
+        side_effect=lambda coordinates, params, fmt, target: target.write(b"data")
+    )
+    mock_pixels = run_raster_cli_test(test_args, mock_plot)
+    # PNG images are drawn as pixels and encoded apart from the vector outputs.
+    assert mock_pixels.call_count == 2
+    assert [call.args[2] for call in mock_plot.call_args_list] == [
+        "svg",
+        "pdf",
+        "svg",
+        "pdf",
+    ]
+    assert sorted(os.listdir(temp_output_dir)) == [
+        "unfolding_1.pdf",
+        "unfolding_1.png",
+        "unfolding_1.svg",
+        "unfolding_2.pdf",
+        "unfolding_2.png",
+        "unfolding_2.svg",
+    ]
+    with open(temp_output_dir / "unfolding_1.png", "rb") as png_file:
+        assert png_file.read(8) == b"\x89PNG\r\n\x1a\n"
+
+
+def test_invalid_output_format(temp_output_dir: Path) -> None:
+    test_args = [
+        "--output-format",
+        "png,gif",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_archive_argument(tmp_path: Path) -> None:
+    archive_path = tmp_path / "out.zip"
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--output-format",
+        "png,svg",
+        "--archive",
+        str(archive_path),
+    ]
+    mock_plot = MagicMock(
+        side_effect=lambda coordinates, params, fmt, target: target.write(b"data")
+    )
+    mock_pixels = run_raster_cli_test(test_args, mock_plot)
+    assert mock_pixels.call_count == 2
+    assert mock_plot.call_count == 2
+    with zipfile.ZipFile(archive_path) as archive:
+        assert archive.namelist() == [
+            "unfolding_1.png",
+            "unfolding_1.svg",
+            "unfolding_2.png",
+            "unfolding_2.svg",
+            "manifest.json",
+        ]
+    assert sorted(os.listdir(tmp_path)) == ["out.zip"]
+
+
+def test_render_db_argument(temp_output_dir: Path, tmp_path: Path) -> None:
+    db_path = tmp_path / "renders.sqlite"
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--engine",
+        "native-vector",
+        "--output-format",
+        "svg,pdf",
+        "--render-db",
+        str(db_path),
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    run_cli_test(test_args, MagicMock())
+    archive_path = tmp_path / "out.zip"
+    run_cli_test([*test_args, "--archive", str(archive_path)], MagicMock())
+
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute(
+        "SELECT unfolding_id, format, engine, location, content_hash, bytes FROM renders ORDER BY id"
+    ).fetchall()
+    connection.close()
+    assert [row[:3] for row in rows[:4]] == [
+        (1, "svg", "native-vector"),
+        (1, "pdf", "native-vector"),
+        (2, "svg", "native-vector"),
+        (2, "pdf", "native-vector"),
+    ]
+    for _, _, _, location, content_hash, size in rows[:4]:
+        data = Path(location).read_bytes()
+        assert (hashlib.sha256(data).hexdigest(), len(data)) == (content_hash, size)
+    with zipfile.ZipFile(archive_path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))["outputs"]
+    assert [row[3] for row in rows[4:]] == [
+        f"{archive_path}:{entry['name']}" for entry in manifest
+    ]
+    assert [row[4] for row in rows[4:]] == [entry["sha256"] for entry in manifest]
+
+
+def test_archive_unsupported_type(tmp_path: Path) -> None:
+    test_args = ["--unfolding-ids", "1", "--archive", str(tmp_path / "out.rar")]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_dataset_argument(tmp_path: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--dataset",
+        str(tmp_path / "dataset"),
+        "--dataset-views",
+        "4",
+        "--jobs",
+        "2",
+        "--seed",
+        "3",
+        "--max-tasks-per-worker",
+        "10",
+    ]
+    mock_plot = MagicMock()
+    with patch("src.chronotva.cli.export_dataset") as mock_export:
+        run_cli_test(test_args, mock_plot)
+    assert mock_plot.call_count == 0
+    args = mock_export.call_args.args
+    assert args[2:] == (
+        str(tmp_path / "dataset"),
+        [1, 2],
+        4,
+        None,
+        2,
+        3,
+        WorkerLimits(10, None),
+        None,
+    )
+
+
+def test_worker_limit_invalid(tmp_path: Path) -> None:
+    test_args = ["--dataset", str(tmp_path), "--max-worker-memory", "0"]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_output_template_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--palettes",
+        "a=red",
+        "b=blue",
+        "--output-template",
+        "{palette}/{format}/{id}_{view}.{format}",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    assert sorted(
+        os.path.relpath(os.path.join(directory, name), temp_output_dir)
+        for directory, _, names in os.walk(temp_output_dir)
+        for name in names
+    ) == [
+        os.path.join("a", "svg", "1_30_22.5.svg"),
+        os.path.join("a", "svg", "2_30_22.5.svg"),
+        os.path.join("b", "svg", "1_30_22.5.svg"),
+        os.path.join("b", "svg", "2_30_22.5.svg"),
+    ]
+
+
+def test_shard_depth_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1",
+        "--shard-depth",
+        "2",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    [(directory, _, names)] = [entry for entry in os.walk(temp_output_dir) if entry[2]]
+    relative_path = os.path.relpath(os.path.join(directory, names[0]), temp_output_dir)
+    shards = relative_path.split(os.sep)
+    assert len(shards) == 3 and shards[2] == "unfolding_1.svg"
+    assert all(len(shard) == 2 for shard in shards[:2])
+
+
+def test_hostile_palette_name(temp_output_dir: Path, tmp_path: Path) -> None:
+    for output_args in (
+        ["--output-dir", str(temp_output_dir)],
+        ["--archive", str(tmp_path / "images.zip")],
+    ):
+        mock_plot = MagicMock()
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(["--palettes", "x/../../..=red", *output_args], mock_plot)
+        assert e.value.code == 2
+        mock_plot.assert_not_called()
+    assert os.listdir(tmp_path) == [temp_output_dir.name]
+
+
+def test_output_template_invalid(temp_output_dir: Path) -> None:
+    for template in ("{name}.svg", "unfolding.{format}"):
+        test_args = [
+            "--output-template",
+            template,
+            "--output-dir",
+            str(temp_output_dir),
+        ]
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(test_args, MagicMock())
+        assert e.value.code == 2
+
+
+def test_run_job_file(temp_output_dir: Path, tmp_path: Path) -> None:
+    job_path = tmp_path / "job.toml"
+    job_path.write_text(f"""output_dir = "{temp_output_dir.as_posix()}"
+unfolding_ids = [1, 2]
+jobs = 4
+
+[sweep]
+palettes = ["red", "blue"]
+views = [[30, 22.5], [45, 45]]
+formats = ["png", "svg"]
+""")
+    mock_plot = MagicMock(
+        side_effect=lambda coordinates, params, fmt, target: target.write(b"data")
+    )
+    mock_pixels = run_raster_cli_test(["run", str(job_path), "--jobs", "1"], mock_plot)
+    assert mock_pixels.call_count == 2 * 2 * 2
+    assert mock_plot.call_count == 2 * 2 * 2
+    outputs = os.listdir(temp_output_dir)
+    assert "unfolding_1_palette1_30_22.5.png" in outputs
+    assert len(outputs) == 2 * 2 * 2 * 2
+
+
+def test_run_job_dry_run(
+    temp_output_dir: Path, tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    job_path = tmp_path / "job.toml"
+    job_path.write_text(f"""output_dir = "{temp_output_dir.as_posix()}"
+unfolding_ids = [1, 2]
+
+[sweep]
+formats = ["png", "svg"]
+""")
+    mock_plot = MagicMock()
+    run_cli_test(["run", str(job_path), "--jobs", "2", "--dry-run"], mock_plot)
+    mock_plot.assert_not_called()
+    assert os.listdir(temp_output_dir) == []
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split("\t")[-1] for line in lines[1:5]] == [
+        "unfolding_1.png",
+        "unfolding_1.svg",
+        "unfolding_2.png",
+        "unfolding_2.svg",
+    ]
+    assert lines[5] == "Outputs: 4 in 2 tasks"
+    assert lines[7].startswith("Wall time on 2 workers: ")
+
+
+def test_run_job_queue_and_worker(temp_output_dir: Path, tmp_path: Path) -> None:
+    job_path = tmp_path / "job.toml"
+    job_path.write_text(f"""output_dir = "{temp_output_dir.as_posix()}"
+unfolding_ids = [1, 2]
+
+[sweep]
+formats = ["png", "svg"]
+""")
+    queue_dir = tmp_path / "queue"
+    mock_plot = MagicMock()
+    run_cli_test(["run", str(job_path), "--queue", str(queue_dir)], mock_plot)
+    mock_plot.assert_not_called()
+    assert len(os.listdir(queue_dir / "pending")) == 2
+
+    mock_plot.side_effect = lambda coordinates, params, fmt, target: target.write(
+        b"data"
+    )
+    mock_pixels = run_raster_cli_test(["worker", "--queue", str(queue_dir)], mock_plot)
+    assert mock_pixels.call_count == 2
+    assert mock_plot.call_count == 2
+    assert os.listdir(queue_dir / "pending") == []
+    assert len(os.listdir(queue_dir / "done")) == 2
+
+
+def test_worker_arguments_invalid(tmp_path: Path) -> None:
+    for worker_args in (
+        [],
+        ["--queue", str(tmp_path), "--lease-seconds", "0"],
+        ["--queue", str(tmp_path), "--retries", "-1"],
+    ):
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(["worker", *worker_args], MagicMock())
+        assert e.value.code == 2
+
+
+def test_run_job_file_invalid(tmp_path: Path) -> None:
+    job_path = tmp_path / "job.toml"
+    job_path.write_text('[sweep]\nformats = ["gif"]\n')
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(["run", str(job_path)], MagicMock())
+    assert e.value.code == 2
+
+
+def test_engine_argument(temp_output_dir: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--engine",
+        "native-vector",
+        "--output-format",
+        "svg,pdf",
+        "--output-dir",
+        str(temp_output_dir),
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    mock_plot.assert_not_called()
+    assert sorted(os.listdir(temp_output_dir)) == [
+        "unfolding_1.pdf",
+        "unfolding_1.svg",
+        "unfolding_2.pdf",
+        "unfolding_2.svg",
+    ]
+
+
+def test_engine_invalid(temp_output_dir: Path) -> None:
+    for engine_args in (
+        ["--engine", "povray"],
+        ["--engine", "native-raster", "--output-format", "svg"],
+    ):
+        test_args = engine_args + ["--output-dir", str(temp_output_dir)]
+        with pytest.raises(SystemExit) as e:
+            run_cli_test(test_args, MagicMock())
+        assert e.value.code == 2
+
+
+def test_mesh_argument(tmp_path: Path) -> None:
+    test_args = [
+        "--unfolding-ids",
+        "1,2",
+        "--mesh",
+        str(tmp_path / "meshes"),
+        "--mesh-format",
+        "obj,glb",
+    ]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    mock_plot.assert_not_called()
+    assert sorted(os.listdir(tmp_path / "meshes")) == [
+        "unfolding_1.glb",
+        "unfolding_1.obj",
+        "unfolding_2.glb",
+        "unfolding_2.obj",
+    ]
+
+
+def test_mesh_format_invalid(tmp_path: Path) -> None:
+    test_args = ["--mesh", str(tmp_path), "--mesh-format", "ply"]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
+def test_viewer_argument(tmp_path: Path) -> None:
+    viewer_path = tmp_path / "viewer" / "catalogue.html"
+    test_args = ["--unfolding-ids", "1,2", "--viewer", str(viewer_path)]
+    mock_plot = MagicMock()
+    run_cli_test(test_args, mock_plot)
+    mock_plot.assert_not_called()
+    assert '"index":{"1":[0,8],"2":[8,8]}' in viewer_path.read_text()
+
+
+def test_viewer_unsupported_file(tmp_path: Path) -> None:
+    test_args = ["--viewer", str(tmp_path / "catalogue.usdz")]
+    with pytest.raises(SystemExit) as e:
+        run_cli_test(test_args, MagicMock())
+    assert e.value.code == 2
+
+
 if __name__ == "__main__":
     pytest.main()
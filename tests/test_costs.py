@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.chronotva.costs import COST_MODEL_VERSION, CostModel, output_keys
+
+
+def keys(unfolding_id: int, output_format: str = "png", dpi: int = 100) -> list:
+    return output_keys("matplotlib", unfolding_id, output_format, dpi, (40, 30))
+
+
+def test_output_keys() -> None:
+    assert output_keys("native-vector", 7, "svg", 300, (800, 600)) == [
+        "native-vector/svg/300/800x600/7",
+        "native-vector/svg/300/800x600",
+    ]
+
+
+def test_cost_model_estimates() -> None:
+    model = CostModel()
+    assert model.estimate(keys(1), default=0.5) == 0.5
+    assert model.estimate_size(keys(1), default=1000) == 1000
+    model.record(keys(1), 0.2, 1000)
+    model.record(keys(1), 0.4, 2000)
+    model.record(keys(2), 1.2, 6000)
+    assert model.estimate(keys(1), default=0.5) == pytest.approx(0.3)
+    assert model.estimate(keys(2), default=0.5) == pytest.approx(1.2)
+    assert model.estimate_size(keys(1), default=0) == pytest.approx(1500)
+    # Unfoldings without measurements use the mean over all unfoldings.
+    assert model.estimate(keys(3), default=0.5) == pytest.approx(0.6)
+    assert model.estimate_size(keys(3), default=0) == pytest.approx(3000)
+    assert model.estimate(keys(1, "svg"), default=0.5) == 0.5
+    assert model.estimate(keys(1, dpi=200), default=0.5) == 0.5
+
+
+def test_cost_model_save_and_load(tmp_path: Path) -> None:
+    path = tmp_path / "models" / "costs.json"
+    model = CostModel(str(path))
+    model.record(keys(1, "svg", 300), 0.25, 2048)
+    model.save()
+    stored = json.loads(path.read_text())
+    assert stored["version"] == COST_MODEL_VERSION
+    assert stored["timings"]["matplotlib/svg/300/40x30/1"] == [1, 0.25]
+    assert stored["sizes"]["matplotlib/svg/300/40x30"] == [1, 2048]
+    loaded = CostModel(str(path))
+    assert loaded.means == model.means
+    assert loaded.sizes == model.sizes
+    assert [entry.name for entry in path.parent.iterdir()] == ["costs.json"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["{", '{"version": 1, "timings": {}}', '{"version": 2, "timings": {}}', "[]"],
+)
+def test_cost_model_ignores_invalid_file(tmp_path: Path, content: str) -> None:
+    path = tmp_path / "costs.json"
+    path.write_text(content)
+    model = CostModel(str(path))
+    assert model.means == {}
+    assert model.sizes == {}
@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.chronotva.dataset import (
+    IMAGES_FILE,
+    LABELS_FILE,
+    METADATA_FILE,
+    PALETTES_FILE,
+    VIEWS_FILE,
+    export_dataset,
+    plan_samples,
+)
+from src.chronotva.tesseract import Palette, PlotParameters
+
+DATA = {
+    1: [(0, 0, 0), (1, 0, 0)],
+    2: [(0, 0, 0), (0, 0, 1), (0, 1, 1)],
+}
+
+
+@pytest.fixture
+def plot_params() -> PlotParameters:
+    return PlotParameters(
+        colors=[(1, 0, 0, 1)],
+        edgecolors=[(0, 0, 0, 1)],
+        view_angle=(30, 22.5),
+        dpi=40,
+        transparent=True,
+        shade=False,
+        show_axes=False,
+        bbox_inches="tight",
+        height=0.8,
+        width=1.0,
+    )
+
+
+def test_plan_samples_single_view() -> None:
+    samples = plan_samples([1, 2], (30, 22.5), palette_count=2)
+    assert [(s.position, s.unfolding_id, s.palette_index) for s in samples] == [
+        (0, 1, 0),
+        (1, 1, 1),
+        (2, 2, 0),
+        (3, 2, 1),
+    ]
+    assert {s.view_angle for s in samples} == {(30, 22.5)}
+
+
+def test_plan_samples_random_views_are_seeded() -> None:
+    samples = plan_samples([1], (30, 22.5), views_per_unfolding=3, seed=7)
+    assert len({s.view_angle for s in samples}) == 3
+    assert samples == plan_samples([1], (30, 22.5), views_per_unfolding=3, seed=7)
+
+
+def test_export_dataset(tmp_path: Path, plot_params: PlotParameters) -> None:
+    palettes = [
+        Palette("red", [(1, 0, 0, 1)], [(0, 0, 0, 1)]),
+        Palette("blue", [(0, 0, 1, 1)], [(0, 0, 0, 1)]),
+    ]
+    images_path = export_dataset(
+        DATA, plot_params, str(tmp_path), views_per_unfolding=2, palettes=palettes
+    )
+
+    images = np.load(images_path, mmap_mode="r")
+    assert images.shape == (8, 32, 40, 4)
+    assert images.dtype == np.uint8
+    assert images[..., 3].reshape(8, -1).max(axis=1).min() == 255
+    assert np.load(tmp_path / LABELS_FILE).tolist() == [1, 1, 1, 1, 2, 2, 2, 2]
+    assert np.load(tmp_path / PALETTES_FILE).tolist() == [0, 1] * 4
+    assert np.load(tmp_path / VIEWS_FILE).shape == (8, 2)
+    metadata = json.loads((tmp_path / METADATA_FILE).read_text())
+    assert metadata["shape"] == [8, 32, 40, 4]
+    assert metadata["palettes"] == ["red", "blue"]
+    red, blue = images[0], images[1]
+    assert red[..., 0].sum() > blue[..., 0].sum()
+
+
+def test_export_dataset_with_workers(
+    tmp_path: Path, plot_params: PlotParameters
+) -> None:
+    serial_path = export_dataset(DATA, plot_params, str(tmp_path / "serial"))
+    parallel_path = export_dataset(
+        DATA, plot_params, str(tmp_path / "parallel"), jobs=2
+    )
+    assert np.array_equal(np.load(serial_path), np.load(parallel_path))
+
+
+def test_export_dataset_invalid_arguments(
+    tmp_path: Path, plot_params: PlotParameters
+) -> None:
+    with pytest.raises(ValueError):
+        export_dataset(DATA, plot_params, str(tmp_path), views_per_unfolding=0)
+    with pytest.raises(ValueError):
+        export_dataset(DATA, plot_params, str(tmp_path), jobs=0)
+    with pytest.raises(ValueError):
+        export_dataset(DATA, plot_params, str(tmp_path), unfolding_ids=[999])
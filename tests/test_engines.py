@@ -0,0 +1,70 @@
+from typing import Any, Dict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.chronotva import engines
+from src.chronotva.engines import (
+    check_formats,
+    create_engine,
+    engine_names,
+    process_engine,
+    register_engine,
+    warm_engine,
+)
+from src.chronotva.native import RasterEngine, VectorEngine
+from src.chronotva.tesseract import BlockPlotter
+
+
+def test_create_builtin_engines() -> None:
+    plotter = create_engine("matplotlib", scene_cache_size=2)
+    assert isinstance(plotter, BlockPlotter)
+    assert plotter.scene_cache_size == 2
+    assert isinstance(create_engine("native-raster"), RasterEngine)
+    assert isinstance(create_engine("native-vector"), VectorEngine)
+
+
+def test_create_unknown_engine() -> None:
+    with patch.object(engines, "entry_points", return_value={}):
+        with pytest.raises(ValueError, match="Unknown engine"):
+            create_engine("povray")
+
+
+def test_register_engine() -> None:
+    factory = MagicMock()
+    register_engine("custom", factory)
+    try:
+        assert create_engine("custom", scene_cache_size=3) is factory.return_value
+        factory.assert_called_once_with(scene_cache_size=3)
+        assert "custom" in engine_names()
+    finally:
+        engines.registered_engines.pop("custom")
+
+
+def test_entry_point_engines_load_lazily() -> None:
+    entry_point = MagicMock()
+    entry_point.name = "plugin"
+    found: Dict[str, Any] = {"plugin": entry_point}
+    with patch.object(engines, "entry_points", return_value=found):
+        create_engine("native-vector")
+        entry_point.load.assert_not_called()
+        engine = create_engine("plugin", scene_cache_size=1)
+    entry_point.load.assert_called_once_with()
+    assert engine is entry_point.load.return_value.return_value
+
+
+def test_check_formats() -> None:
+    check_formats(create_engine("native-vector"), ["svg", "pdf"])
+    with pytest.raises(ValueError, match="cannot write png"):
+        check_formats(create_engine("native-vector"), ["svg", "png"])
+
+
+def test_process_engine_is_created_once() -> None:
+    with patch.dict(engines.process_engines, clear=True):
+        engine = process_engine("native-vector")
+        assert process_engine("native-vector") is engine
+        assert isinstance(engine, VectorEngine)
+        warm_engine("native-vector", ["svg", "pdf"])
+        assert engines.process_engines == {"native-vector": engine}
+        assert (engine.cache_misses, engine.cache_hits) == (1, 1)
+        assert not engine.scenes
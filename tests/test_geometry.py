@@ -0,0 +1,105 @@
+import numpy as np
+
+from src.chronotva.geometry import (
+    centered_bounds,
+    coordinate_bounds,
+    cube_faces,
+    cube_vertices,
+    exposed_faces,
+    merge_coplanar_faces,
+    uniform_extent,
+    unique_edges,
+)
+
+
+def test_cube_vertices_single_cube() -> None:
+    vertices = cube_vertices([(1, 2, 3)])
+    assert vertices.shape == (8, 3)
+    assert vertices.min(axis=0).tolist() == [1, 2, 3]
+    assert vertices.max(axis=0).tolist() == [2, 3, 4]
+
+
+def test_cube_vertices_multiple_cubes() -> None:
+    vertices = cube_vertices([(0, 0, 0), (0, 0, -1)])
+    assert vertices.shape == (16, 3)
+    assert np.array_equal(vertices.min(axis=0), [0, 0, -1])
+    assert np.array_equal(vertices.max(axis=0), [1, 1, 1])
+
+
+def test_coordinate_bounds() -> None:
+    bounds = coordinate_bounds([(0, 0, 0), (0, -1, 0), (2, 0, 1)])
+    assert bounds == ((0, 3), (-1, 1), (0, 2))
+
+
+def test_uniform_extent() -> None:
+    extent = uniform_extent([[(0, 0, 0), (1, 0, 0)], [(0, 0, 0), (0, 0, 1), (0, 0, 2)]])
+    assert extent == (2, 1, 3)
+
+
+def test_uniform_extent_without_coordinates() -> None:
+    assert uniform_extent([]) is None
+
+
+def test_centered_bounds_fits_cubes_without_extent() -> None:
+    coordinates = [(0, 0, 0), (1, 0, 0)]
+    assert centered_bounds(coordinates) == coordinate_bounds(coordinates)
+
+
+def test_centered_bounds_with_extent() -> None:
+    bounds = centered_bounds([(0, 0, 0), (1, 0, 0)], (4, 2, 1))
+    assert bounds == ((-1, 3), (-0.5, 1.5), (0, 1))
+
+
+def test_cube_faces() -> None:
+    faces = cube_faces([(0, 0, 0), (2, 0, 0)])
+    assert faces.vertices.shape == (12, 4, 3)
+    assert faces.blocks.tolist() == [0] * 6 + [1] * 6
+    edges = faces.vertices[:, 1] - faces.vertices[:, 0]
+    diagonals = faces.vertices[:, 2] - faces.vertices[:, 0]
+    assert np.array_equal(np.cross(edges, diagonals), faces.normals)
+
+
+def test_exposed_faces_drop_glued_faces() -> None:
+    faces = exposed_faces([(0, 0, 0), (1, 0, 0), (1, 1, 0)])
+    assert len(faces.blocks) == 3 * 6 - 2 * 2
+    glued = [
+        (block, tuple(normal))
+        for block, normal in zip(faces.blocks.tolist(), faces.normals.tolist())
+    ]
+    assert (0, (1, 0, 0)) not in glued
+    assert (1, (-1, 0, 0)) not in glued
+    assert (1, (0, 1, 0)) not in glued
+    assert (2, (0, -1, 0)) not in glued
+
+
+def test_merge_coplanar_faces() -> None:
+    faces = merge_coplanar_faces(exposed_faces([(0, 0, 0), (1, 0, 0), (1, 1, 0)]))
+    assert len(faces.blocks) == 10
+    areas = np.linalg.norm(
+        np.cross(
+            faces.vertices[:, 1] - faces.vertices[:, 0],
+            faces.vertices[:, 3] - faces.vertices[:, 0],
+        ),
+        axis=1,
+    )
+    assert areas.sum() == 14
+    edges = faces.vertices[:, 1] - faces.vertices[:, 0]
+    diagonals = faces.vertices[:, 2] - faces.vertices[:, 0]
+    assert np.all(np.einsum("ij,ij->i", np.cross(edges, diagonals), faces.normals) > 0)
+
+
+def test_merge_coplanar_faces_groups() -> None:
+    faces = exposed_faces([(0, 0, 0), (1, 0, 0), (1, 1, 0)])
+    assert len(merge_coplanar_faces(faces, groups=faces.blocks % 2).blocks) == 14
+    merged = merge_coplanar_faces(faces, groups=faces.blocks // 2)
+    assert np.bincount(merged.blocks).tolist() == [5, 1, 5]
+
+
+def test_unique_edges() -> None:
+    faces = exposed_faces([(0, 0, 0), (1, 0, 0)])
+    segments, owners = unique_edges(faces)
+    assert segments.shape == (20, 2, 3)
+    assert owners.tolist() == sorted(owners.tolist())
+    assert np.all(np.abs(segments[:, 1] - segments[:, 0]).sum(axis=1) == 1)
+    keys = {tuple(sorted(map(tuple, segment.tolist()))) for segment in segments}
+    assert len(keys) == 20
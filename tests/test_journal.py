@@ -0,0 +1,108 @@
+import json
+import logging
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.chronotva.journal import (
+    RunJournal,
+    TaskFailure,
+    TaskTimeout,
+    check_time_limit,
+    run_with_retries,
+    time_limit,
+)
+
+
+def test_journal_resume(tmp_path: Path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = RunJournal(str(path))
+    journal.record_done(1, ["unfolding_1.svg", "unfolding_1.png"])
+    journal.record_failure(TaskFailure(2, 3, "RuntimeError: boom"))
+    journal.close()
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry["event"] for entry in entries] == ["done", "failed"]
+    assert entries[1]["attempts"] == 3
+
+    # A line cut short by an interruption is ignored.
+    with open(path, "a") as journal_file:
+        journal_file.write('{"event": "done", "unfolding_id": 3, "outp')
+    journal = RunJournal(str(path), resume=True)
+    assert journal.is_done(["unfolding_1.png"])
+    assert not journal.is_done(["unfolding_1.png", "unfolding_2.png"])
+    assert not journal.is_done([])
+    journal.close()
+
+    journal = RunJournal(str(path))
+    assert not journal.is_done(["unfolding_1.png"])
+    journal.close()
+    assert path.read_text() == ""
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="requires SIGALRM")
+def test_time_limit() -> None:
+    with pytest.raises(TaskTimeout):
+        with time_limit(0.05):
+            time.sleep(1)
+    with time_limit(1):
+        pass
+    with time_limit(None):
+        pass
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+
+def test_check_time_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    check_time_limit(None)
+    with pytest.raises(ValueError, match="positive"):
+        check_time_limit(0)
+    monkeypatch.delattr(signal, "SIGALRM", raising=False)
+    check_time_limit(None)
+    with pytest.raises(ValueError, match="SIGALRM"):
+        check_time_limit(1)
+
+
+def test_time_limit_warns_outside_main_thread(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    def limited() -> None:
+        with time_limit(1):
+            pass
+
+    with caplog.at_level(logging.WARNING, logger="src.chronotva.journal"):
+        thread = threading.Thread(target=limited)
+        thread.start()
+        thread.join()
+    assert "Cannot enforce the time limit of 1 seconds" in caplog.text
+
+
+def test_run_with_retries() -> None:
+    calls: List[int] = []
+    resets: List[int] = []
+
+    def flaky() -> None:
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("boom")
+
+    failure = run_with_retries(flaky, 1, retries=2, on_error=lambda: resets.append(1))
+    assert failure is None
+    assert len(calls) == 3
+    assert len(resets) == 2
+
+    calls.clear()
+    assert run_with_retries(flaky, 1, retries=1) == TaskFailure(
+        1, 2, "RuntimeError: boom"
+    )
+    assert len(calls) == 2
+
+
+def test_run_with_retries_does_not_catch_interrupts() -> None:
+    def interrupted() -> None:
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run_with_retries(interrupted, 1, retries=3)
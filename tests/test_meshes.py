@@ -0,0 +1,107 @@
+import json
+import struct
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.chronotva.default_data import default_data
+from src.chronotva.meshes import (
+    CATALOGUE_NAME,
+    GLB_MAGIC,
+    Mesh,
+    build_mesh,
+    export_meshes,
+)
+
+L_TROMINO = [(0, 0, 0), (1, 0, 0), (1, 1, 0)]
+
+
+def assert_watertight(mesh: Mesh) -> None:
+    edges = Counter(
+        (int(a), int(b))
+        for triangle in mesh.triangles
+        for a, b in zip(triangle, np.roll(triangle, -1))
+    )
+    for (a, b), count in edges.items():
+        assert count == 1
+        assert edges[(b, a)] == 1
+    corners = mesh.vertices[mesh.triangles]
+    crosses = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    assert np.all(np.einsum("ij,ij->i", crosses, mesh.normals) > 0)
+
+
+def test_build_mesh_merges_faces() -> None:
+    mesh = build_mesh([(0, 0, 0), (1, 0, 0)])
+    assert len(mesh.vertices) == 8
+    assert len(mesh.triangles) == 12
+    assert_watertight(mesh)
+
+
+def test_build_mesh_has_no_t_junctions() -> None:
+    mesh = build_mesh(L_TROMINO)
+    assert len(mesh.vertices) == 14
+    assert len(mesh.vertices) - len(mesh.triangles) * 3 // 2 + len(mesh.triangles) == 2
+    assert_watertight(mesh)
+
+
+def test_build_mesh_all_unfoldings() -> None:
+    for coordinates in default_data.values():
+        mesh = build_mesh(coordinates)
+        assert len(np.unique(mesh.vertices, axis=0)) == len(mesh.vertices)
+        assert len(mesh.triangles) < 8 * 6 * 2
+        assert_watertight(mesh)
+
+
+def test_export_obj(tmp_path: Path) -> None:
+    paths = export_meshes({1: L_TROMINO}, str(tmp_path))
+    assert paths == [str(tmp_path / "unfolding_1.obj")]
+    lines = Path(paths[0]).read_text().splitlines()
+    assert "o unfolding_1" in lines
+    assert sum(line.startswith("v ") for line in lines) == 14
+    assert sum(line.startswith("f ") for line in lines) == 24
+
+
+def test_export_stl(tmp_path: Path) -> None:
+    (path,) = export_meshes({1: L_TROMINO}, str(tmp_path), mesh_formats=["stl"])
+    content = Path(path).read_bytes()
+    (count,) = struct.unpack("<I", content[80:84])
+    assert count == 24
+    assert len(content) == 84 + count * 50
+
+
+def test_export_glb(tmp_path: Path) -> None:
+    (path,) = export_meshes({1: L_TROMINO}, str(tmp_path), mesh_formats=["glb"])
+    content = Path(path).read_bytes()
+    magic, version, length = struct.unpack("<III", content[:12])
+    assert (magic, version, length) == (GLB_MAGIC, 2, len(content))
+    (json_length,) = struct.unpack("<I", content[12:16])
+    document = json.loads(content[20 : 20 + json_length])
+    assert [mesh["name"] for mesh in document["meshes"]] == ["unfolding_1"]
+    assert document["accessors"][0]["count"] == 14
+    assert document["accessors"][1]["count"] == 24 * 3
+
+
+def test_export_catalogue(tmp_path: Path) -> None:
+    data = {1: L_TROMINO, 2: [(0, 0, 0)], 3: [(5, 5, 5)]}
+    (path,) = export_meshes(data, str(tmp_path), catalogue=True)
+    assert path == str(tmp_path / f"{CATALOGUE_NAME}.obj")
+    lines = Path(path).read_text().splitlines()
+    assert [line for line in lines if line.startswith("o ")] == [
+        "o unfolding_1",
+        "o unfolding_2",
+        "o unfolding_3",
+    ]
+    vertices = np.array(
+        [line.split()[1:] for line in lines if line.startswith("v ")], dtype=float
+    )
+    assert vertices[:, 2].min() == 0
+    assert len(np.unique(vertices, axis=0)) == len(vertices)
+
+
+def test_export_invalid_format(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        export_meshes({1: L_TROMINO}, str(tmp_path), mesh_formats=["ply"])
+    with pytest.raises(ValueError):
+        export_meshes({1: L_TROMINO}, str(tmp_path), unfolding_ids=[7])
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from src.chronotva.metrics import RenderMetrics, escape_label_value, format_labels
+
+
+def test_escape_label_value() -> None:
+    assert escape_label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+def test_format_labels() -> None:
+    assert format_labels([]) == ""
+    assert format_labels([("format", "svg"), ("engine", "matplotlib")]) == (
+        '{format="svg",engine="matplotlib"}'
+    )
+
+
+def test_observe_render_fills_counters_and_histogram() -> None:
+    metrics = RenderMetrics(buckets=(0.1, 1.0))
+    metrics.observe_render("png", "matplotlib", 0.05, 100)
+    metrics.observe_render("png", "matplotlib", 0.5, 200)
+    metrics.record_failure("png", "matplotlib")
+    metrics.record_retry("png", "matplotlib")
+    metrics.record_retry("png", "matplotlib")
+    metrics.record_cache(hit=True)
+    metrics.record_cache(hit=False)
+    metrics.record_cache(hit=False)
+
+    text = metrics.to_text()
+
+    labels = '{format="png",engine="matplotlib"}'
+    assert f"chronotva_images_rendered_total{labels} 2" in text
+    assert f"chronotva_render_failures_total{labels} 1" in text
+    assert f"chronotva_render_retries_total{labels} 2" in text
+    assert f"chronotva_bytes_written_total{labels} 300" in text
+    assert (
+        'chronotva_render_seconds_bucket{format="png",engine="matplotlib",le="0.1"} 1'
+        in text
+    )
+    assert (
+        'chronotva_render_seconds_bucket{format="png",engine="matplotlib",le="1.0"} 2'
+        in text
+    )
+    assert (
+        'chronotva_render_seconds_bucket{format="png",engine="matplotlib",le="+Inf"} 2'
+        in text
+    )
+    assert f"chronotva_render_seconds_count{labels} 2" in text
+    assert "chronotva_cache_hits_total 1" in text
+    assert "chronotva_cache_misses_total 2" in text
+    assert "# TYPE chronotva_render_seconds histogram" in text
+
+
+def test_write_textfile(tmp_path: Path) -> None:
+    metrics = RenderMetrics()
+    metrics.observe_render("svg", "matplotlib", 0.2, 10)
+    path = tmp_path / "textfile" / "chronotva.prom"
+
+    metrics.write_textfile(str(path))
+
+    assert path.read_text().startswith("# HELP")
+    assert [entry.name for entry in path.parent.iterdir()] == ["chronotva.prom"]
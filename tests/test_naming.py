@@ -0,0 +1,93 @@
+import pytest
+
+from src.chronotva.naming import (
+    MAX_FILES_PER_DIRECTORY,
+    OutputKey,
+    OutputNamer,
+    auto_shard_depth,
+    output_hash,
+    validate_template,
+)
+
+KEY = OutputKey(7, (30, 22.5), "brand", "png")
+
+
+def test_validate_template() -> None:
+    validate_template("{palette}/unfolding_{id}_{view}.{format}")
+    with pytest.raises(ValueError):
+        validate_template("unfolding_{name}.{format}")
+    with pytest.raises(ValueError):
+        validate_template("unfolding_{}.png")
+    with pytest.raises(ValueError):
+        validate_template("unfolding_{id.{format}")
+    with pytest.raises(ValueError):
+        validate_template("/tmp/unfolding_{id}.{format}")
+    for template in (
+        "../../etc/{id}.{format}",
+        "{palette}/../../unfolding_{id}.{format}",
+        "..\\unfolding_{id}.{format}",
+    ):
+        with pytest.raises(ValueError):
+            validate_template(template)
+    validate_template("unfolding..{id}.{format}")
+
+
+def test_output_hash_is_stable() -> None:
+    assert output_hash(KEY) == output_hash(OutputKey(7, (30, 22.5), "brand", "png"))
+    assert output_hash(KEY) != output_hash(KEY._replace(output_format="svg"))
+    assert len(output_hash(KEY)) == 12
+
+
+def test_name_fields() -> None:
+    namer = OutputNamer("{palette}/{id}_{elevation}_{azimuth}_{view}.{format}")
+    assert namer.name(KEY) == "brand/7_30_22.5_30_22.5.png"
+    assert OutputNamer("{hash}.{format}").name(KEY) == f"{output_hash(KEY)}.png"
+
+
+def test_name_with_shards() -> None:
+    digest = output_hash(KEY)
+    name = OutputNamer("unfolding_{id}.{format}").name(KEY, shard_depth=2)
+    assert name == f"{digest[:2]}/{digest[2:4]}/unfolding_7.png"
+
+
+def test_auto_shard_depth() -> None:
+    assert auto_shard_depth(261) == 0
+    assert auto_shard_depth(MAX_FILES_PER_DIRECTORY) == 0
+    assert auto_shard_depth(MAX_FILES_PER_DIRECTORY + 1) == 1
+    assert auto_shard_depth(MAX_FILES_PER_DIRECTORY * 256 + 1) == 2
+
+
+def test_plan_rejects_duplicate_names() -> None:
+    namer = OutputNamer("unfolding_{id}.{format}")
+    with pytest.raises(ValueError):
+        namer.plan([KEY, KEY._replace(palette="other")])
+
+
+def test_plan_uses_explicit_shard_depth() -> None:
+    names = OutputNamer("unfolding_{id}.{format}", shard_depth=1).plan([KEY])
+    assert names[KEY].count("/") == 1
+
+
+def test_plan_rejects_hostile_palette_names() -> None:
+    namer = OutputNamer("unfolding_{id}_{palette}.{format}")
+    for palette in ("a/../..", "x/../../../etc"):
+        with pytest.raises(ValueError):
+            namer.plan([KEY._replace(palette=palette)])
+    with pytest.raises(ValueError):
+        OutputNamer("{palette}/unfolding_{id}.{format}").plan(
+            [KEY._replace(palette="..")]
+        )
+    for palette in ("/tmp/", "C:", "\\server\\share"):
+        with pytest.raises(ValueError):
+            OutputNamer("{palette}unfolding_{id}.{format}").plan(
+                [KEY._replace(palette=palette)]
+            )
+    # Subdirectories inside the output directory are fine.
+    assert namer.plan([KEY._replace(palette="team/brand")]) == {
+        KEY._replace(palette="team/brand"): "unfolding_7_team/brand.png"
+    }
+
+
+def test_negative_shard_depth() -> None:
+    with pytest.raises(ValueError):
+        OutputNamer("unfolding_{id}.{format}", shard_depth=-1)
@@ -0,0 +1,209 @@
+import gzip
+import io
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+from matplotlib.image import imread  # type: ignore
+
+from src.chronotva.native import (
+    NativeEngine,
+    RasterEngine,
+    VectorEngine,
+    project_scene,
+    view_basis,
+)
+from src.chronotva.tesseract import PlotParameters
+
+COORDINATES = [(0, 0, 0), (1, 0, 0), (1, 1, 0)]
+
+
+@pytest.fixture
+def plot_params() -> PlotParameters:
+    return PlotParameters(
+        colors=[(1, 0, 0, 1), (0, 0, 1, 0.5)],
+        edgecolors=[(0, 0, 0, 1)],
+        view_angle=(30, 22.5),
+        dpi=50,
+        transparent=True,
+        shade=True,
+        show_axes=False,
+        bbox_inches="tight",
+        height=2.0,
+        width=1.6,
+    )
+
+
+def test_view_basis() -> None:
+    right, up, toward = view_basis((0, 0))
+    assert np.allclose(toward, (1, 0, 0))
+    assert np.allclose(right, (0, 1, 0))
+    assert np.allclose(up, (0, 0, 1))
+    assert np.allclose(view_basis((90, 0))[2], (0, 0, 1))
+
+
+def test_project_scene_single_cube(plot_params: PlotParameters) -> None:
+    scene = project_scene([(0, 0, 0)], plot_params)
+    assert scene.polygons.shape == (3, 4, 2)
+    assert sorted(np.round(scene.shading, 3).tolist()) == [0.417, 0.417, 0.767]
+    points = scene.polygons.reshape(-1, 2)
+    assert points.min() > 0
+    assert np.all(points < np.array(scene.size))
+
+
+def test_project_scene_culls_hidden_faces(plot_params: PlotParameters) -> None:
+    scene = project_scene(COORDINATES, plot_params)
+    assert len(scene.polygons) == 7
+    assert sorted(scene.blocks.tolist()) == [0, 0, 1, 1, 2, 2, 2]
+
+
+def test_project_scene_whitespace(plot_params: PlotParameters) -> None:
+    scene = project_scene(COORDINATES, plot_params._replace(bbox_inches=None))
+    assert scene.size == (1.6, 2.0)
+    tight = project_scene(COORDINATES, plot_params)
+    assert tight.size[0] < 1.6 and tight.size[1] < 2.0
+
+
+def test_project_scene_uniform_scale(plot_params: PlotParameters) -> None:
+    params = plot_params._replace(extent=(3, 3, 3))
+    small = project_scene([(0, 0, 0)], params)
+    large = project_scene([(0, 0, 0), (1, 0, 0)], params)
+    edge = np.linalg.norm(small.polygons[0, 1] - small.polygons[0, 0])
+    assert np.isclose(
+        np.linalg.norm(large.polygons[:, 1] - large.polygons[:, 0], axis=1),
+        edge,
+    ).any()
+
+
+def test_scene_cache(plot_params: PlotParameters) -> None:
+    engine = VectorEngine(scene_cache_size=1)
+    first = engine.prepare(COORDINATES, plot_params)
+    recolored = plot_params._replace(colors=[(0, 1, 0, 1), (0, 0, 0, 1)])
+    assert engine.prepare(COORDINATES, recolored) is first
+    assert (engine.cache_hits, engine.cache_misses) == (1, 1)
+    # Faces of one color are merged differently.
+    single = plot_params._replace(colors=[(0, 1, 0, 1)])
+    assert engine.prepare(COORDINATES, single) is not first
+    engine.close()
+    assert not engine.scenes
+
+
+def test_draw_applies_colors_per_block(plot_params: PlotParameters) -> None:
+    engine = VectorEngine()
+    drawing = engine.draw(
+        engine.prepare(COORDINATES, plot_params._replace(shade=False)), plot_params
+    )
+    for block, facecolor in zip(drawing.scene.blocks, drawing.facecolors):
+        assert tuple(facecolor) == plot_params.colors[block % 2]
+    assert np.all(drawing.edgecolors == (0, 0, 0, 1))
+
+
+def test_raster_engine(tmp_path: Path, plot_params: PlotParameters) -> None:
+    engine = RasterEngine()
+    path = tmp_path / "blocks.png"
+    engine.plot_3d_blocks(COORDINATES, plot_params, "png", str(path))
+    pixels = imread(path)
+    scene = engine.prepare(COORDINATES, plot_params)
+    assert pixels.shape[1::-1] == tuple(
+        int(np.ceil(length * 50)) for length in scene.size
+    )
+    assert pixels[0, 0, 3] == 0
+    assert pixels[..., 3].max() == 1
+
+    buffer = io.BytesIO()
+    engine.plot_3d_blocks(
+        COORDINATES, plot_params._replace(transparent=False), "png", buffer
+    )
+    assert imread(io.BytesIO(buffer.getvalue()))[0, 0, 3] == 1
+
+
+def test_vector_engine_svg(tmp_path: Path, plot_params: PlotParameters) -> None:
+    path = tmp_path / "blocks.svg"
+    VectorEngine().plot_3d_blocks(COORDINATES, plot_params, "svg", str(path))
+    svg = path.read_text()
+    assert svg.count("<path ") == 7
+    assert "fill-opacity:0.5" in svg
+    assert "<rect" not in svg
+
+
+def test_vector_engine_pdf(plot_params: PlotParameters) -> None:
+    buffer = io.BytesIO()
+    VectorEngine().plot_3d_blocks(COORDINATES, plot_params, "pdf", buffer)
+    pdf = buffer.getvalue()
+    assert pdf.startswith(b"%PDF-1.4")
+    assert pdf.rstrip().endswith(b"%%EOF")
+    startxref = int(pdf.rsplit(b"startxref", 1)[1].split()[0])
+    assert pdf[startxref:].startswith(b"xref")
+    stream = pdf.split(b"stream\n", 1)[1].split(b"\nendstream", 1)[0]
+    assert zlib.decompress(stream).count(b" h B") == 7
+
+
+def test_project_scene_resolves_hidden(plot_params: PlotParameters) -> None:
+    assert project_scene(COORDINATES, plot_params).fragments is None
+    scene = project_scene(COORDINATES, plot_params, resolve_hidden=True)
+    assert scene.fragments is not None and scene.edges is not None
+    assert len(scene.fragments) == len(scene.edges) == len(scene.polygons)
+    # Neighbouring blocks have different colors, so no faces are merged.
+    assert all(len(pieces) == 1 for pieces in scene.fragments)
+    # 28 face edges, of which 8 are shared and 2 hidden.
+    segments = [len(polyline) - 1 for lines in scene.edges for polyline in lines]
+    assert sum(segments) == 18
+
+
+def test_project_scene_merges_coplanar_faces(plot_params: PlotParameters) -> None:
+    single = plot_params._replace(colors=[(1, 0, 0, 1)])
+    scene = project_scene(COORDINATES, single, resolve_hidden=True)
+    assert scene.fragments is not None and scene.edges is not None
+    assert [len(pieces) for pieces in scene.fragments] == [1, 1, 0, 1, 1, 1, 0]
+    segments = [len(polyline) - 1 for lines in scene.edges for polyline in lines]
+    assert sum(segments) == 18
+
+
+def test_vector_engine_visible_parts(plot_params: PlotParameters) -> None:
+    opaque = plot_params._replace(colors=[(1, 0, 0, 1)])
+    buffer = io.BytesIO()
+    VectorEngine().plot_3d_blocks(COORDINATES, opaque, "svg", buffer)
+    svg = buffer.getvalue().decode()
+    assert svg.count("stroke:none") == 5
+    assert svg.count("fill:none") == 1
+    assert "stroke-linejoin:round" in svg
+
+    buffer = io.BytesIO()
+    VectorEngine().plot_3d_blocks(COORDINATES, opaque, "pdf", buffer)
+    pdf = buffer.getvalue()
+    stream = pdf.split(b"stream\n", 1)[1].split(b"\nendstream", 1)[0]
+    content = zlib.decompress(stream)
+    assert content.count(b" h f") == 5
+    assert content.count(b" S") == 1
+    assert b" B" not in content
+
+
+def test_native_engine_rejects_unsupported_format(
+    plot_params: PlotParameters,
+) -> None:
+    with pytest.raises(ValueError):
+        RasterEngine().plot_3d_blocks(COORDINATES, plot_params, "svg", io.BytesIO())
+    with pytest.raises(ValueError):
+        VectorEngine().plot_3d_blocks([], plot_params, "svg", io.BytesIO())
+
+
+def test_vector_engine_compact_svg(plot_params: PlotParameters) -> None:
+    opaque = plot_params._replace(colors=[(1, 0, 0, 1)], svg_precision=1)
+    buffer = io.BytesIO()
+    VectorEngine().plot_3d_blocks(COORDINATES, opaque, "svgz", buffer)
+    svg = gzip.decompress(buffer.getvalue()).decode()
+    # The five visible faces have two shades, each filled as one path.
+    assert svg.count("<path ") == 3
+    assert svg.count("stroke:none") == 2
+    assert "style=" not in svg
+    assert re.search(r"\d\.\d\d", svg.split("<path", 1)[1]) is None
+
+
+def test_native_engine_requires_encode() -> None:
+    class IncompleteEngine(NativeEngine):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteEngine()  # type: ignore[abstract]
@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.chronotva.profiling import (
+    MERGED_PROFILE,
+    SUMMARY_FILE,
+    RenderProfiler,
+    optional_profile,
+    profile_run,
+)
+
+
+def busy_function() -> int:
+    return sum(i * i for i in range(1000))
+
+
+def test_profile_writes_prof_file(tmp_path: Path) -> None:
+    profiler = RenderProfiler(str(tmp_path / "profile"))
+    with profiler.profile("unfolding_1"):
+        busy_function()
+    assert os.path.exists(profiler.profile_path("unfolding_1"))
+
+
+def test_merge_without_data_returns_none(tmp_path: Path) -> None:
+    profiler = RenderProfiler(str(tmp_path / "profile"))
+    assert profiler.merge() is None
+
+
+def test_write_report_merges_sections(tmp_path: Path) -> None:
+    profiler = RenderProfiler(str(tmp_path / "profile"))
+    for name in ("unfolding_1", "unfolding_2"):
+        with profiler.profile(name):
+            busy_function()
+
+    summary_path = profiler.write_report()
+
+    assert summary_path == str(tmp_path / "profile" / SUMMARY_FILE)
+    assert os.path.exists(tmp_path / "profile" / MERGED_PROFILE)
+    with open(summary_path) as summary:
+        report = summary.read()
+    assert "busy_function" in report
+
+
+def test_merge_ignores_earlier_runs(tmp_path: Path) -> None:
+    earlier = RenderProfiler(str(tmp_path / "profile"))
+    with earlier.profile("unfolding_1"):
+        busy_function()
+    profiler = RenderProfiler(str(tmp_path / "profile"))
+    assert profiler.merge() is None
+
+    # Profilers sharing the run ID, e.g. in worker processes, are merged.
+    worker = RenderProfiler(str(tmp_path / "profile"), run_id=profiler.run_id)
+    with worker.profile("unfolding_2"):
+        busy_function()
+    stats = profiler.merge()
+    assert stats is not None
+    assert any(function[2] == "busy_function" for function in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_profile_run_reports_failed_runs(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError):
+        with profile_run(str(tmp_path / "profile")) as profiler:
+            with optional_profile(profiler, "unfolding_1"):
+                busy_function()
+            raise RuntimeError("Render failed.")
+    with open(tmp_path / "profile" / SUMMARY_FILE) as summary:
+        assert "busy_function" in summary.read()
+
+    with profile_run(None) as profiler:
+        with optional_profile(profiler, "unfolding_1"):
+            busy_function()
+    assert profiler is None
@@ -0,0 +1,205 @@
+import io
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.chronotva.native import RasterEngine, VectorEngine
+from src.chronotva.raster import (
+    BackgroundEncoder,
+    PendingImage,
+    RasterCache,
+    RasterizingEngine,
+    check_raster_options,
+    encode_pixels,
+    render_image,
+    render_pixels,
+    write_images,
+)
+from src.chronotva.sinks import DirectorySink
+from src.chronotva.tesseract import BlockPlotter, PlotParameters
+
+COORDINATES = [(0, 0, 0), (1, 0, 0), (1, 1, 0)]
+
+
+@pytest.fixture
+def plot_params() -> PlotParameters:
+    return PlotParameters(
+        colors=[(1, 0, 0, 1), (0, 0, 1, 0.5)],
+        edgecolors=[(0, 0, 0, 1)],
+        view_angle=(30, 22.5),
+        dpi=50,
+        transparent=True,
+        shade=True,
+        show_axes=False,
+        bbox_inches="tight",
+        height=2.0,
+        width=1.6,
+    )
+
+
+@pytest.fixture
+def pixels() -> np.ndarray:
+    # Two flat colors with an antialiased edge on a transparent background.
+    image = np.zeros((40, 30, 4), dtype=np.uint8)
+    image[5:20, 5:25] = (230, 0, 0, 255)
+    image[20:35, 5:25] = (0, 0, 230, 128)
+    image[20, 5:25] = (115, 0, 115, 200)
+    return image
+
+
+def test_check_raster_options(plot_params: PlotParameters) -> None:
+    check_raster_options(
+        plot_params._replace(png_compression=9, png_colors=2, webp_quality=0)
+    )
+    for invalid in (
+        {"png_compression": 10},
+        {"png_compression": -1},
+        {"png_colors": 1},
+        {"png_colors": 257},
+        {"webp_quality": 101},
+        {"webp_quality": "high"},
+    ):
+        with pytest.raises(ValueError):
+            check_raster_options(plot_params._replace(**invalid))
+
+
+def test_encode_png(plot_params: PlotParameters, pixels: np.ndarray) -> None:
+    fastest = encode_pixels(pixels, "png", plot_params._replace(png_compression=0))
+    smallest = encode_pixels(pixels, "png", plot_params._replace(png_compression=9))
+    assert len(smallest) < len(fastest)
+    for data in (fastest, smallest):
+        image = Image.open(io.BytesIO(data))
+        assert image.format == "PNG"
+        assert image.info["dpi"] == pytest.approx((50, 50), abs=0.1)
+        assert np.array_equal(np.asarray(image), pixels)
+
+
+def test_encode_png_palette(plot_params: PlotParameters, pixels: np.ndarray) -> None:
+    data = encode_pixels(pixels, "png", plot_params._replace(png_colors=16))
+    image = Image.open(io.BytesIO(data))
+    assert image.mode == "P"
+    assert image.info["dpi"] == pytest.approx((50, 50), abs=0.1)
+    # The few colors of the image, including its transparency, survive quantization.
+    assert np.array_equal(np.asarray(image.convert("RGBA")), pixels)
+
+
+def test_encode_webp(plot_params: PlotParameters, pixels: np.ndarray) -> None:
+    lossless = Image.open(io.BytesIO(encode_pixels(pixels, "webp", plot_params)))
+    assert lossless.format == "WEBP"
+    assert np.array_equal(np.asarray(lossless.convert("RGBA")), pixels)
+    lossy = Image.open(
+        io.BytesIO(encode_pixels(pixels, "webp", plot_params._replace(webp_quality=50)))
+    )
+    assert lossy.size == (30, 40)
+
+
+def test_encode_invalid_format(plot_params: PlotParameters, pixels: np.ndarray) -> None:
+    with pytest.raises(ValueError):
+        encode_pixels(pixels, "gif", plot_params)
+
+
+def test_rasterizing_engines(plot_params: PlotParameters) -> None:
+    assert isinstance(BlockPlotter(), RasterizingEngine)
+    assert isinstance(RasterEngine(), RasterizingEngine)
+    assert not isinstance(VectorEngine(), RasterizingEngine)
+
+
+def test_render_pixels_matches_png(plot_params: PlotParameters) -> None:
+    plotter = BlockPlotter()
+    pixels = render_pixels(plotter, COORDINATES, plot_params)
+    output = io.BytesIO()
+    plotter.plot_3d_blocks(COORDINATES, plot_params, "png", output)
+    output.seek(0)
+    assert np.array_equal(np.asarray(Image.open(output)), pixels)
+    plotter.close()
+
+
+def test_background_encoder_order() -> None:
+    encoder = BackgroundEncoder(depth=2)
+    finished: List[int] = []
+    threads = set()
+
+    def job(index: int) -> int:
+        time.sleep(0.01)
+        finished.append(index)
+        threads.add(threading.current_thread().name)
+        return index * 2
+
+    def make_job(index: int) -> Callable[[], int]:
+        return lambda: job(index)
+
+    futures = [encoder.submit(make_job(index)) for index in range(5)]
+    assert [future.result() for future in futures] == [0, 2, 4, 6, 8]
+    assert finished == [0, 1, 2, 3, 4]
+    assert threads != {threading.current_thread().name}
+    encoder.close()
+
+
+def test_background_encoder_error() -> None:
+    encoder = BackgroundEncoder(depth=1)
+
+    def fail() -> None:
+        raise OSError("disk full")
+
+    failed = encoder.submit(fail)
+    # A failed job neither stops the encoder nor raises when the next job is queued.
+    assert encoder.submit(lambda: 1).result() == 1
+    with pytest.raises(OSError):
+        failed.result()
+    encoder.close()
+
+
+def test_render_and_write_images(plot_params: PlotParameters, tmp_path: Path) -> None:
+    images = [
+        render_image(RasterEngine(), COORDINATES, plot_params, "webp", "a.webp"),
+        render_image(VectorEngine(), COORDINATES, plot_params, "svg", "a.svg"),
+    ]
+    # Raster images are only drawn; vector images are rendered completely.
+    assert isinstance(images[0].content, np.ndarray)
+    assert isinstance(images[1].content, bytes)
+    written = write_images(DirectorySink(str(tmp_path)), images)
+    assert [record.location for record, _ in written] == [
+        str(tmp_path / "a.webp"),
+        str(tmp_path / "a.svg"),
+    ]
+    assert Image.open(tmp_path / "a.webp").format == "WEBP"
+    assert written[1][0].size == (tmp_path / "a.svg").stat().st_size
+    assert all(seconds >= image.seconds for image, (_, seconds) in zip(images, written))
+
+
+def test_raster_cache_shares_pixels(plot_params: PlotParameters) -> None:
+    engine = RasterEngine()
+    cache = RasterCache()
+    with patch.object(engine, "rasterize", wraps=engine.rasterize) as rasterize:
+        images = [
+            render_image(
+                engine, COORDINATES, plot_params, output_format, name, None, cache
+            )
+            for output_format, name in (("png", "a.png"), ("webp", "a.webp"))
+        ]
+        assert rasterize.call_count == 1
+        assert images[0].content is images[1].content
+        assert isinstance(images[0].content, np.ndarray)
+        assert not images[0].content.flags.writeable
+        # Other colors are drawn and rasterized again.
+        recolored = plot_params._replace(colors=[(0, 1, 0, 1)])
+        render_image(engine, COORDINATES, recolored, "png", "b.png", None, cache)
+        assert rasterize.call_count == 2
+
+
+def test_write_images_encodes_before_writing(
+    plot_params: PlotParameters, pixels: np.ndarray, tmp_path: Path
+) -> None:
+    images = [
+        PendingImage("a.svg", "svg", plot_params, None, b"<svg/>", 0.0),
+        PendingImage("b.gif", "gif", plot_params, None, pixels, 0.0),
+    ]
+    with pytest.raises(ValueError):
+        write_images(DirectorySink(str(tmp_path)), images)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+from src.chronotva.renderdb import (
+    RenderCatalogue,
+    RenderRow,
+    file_sha256,
+    normalize_parameters,
+)
+from src.chronotva.tesseract import PlotParameters
+
+PARAMS = PlotParameters(
+    colors=[(0.9, 0.9, 0.9, 1.0)],
+    edgecolors=[(0.1, 0.1, 0.1, 1.0)],
+    view_angle=(30, 22.5),
+    dpi=100,
+    transparent=True,
+    shade=False,
+    show_axes=False,
+    bbox_inches="tight",
+    height=4.8,
+    width=6.4,
+)
+
+
+def count_rows(path: Path) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        return int(connection.execute("SELECT COUNT(*) FROM renders").fetchone()[0])
+    finally:
+        connection.close()
+
+
+def test_normalize_parameters() -> None:
+    normalized = normalize_parameters(PARAMS)
+    assert normalized == normalize_parameters(PARAMS._replace(view_angle=(30.0, 22.5)))
+    assert normalized != normalize_parameters(PARAMS._replace(dpi=200))
+    assert json.loads(normalized)["colors"] == [[0.9, 0.9, 0.9, 1.0]]
+    assert json.loads(normalized)["transparent"] is True
+    assert " " not in normalized
+
+
+def test_file_sha256(tmp_path: Path) -> None:
+    path = tmp_path / "output.svg"
+    path.write_bytes(b"<svg/>")
+    assert file_sha256(str(path)) == hashlib.sha256(b"<svg/>").hexdigest()
+
+
+def test_render_catalogue_batches(tmp_path: Path) -> None:
+    path = tmp_path / "db" / "renders.sqlite"
+    catalogue = RenderCatalogue(str(path), batch_size=2)
+    catalogue.add(1, PARAMS, "svg", "matplotlib", "out/a.svg", "aa", 10, 0.5)
+    assert count_rows(path) == 0
+    catalogue.add(2, PARAMS, "svg", "matplotlib", "out/b.svg", "aa", 10, 0.25)
+    assert count_rows(path) == 2
+    catalogue.add(1, PARAMS, "png", "matplotlib", "out/a.png", "bb", 20, 0.75)
+    catalogue.close()
+    assert count_rows(path) == 3
+
+
+def test_render_catalogue_queries(tmp_path: Path) -> None:
+    catalogue = RenderCatalogue(str(tmp_path / "renders.sqlite"))
+    catalogue.add(1, PARAMS, "svg", "matplotlib", "out/a.svg", "aa", 10, 0.5)
+    catalogue.add(1, PARAMS, "svg", "matplotlib", "old/a.svg", "aa", 10, 0.5)
+    catalogue.add(2, PARAMS, "svg", "matplotlib", "out/b.svg", "bb", 12, 0.5)
+    catalogue.add(2, PARAMS, "svg", "matplotlib", "out/b.svg", "bb", 12, 0.5)
+
+    row = catalogue.lookup(1, PARAMS, "svg", "matplotlib")
+    assert isinstance(row, RenderRow)
+    assert row.location == "old/a.svg"
+    assert row.content_hash == "aa"
+    assert row.parameters == normalize_parameters(PARAMS)
+    assert catalogue.lookup(1, PARAMS._replace(dpi=200), "svg", "matplotlib") is None
+    assert catalogue.lookup(1, PARAMS, "svg", "native-vector") is None
+    # Rendering the same location twice is not a duplicate.
+    assert catalogue.duplicates() == [("aa", ["old/a.svg", "out/a.svg"])]
+    catalogue.close()
@@ -0,0 +1,139 @@
+import os
+import time
+from pathlib import Path
+from typing import List, Mapping, Tuple
+
+import numpy as np
+import pytest
+
+from src.chronotva import shared
+from src.chronotva.profiling import RenderProfiler
+from src.chronotva.shared import (
+    SharedCatalogue,
+    WorkerLimits,
+    map_shared,
+    resident_memory,
+)
+
+DATA = {
+    3: [(0, 0, 0), (1, 0, 0)],
+    7: [(0, 0, 0), (0, -1, 0), (0, -1, 1)],
+    1: [(2, 2, 2)],
+}
+
+
+def count_blocks(
+    unfolding_id: int, data: Mapping[int, List[Tuple[int, int, int]]]
+) -> Tuple[int, int]:
+    return unfolding_id, len(data[unfolding_id])
+
+
+def worker_state(
+    unfolding_id: int, data: Mapping[int, List[Tuple[int, int, int]]]
+) -> Tuple[int, int]:
+    return os.getpid(), warm_ups
+
+
+def fail(unfolding_id: int, data: Mapping[int, List[Tuple[int, int, int]]]) -> None:
+    if unfolding_id == 7:
+        raise ValueError("Broken unfolding.")
+
+
+def crash(unfolding_id: int, data: Mapping[int, List[Tuple[int, int, int]]]) -> None:
+    os._exit(3)
+
+
+warm_ups = 0
+
+
+def warm_up() -> None:
+    global warm_ups
+    warm_ups += 1
+
+
+def test_shared_catalogue(tmp_path: Path) -> None:
+    catalogue = SharedCatalogue.create(DATA, str(tmp_path))
+    assert isinstance(catalogue.coordinates, np.memmap)
+    assert list(catalogue) == [3, 7, 1]
+    assert dict(catalogue) == DATA
+    assert dict(SharedCatalogue(str(tmp_path))) == DATA
+    assert 5 not in catalogue
+
+
+def test_shared_catalogue_empty(tmp_path: Path) -> None:
+    assert len(SharedCatalogue.create({}, str(tmp_path))) == 0
+
+
+def test_map_shared() -> None:
+    assert sorted(map_shared(count_blocks, [7, 3, 1, 7], DATA, jobs=2)) == [
+        (0, (7, 3)),
+        (1, (3, 2)),
+        (2, (1, 1)),
+        (3, (7, 3)),
+    ]
+
+
+def test_map_shared_profiles_workers(tmp_path: Path) -> None:
+    profiler = RenderProfiler(str(tmp_path))
+    results = [
+        result
+        for _, result in map_shared(worker_state, [1] * 4, DATA, 2, profiler=profiler)
+    ]
+    dumps = [name for name in os.listdir(tmp_path) if name.endswith(".prof")]
+    assert len(dumps) == 4
+    # Every worker dumps its tasks under the run ID of the parent's profiler.
+    assert {name.split(".")[2] for name in dumps} == {str(pid) for pid, _ in results}
+    stats = profiler.merge()
+    assert stats is not None
+    assert any(function[2] == "worker_state" for function in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_map_shared_initializer_runs_once_per_worker() -> None:
+    results = [
+        result for _, result in map_shared(worker_state, [1] * 8, DATA, 2, warm_up)
+    ]
+    assert {count for _, count in results} == {1}
+    assert 1 <= len({pid for pid, _ in results}) <= 2
+
+
+@pytest.mark.parametrize(
+    "limits", [WorkerLimits(max_tasks=2), WorkerLimits(max_memory=1)]
+)
+def test_map_shared_recycles_workers(limits: WorkerLimits) -> None:
+    results = [
+        result
+        for _, result in map_shared(worker_state, [1] * 6, DATA, 2, warm_up, limits)
+    ]
+    pids = [pid for pid, _ in results]
+    assert len(results) == 6
+    assert max(pids.count(pid) for pid in pids) <= (limits.max_tasks or 1)
+    assert {count for _, count in results} == {1}
+
+
+def test_map_shared_replaces_recycled_workers_at_once(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Replacements must not wait for a poll of an empty results queue to time out.
+    monkeypatch.setattr(shared, "POLL_SECONDS", 60.0)
+    start = time.perf_counter()
+    results = list(
+        map_shared(worker_state, [1] * 6, DATA, 2, limits=WorkerLimits(max_tasks=1))
+    )
+    assert len(results) == 6
+    assert time.perf_counter() - start < 30
+
+
+def test_map_shared_raises_task_errors() -> None:
+    with pytest.raises(ValueError, match="Broken"):
+        list(map_shared(fail, [3, 7, 1], DATA, 2))
+
+
+def test_map_shared_reports_crashed_workers() -> None:
+    with pytest.raises(RuntimeError, match="code 3"):
+        list(map_shared(crash, [3, 7], DATA, 2))
+
+
+def test_resident_memory() -> None:
+    memory = resident_memory()
+    assert memory is None or memory > 2**20
+    assert shared.worker_catalogue is None
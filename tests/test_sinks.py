@@ -0,0 +1,106 @@
+import json
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Union
+
+import pytest
+
+from src.chronotva.sinks import MANIFEST_NAME, ArchiveSink, DirectorySink
+
+
+def write_data(target: Union[str, BinaryIO]) -> None:
+    if isinstance(target, str):
+        with open(target, "wb") as output:
+            output.write(b"image data")
+    else:
+        target.write(b"image data")
+
+
+def test_directory_sink(tmp_path: Path) -> None:
+    sink = DirectorySink(str(tmp_path))
+    record = sink.write("unfolding_1.svg", write_data)
+    sink.close()
+    assert record.location == str(tmp_path / "unfolding_1.svg")
+    assert record.size == 10
+    assert (tmp_path / "unfolding_1.svg").read_bytes() == b"image data"
+
+
+def test_directory_sink_prepare(tmp_path: Path) -> None:
+    sink = DirectorySink(str(tmp_path))
+    sink.prepare(["ab/cd/unfolding_1.svg", "ab/ef/unfolding_2.svg", "unfolding_3.svg"])
+    assert (tmp_path / "ab" / "cd").is_dir()
+    assert (tmp_path / "ab" / "ef").is_dir()
+    record = sink.write("ab/cd/unfolding_1.svg", write_data)
+    assert record.size == 10
+
+
+def test_zip_archive_sink(tmp_path: Path) -> None:
+    archive_path = tmp_path / "nested" / "out.zip"
+    sink = ArchiveSink(str(archive_path))
+    record = sink.write("unfolding_1.png", write_data, {"unfolding_id": 1})
+    sink.close()
+
+    assert record.size == 10
+    with zipfile.ZipFile(archive_path) as archive:
+        assert archive.namelist() == ["unfolding_1.png", MANIFEST_NAME]
+        assert archive.getinfo("unfolding_1.png").compress_type == zipfile.ZIP_STORED
+        assert archive.read("unfolding_1.png") == b"image data"
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    assert manifest["outputs"][0]["name"] == "unfolding_1.png"
+    assert manifest["outputs"][0]["bytes"] == 10
+    assert manifest["outputs"][0]["unfolding_id"] == 1
+    assert len(manifest["outputs"][0]["sha256"]) == 64
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz", ".tgz", ".tar.xz"])
+def test_tar_archive_sink(tmp_path: Path, suffix: str) -> None:
+    archive_path = tmp_path / f"out{suffix}"
+    sink = ArchiveSink(str(archive_path))
+    sink.write("unfolding_1.svg", write_data)
+    sink.write("unfolding_2.svg", write_data)
+    sink.close()
+
+    with tarfile.open(archive_path) as archive:
+        assert archive.getnames() == [
+            "unfolding_1.svg",
+            "unfolding_2.svg",
+            MANIFEST_NAME,
+        ]
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar", ".tar.gz"])
+def test_reproducible_archive_sink(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, suffix: str
+) -> None:
+    archives = []
+    for now in (1_000_000_000.0, 1_700_000_000.0):
+        monkeypatch.setattr(time, "time", lambda: now)
+        archive_path = tmp_path / f"out{suffix}"
+        sink = ArchiveSink(str(archive_path), reproducible=True)
+        sink.write("unfolding_1.svg", write_data, {"unfolding_id": 1})
+        sink.close()
+        archives.append(archive_path.read_bytes())
+    assert archives[0] == archives[1]
+
+
+def test_zstd_archive_sink(tmp_path: Path) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    archive_path = tmp_path / "out.tar.zst"
+    sink = ArchiveSink(str(archive_path))
+    sink.write("unfolding_1.svg", write_data)
+    sink.close()
+
+    with open(archive_path, "rb") as compressed:
+        reader = zstandard.ZstdDecompressor().stream_reader(compressed)
+        with tarfile.open(fileobj=reader, mode="r|") as archive:
+            assert [member.name for member in archive] == [
+                "unfolding_1.svg",
+                MANIFEST_NAME,
+            ]
+
+
+def test_unsupported_archive_type(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        ArchiveSink(str(tmp_path / "out.rar"))
@@ -0,0 +1,87 @@
+import gzip
+
+import pytest
+
+from src.chronotva.svg import (
+    compact_path_data,
+    compact_svg,
+    finish_svg,
+    format_number,
+    normalize_style,
+)
+
+DOCUMENT = b"""<?xml version="1.0" encoding="utf-8" standalone="no"?>
+<svg xmlns:xlink="http://www.w3.org/1999/xlink" width="10.123456pt" height="20pt" viewBox="0 0 10.123456 20" xmlns="http://www.w3.org/2000/svg" version="1.1">
+ <defs>
+  <style type="text/css">*{stroke-linejoin: round}</style>
+  <clipPath id="clip1">
+   <rect x="0.5" y="0.5" width="9.123456" height="19"/>
+  </clipPath>
+  <path id="glyph" d="M 1 1 L 2 2 z"/>
+ </defs>
+ <g id="figure_1">
+  <g id="block_1">
+   <path d="M 1.234567 2.000001 
+L 3.5 4.25 
+z
+" clip-path="url(#clip1)" style="fill: #e6e6e6; stroke: #1a1a1a"/>
+   <path d="M -0.001 5 L 6 7 z" clip-path="url(#clip1)" style="fill: #e6e6e6; stroke: #1a1a1a"/>
+  </g>
+  <g id="text_1" transform="translate(1 2)">
+   <use xlink:href="#glyph" transform="scale(0.015625)"/>
+  </g>
+ </g>
+</svg>
+"""
+
+
+def test_format_number() -> None:
+    assert format_number(1.234567, 2) == "1.23"
+    assert format_number(2.000001, 2) == "2"
+    assert format_number(-0.001, 2) == "0"
+    assert format_number(120.0, 0) == "120"
+
+
+def test_compact_path_data() -> None:
+    assert compact_path_data("M 1 2 \nL -3 4 \nz\n") == "M1 2L-3 4z"
+
+
+def test_normalize_style() -> None:
+    assert normalize_style("fill: #e6e6e6; stroke: #1a1a1a;") == (
+        "fill:#e6e6e6;stroke:#1a1a1a"
+    )
+
+
+def test_compact_svg() -> None:
+    compacted = compact_svg(DOCUMENT, 2)
+    text = compacted.decode()
+    assert 'd="M1.23 2L3.5 4.25z"' in text
+    assert 'd="M0 5L6 7z"' in text
+    assert 'width="10.12pt"' in text and 'viewBox="0 0 10.12 20"' in text
+    # One class is shared by both blocks' paths.
+    assert ".s0{fill:#e6e6e6;stroke:#1a1a1a}" in text
+    assert text.count('class="s0"') == 2
+    assert "style=" not in text.split("</style>", 1)[1]
+    # The clip path is set once on the group, and referenced IDs are kept.
+    assert text.count('clip-path="url(#clip1)"') == 1
+    assert 'id="clip1"' in text and 'id="glyph"' in text
+    assert 'id="figure_1"' not in text and 'id="block_1"' not in text
+    assert 'transform="scale(0.015625)"' in text
+    assert "\n " not in text
+    assert len(compacted) < len(DOCUMENT) * 0.8
+    assert compact_svg(compacted, 2) == compacted
+
+
+def test_compact_svg_invalid() -> None:
+    with pytest.raises(ValueError):
+        compact_svg(DOCUMENT, -1)
+    with pytest.raises(ValueError):
+        compact_svg(b"<svg", 2)
+
+
+def test_finish_svg() -> None:
+    assert finish_svg(DOCUMENT, "svg", None) == DOCUMENT
+    compressed = finish_svg(DOCUMENT, "svgz", None)
+    assert gzip.decompress(compressed) == DOCUMENT
+    assert finish_svg(DOCUMENT, "svgz", None) == compressed
+    assert gzip.decompress(finish_svg(DOCUMENT, "svgz", 2)) == compact_svg(DOCUMENT, 2)
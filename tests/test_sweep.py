@@ -0,0 +1,301 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from src.chronotva.costs import CostModel, output_keys
+from src.chronotva.profiling import RenderProfiler
+from src.chronotva.shared import WorkerLimits
+from src.chronotva.sweep import (
+    DEFAULT_SIZE,
+    SweepEstimate,
+    dry_run_job,
+    estimate_output_bytes,
+    estimate_runtime,
+    estimate_sweep,
+    estimate_task_seconds,
+    format_bytes,
+    format_duration,
+    load_job,
+    parse_job,
+    parse_size,
+    plan_tasks,
+    run_job,
+    schedule_tasks,
+    task_size,
+)
+
+DATA = {
+    1: [(0, 0, 0), (1, 0, 0)],
+    2: [(0, 0, 0), (0, 0, 1), (0, 1, 1)],
+    3: [(0, 0, 0)],
+}
+
+JOB = {
+    "unfolding_ids": [1, 2],
+    "render": {"dpi": 20},
+    "sweep": {
+        "palettes": ["grey=230,230,230,1", "red/black"],
+        "views": [[30, 22.5], [45, 45]],
+        "sizes": ["40x30", "20x16"],
+        "formats": ["png", "svg"],
+    },
+}
+
+
+def test_parse_size() -> None:
+    assert parse_size("800x600") == (800, 600)
+    assert parse_size("20X16") == (20, 16)
+    for value in ("800", "axb", "0x10"):
+        with pytest.raises(ValueError):
+            parse_size(value)
+
+
+def test_parse_job_defaults() -> None:
+    spec = parse_job({"output_dir": "out"}, DATA)
+    assert spec.output_dir == "out"
+    assert spec.unfolding_ids is None
+    assert spec.palettes == []
+    assert spec.views == [(30, 22.5)]
+    assert spec.sizes == [DEFAULT_SIZE]
+    assert spec.formats == ["svg"]
+    assert spec.jobs == 1
+    assert spec.plot_params.dpi == 300
+    assert spec.plot_params.bbox_inches == "tight"
+
+
+def test_parse_job_sweep() -> None:
+    spec = parse_job(
+        {**JOB, "render": {"dpi": 20, "uniform_scale": True, "shade": True}}, DATA
+    )
+    assert [palette.name for palette in spec.palettes] == ["grey", "palette2"]
+    assert spec.palettes[1].edgecolors == [(0, 0, 0, 1)]
+    assert spec.views == [(30, 22.5), (45, 45)]
+    assert spec.sizes == [(40, 30), (20, 16)]
+    assert spec.plot_params.shade
+    assert spec.plot_params.extent == (2, 2, 2)
+
+
+@pytest.mark.parametrize(
+    "job",
+    [
+        {"output_directory": "out"},
+        {"render": {"colour": "red"}},
+        {"sweep": {"angles": [[30, 22.5]]}},
+        {"sweep": {"formats": ["gif"]}},
+        {"sweep": {"views": [30]}},
+        {"sweep": {"palettes": ["a=red", "a=blue"]}},
+        {"unfolding_ids": ["1"]},
+        {"jobs": 0},
+        {"max_tasks_per_worker": 0},
+        {"max_worker_memory": "1G"},
+        {"render": {"png_colors": 300}},
+        {"render": {"dpi": "300"}},
+        {"render": {"dpi": 0}},
+        {"render": {"dpi": -150}},
+        {"render": {"shade": "no"}},
+        {"render": {"transparent": "false"}},
+        {"render": {"uniform_scale": 1}},
+        {"render": {"block_color": 255}},
+        {"sweep": {"palettes": [1]}},
+        {"render": {"webp_quality": "high"}},
+        {"render": {"png_compression": True}},
+        {"render": {"svg_precision": False}},
+        {"render": 5},
+        {"sweep": ["formats"]},
+        {"sweep": {"formats": "png"}},
+        {"sweep": {"palettes": "red"}},
+        {"unfolding_ids": 5},
+        {"unfolding_ids": [True]},
+        {"jobs": True},
+        {"max_tasks_per_worker": True},
+        {"max_worker_memory": False},
+        {"shard_depth": "2"},
+        {"shard_depth": -1},
+        {"shard_depth": True},
+        {"output_template": 5},
+        {"output_dir": ["out"]},
+        {"cost_model": 1},
+    ],
+)
+def test_parse_job_invalid(job: dict) -> None:
+    with pytest.raises(ValueError):
+        parse_job(job, DATA)
+
+
+def test_load_job(tmp_path: Path) -> None:
+    job_path = tmp_path / "job.toml"
+    job_path.write_text(
+        'output_dir = "out"\nunfolding_ids = [1]\n\n[sweep]\nformats = ["png", "pdf"]\n'
+    )
+    spec = load_job(str(job_path), DATA)
+    assert spec.unfolding_ids == [1]
+    assert spec.formats == ["png", "pdf"]
+
+    job_path.write_text("output_dir = \n")
+    with pytest.raises(ValueError):
+        load_job(str(job_path), DATA)
+
+
+def test_plan_tasks_groups_by_geometry_and_camera() -> None:
+    tasks = plan_tasks(parse_job({**JOB, "output_dir": "out"}, DATA), DATA)
+    assert len(tasks) == 2 * 2 * 2
+    assert all(len(task.outputs) == 2 * 2 for task in tasks)
+    first = tasks[0]
+    assert (first.unfolding_id, first.plot_params.view_angle) == (1, (30, 22.5))
+    assert (first.plot_params.width * 20, first.plot_params.height * 20) == (40, 30)
+    assert [output.name for output in first.outputs] == [
+        "unfolding_1_grey_30_22.5_40x30.png",
+        "unfolding_1_grey_30_22.5_40x30.svg",
+        "unfolding_1_palette2_30_22.5_40x30.png",
+        "unfolding_1_palette2_30_22.5_40x30.svg",
+    ]
+
+
+def test_plan_tasks_with_template() -> None:
+    job = {**JOB, "output_template": "{size}/{id}.{format}"}
+    with pytest.raises(ValueError):
+        plan_tasks(parse_job(job, DATA), DATA)
+    job["output_template"] = "{size}/{palette}/{id}_{view}.{format}"
+    tasks = plan_tasks(parse_job(job, DATA), DATA)
+    assert tasks[0].outputs[0].name == "40x30/grey/1_30_22.5.png"
+
+
+def test_estimate_runtime() -> None:
+    tasks = plan_tasks(parse_job(JOB, DATA), DATA)
+    serial = estimate_runtime(tasks, 1)
+    assert serial > 0
+    assert estimate_runtime(tasks, 4) == pytest.approx(serial / 4)
+    assert estimate_runtime(tasks, 100) == max(
+        estimate_runtime([task], 1) for task in tasks
+    )
+    assert estimate_runtime([], 4) == 0
+
+
+def test_schedule_tasks_longest_first() -> None:
+    tasks = plan_tasks(parse_job(JOB, DATA), DATA)
+    scheduled = schedule_tasks(tasks)
+    assert [task_size(task) for task in scheduled] == [(40, 30)] * 4 + [(20, 16)] * 4
+    assert scheduled[0] is tasks[0]
+
+    model = CostModel()
+    model.record(output_keys("matplotlib", 1, "svg", 20, (20, 16)), 0.01, 1000)
+    model.record(output_keys("matplotlib", 2, "svg", 20, (20, 16)), 5.0, 1000)
+    scheduled = schedule_tasks(tasks, model)
+    assert [(task.unfolding_id, task_size(task)) for task in scheduled[:2]] == [
+        (2, (20, 16)),
+        (2, (20, 16)),
+    ]
+    assert estimate_task_seconds(scheduled[0], model) > 10
+
+
+def test_estimate_runtime_with_uneven_tasks() -> None:
+    tasks = plan_tasks(parse_job(JOB, DATA), DATA)
+    model = CostModel()
+    model.record(output_keys("matplotlib", 1, "png", 20, (40, 30)), 3.0, 1000)
+    model.record(output_keys("matplotlib", 2, "png", 20, (40, 30)), 0.01, 1000)
+    # Two tasks of about 6 seconds and six short ones fit on three workers.
+    assert estimate_runtime(tasks, 3, model) == pytest.approx(
+        max(estimate_task_seconds(task, model) for task in tasks)
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_job(tmp_path: Path, jobs: int) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path)}, DATA)
+    assert run_job(spec, DATA, jobs) == 32
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert len(files) == 32
+    assert "unfolding_2_palette2_45_45_20x16.svg" in files
+    assert all((tmp_path / name).stat().st_size > 0 for name in files)
+
+
+def test_run_job_profiles_workers(tmp_path: Path) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path / "out")}, DATA)
+    profiler = RenderProfiler(str(tmp_path / "profile"))
+    run_job(spec, DATA, 2, profiler)
+    stats = profiler.merge()
+    assert stats is not None
+    assert any(function[2] == "render_task" for function in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_run_job_recycles_workers(tmp_path: Path) -> None:
+    job = {**JOB, "output_dir": str(tmp_path), "max_tasks_per_worker": 1}
+    spec = parse_job(job, DATA)
+    assert spec.limits == WorkerLimits(1, None)
+    assert run_job(spec, DATA, 2) == 32
+    assert len(list(tmp_path.iterdir())) == 32
+
+
+def test_run_job_records_timings(tmp_path: Path) -> None:
+    cost_model = tmp_path / "costs.json"
+    job = {**JOB, "output_dir": str(tmp_path / "out"), "cost_model": str(cost_model)}
+    spec = parse_job(job, DATA)
+    assert spec.cost_model == str(cost_model)
+    run_job(spec, DATA, 1)
+    model = CostModel(str(cost_model))
+    assert model.means["matplotlib/png/20/40x30/1"][0] == 4
+    assert model.means["matplotlib/svg/20/20x16"][0] == 8
+    assert model.sizes["matplotlib/svg/20/20x16"][1] > 0
+
+    # The recorded sizes predict the next run.
+    tasks = plan_tasks(spec, DATA)
+    estimate = estimate_sweep(tasks, 1, model)
+    total = sum(path.stat().st_size for path in (tmp_path / "out").iterdir())
+    assert estimate.output_bytes == pytest.approx(total, rel=0.2)
+
+
+def test_estimate_sweep() -> None:
+    tasks = plan_tasks(parse_job(JOB, DATA), DATA)
+    estimate = estimate_sweep(tasks, 4)
+    assert estimate.outputs == 32
+    assert estimate.tasks == 8
+    assert estimate.workers == 4
+    assert estimate.cpu_seconds == pytest.approx(
+        sum(estimate_task_seconds(task) for task in tasks)
+    )
+    assert estimate.wall_seconds == estimate_runtime(tasks, 4)
+    # PNG sizes grow with the figure, vector sizes do not.
+    small, large = (estimate_output_bytes(task) for task in tasks[1::-1])
+    assert small[0] < large[0]
+    assert small[1] == large[1]
+    assert estimate_sweep([], 4) == SweepEstimate(0, 0, 1, 0, 0, 0)
+
+
+def test_dry_run_job(tmp_path: Path) -> None:
+    output_dir = tmp_path / "out"
+    spec = parse_job({**JOB, "output_dir": str(output_dir)}, DATA)
+    stream = io.StringIO()
+    estimate = dry_run_job(spec, DATA, 2, stream)
+    lines = stream.getvalue().splitlines()
+    assert lines[0].split("\t") == [
+        "unfolding",
+        "view",
+        "size",
+        "palette",
+        "format",
+        "seconds",
+        "bytes",
+        "name",
+    ]
+    rows = [line.split("\t") for line in lines[1:33]]
+    assert rows[0][:5] == ["1", "30_22.5", "40x30", "grey", "png"]
+    assert rows[0][7] == "unfolding_1_grey_30_22.5_40x30.png"
+    assert {row[7] for row in rows} == {
+        output.name for task in plan_tasks(spec, DATA) for output in task.outputs
+    }
+    assert lines[33:] == [
+        "Outputs: 32 in 8 tasks",
+        f"CPU time: {format_duration(estimate.cpu_seconds)}",
+        f"Wall time on 2 workers: {format_duration(estimate.wall_seconds)}",
+        f"Output size: {format_bytes(estimate.output_bytes)}",
+    ]
+    assert not output_dir.exists()
+
+
+def test_format_bytes() -> None:
+    assert format_bytes(0) == "0 B"
+    assert format_bytes(1023) == "1023 B"
+    assert format_bytes(1536) == "1.5 KiB"
+    assert format_bytes(5 * 2**30) == "5.0 GiB"
+    assert format_bytes(2**41) == "2.0 TiB"
@@ -1,12 +1,31 @@
+import gzip
 import os
+from io import BytesIO
 from pathlib import Path
-from typing import cast
+from typing import BinaryIO, Tuple, cast
 from unittest.mock import MagicMock, Mock, patch
 
+import numpy as np
 import pytest
 from matplotlib.colors import to_rgba  # type: ignore
+from matplotlib.image import imread  # type: ignore
+from matplotlib.transforms import Bbox  # type: ignore
 
-from src.chronotva.tesseract import BlockPlotter, PlotParameters, parse_rgba_list
+from src.chronotva.default_data import default_data
+from src.chronotva.tesseract import (
+    CROP_PAD_PIXELS,
+    BlockPlotter,
+    Palette,
+    PlotParameters,
+    parse_palette,
+    parse_palettes,
+    parse_rgba_list,
+    raster_size,
+)
+
+
+def save_blank_pixels(target: BinaryIO, **kwargs: object) -> None:
+    target.write(np.zeros((2, 2, 4), dtype=np.uint8).data)
 
 
 @pytest.fixture
@@ -37,6 +56,36 @@ def test_parse_rgba_list_invalid_colors() -> None:
         parse_rgba_list(color_string)
 
 
+def test_parse_palette() -> None:
+    palette = parse_palette("brand=255,0,0,1;blue/black", "palette1", [])
+    assert palette == Palette(
+        name="brand",
+        colors=[(1, 0, 0, 1), to_rgba("blue")],
+        edgecolors=[to_rgba("black")],
+    )
+
+
+def test_parse_palette_defaults() -> None:
+    edgecolors = [(0.1, 0.1, 0.1, 1.0)]
+    palette = parse_palette("red", "palette2", edgecolors)
+    assert palette == Palette("palette2", [to_rgba("red")], edgecolors)
+
+
+def test_parse_palette_invalid() -> None:
+    with pytest.raises(ValueError):
+        parse_palette("=red", "palette1", [])
+    with pytest.raises(ValueError):
+        parse_palette("brand=invalid-color", "palette1", [])
+
+
+def test_parse_palettes() -> None:
+    edgecolors = [(0.1, 0.1, 0.1, 1.0)]
+    palettes = parse_palettes(["red", "brand=blue"], edgecolors)
+    assert [palette.name for palette in palettes] == ["palette1", "brand"]
+    with pytest.raises(ValueError):
+        parse_palettes(["a=red", "a=blue"], edgecolors)
+
+
 class TestBlockPlotter:
     @pytest.fixture
     def plotter(self) -> BlockPlotter:
@@ -57,7 +106,7 @@ class TestBlockPlotter:
             width=6.4,
         )
 
-    @patch("matplotlib.pyplot.savefig")
+    @patch("matplotlib.pyplot.savefig", side_effect=save_blank_pixels)
     def test_plot_3d_blocks_valid(
         self,
         mock_savefig: MagicMock,
@@ -128,7 +177,7 @@ class TestBlockPlotter:
                 [], plot_params, "png", str(temp_output_dir / "output.png")
             )
 
-    @patch("matplotlib.pyplot.savefig")
+    @patch("matplotlib.pyplot.savefig", side_effect=save_blank_pixels)
     def test_plot_3d_blocks_single_color(
         self,
         mock_savefig: MagicMock,
@@ -144,3 +193,163 @@ class TestBlockPlotter:
             coordinates, plot_params, "png", str(temp_output_dir / "output.png")
         )
         mock_savefig.assert_called_once()
+
+    @patch("matplotlib.pyplot.savefig", side_effect=save_blank_pixels)
+    def test_plot_3d_blocks_analytic_crop(
+        self,
+        mock_savefig: MagicMock,
+        plotter: BlockPlotter,
+        plot_params: PlotParameters,
+        temp_output_dir: Path,
+    ) -> None:
+        plot_params = plot_params._replace(show_axes=False)
+        plotter.plot_3d_blocks(
+            [(0, 0, 0), (1, 0, 0)],
+            plot_params,
+            "png",
+            str(temp_output_dir / "output.png"),
+        )
+        bbox_inches = mock_savefig.call_args.kwargs["bbox_inches"]
+        assert isinstance(bbox_inches, Bbox)
+        assert 0 < bbox_inches.width < plot_params.width
+        assert 0 < bbox_inches.height < plot_params.height
+
+    @pytest.mark.parametrize("dpi", [50, 100, 300])
+    @pytest.mark.parametrize("view_angle", [(30, 22.5), (90, 0), (45, 45)])
+    def test_plot_3d_blocks_analytic_crop_removes_whitespace(
+        self,
+        plotter: BlockPlotter,
+        plot_params: PlotParameters,
+        temp_output_dir: Path,
+        dpi: int,
+        view_angle: Tuple[float, float],
+    ) -> None:
+        plot_params = plot_params._replace(
+            show_axes=False, transparent=True, dpi=dpi, view_angle=view_angle
+        )
+        output_path = str(temp_output_dir / "cropped.png")
+        plotter.plot_3d_blocks(default_data[1], plot_params, "png", output_path)
+        alpha = imread(output_path)[:, :, 3] > 0
+        rows = np.flatnonzero(alpha.any(axis=1))
+        columns = np.flatnonzero(alpha.any(axis=0))
+        margins = [
+            rows[0],
+            len(alpha) - 1 - rows[-1],
+            columns[0],
+            alpha.shape[1] - 1 - columns[-1],
+        ]
+        # No edge pixel is cut off, and only the padding is left around them.
+        assert 0 < min(margins) and max(margins) <= CROP_PAD_PIXELS + 1
+
+    def test_scene_cache_recolors_without_rebuilding(
+        self, plot_params: PlotParameters, temp_output_dir: Path
+    ) -> None:
+        plotter = BlockPlotter(scene_cache_size=1)
+        coordinates = [(0, 0, 0), (1, 0, 0)]
+        plot_params = plot_params._replace(show_axes=False, shade=True, dpi=50)
+        blue_params = plot_params._replace(colors=[(0, 0, 1, 1)])
+        try:
+            plotter.plot_3d_blocks(
+                coordinates, plot_params, "png", str(temp_output_dir / "red.png")
+            )
+            plotter.plot_3d_blocks(
+                coordinates, blue_params, "png", str(temp_output_dir / "blue.png")
+            )
+        finally:
+            plotter.close()
+        assert (plotter.cache_hits, plotter.cache_misses) == (1, 1)
+        assert not plotter.scenes
+
+        uncached_path = str(temp_output_dir / "blue_uncached.png")
+        BlockPlotter().plot_3d_blocks(coordinates, blue_params, "png", uncached_path)
+        with (
+            open(uncached_path, "rb") as uncached,
+            open(temp_output_dir / "blue.png", "rb") as cached,
+        ):
+            assert uncached.read() == cached.read()
+
+    def test_scene_cache_evicts_oldest_scene(self, plot_params: PlotParameters) -> None:
+        plotter = BlockPlotter(scene_cache_size=1)
+        try:
+            first = plotter.get_scene([(0, 0, 0)], plot_params)
+            plotter.get_scene([(0, 0, 0), (1, 0, 0)], plot_params)
+            assert len(plotter.scenes) == 1
+            assert first not in plotter.scenes.values()
+        finally:
+            plotter.close()
+
+    def test_scene_cache_saves_every_format_from_one_scene(
+        self, plot_params: PlotParameters, temp_output_dir: Path
+    ) -> None:
+        plotter = BlockPlotter(scene_cache_size=1)
+        try:
+            for output_format in ("png", "svg", "pdf"):
+                output_path = str(temp_output_dir / f"output.{output_format}")
+                plotter.plot_3d_blocks(
+                    [(0, 0, 0)], plot_params, output_format, output_path
+                )
+                assert os.path.getsize(output_path) > 0
+        finally:
+            plotter.close()
+        assert (plotter.cache_hits, plotter.cache_misses) == (2, 1)
+
+    @pytest.mark.parametrize("output_format", ["svg", "pdf"])
+    def test_reproducible_vector_output(
+        self, plot_params: PlotParameters, output_format: str
+    ) -> None:
+        plot_params = plot_params._replace(reproducible=True)
+        outputs = []
+        for _ in range(2):
+            plotter = BlockPlotter()
+            try:
+                buffer = BytesIO()
+                plotter.plot_3d_blocks(
+                    [(0, 0, 0), (1, 0, 0)], plot_params, output_format, buffer
+                )
+                outputs.append(buffer.getvalue())
+            finally:
+                plotter.close()
+        assert outputs[0] == outputs[1]
+        assert b"<dc:date>" not in outputs[0]
+        assert b"/CreationDate" not in outputs[0]
+
+    def test_compact_svg_output(self, plot_params: PlotParameters) -> None:
+        outputs = {}
+        plotter = BlockPlotter(scene_cache_size=1)
+        try:
+            for output_format, precision in (("svg", None), ("svgz", 2)):
+                buffer = BytesIO()
+                plotter.plot_3d_blocks(
+                    [(0, 0, 0), (1, 0, 0)],
+                    plot_params._replace(show_axes=False, svg_precision=precision),
+                    output_format,
+                    buffer,
+                )
+                outputs[output_format] = buffer.getvalue()
+        finally:
+            plotter.close()
+        compact = gzip.decompress(outputs["svgz"])
+        assert len(compact) < len(outputs["svg"]) * 0.6
+        assert b'class="s0"' in compact
+        assert compact.count(b"clip-path=") < outputs["svg"].count(b"clip-path=")
+
+    def test_render_rgba_into_array(
+        self, plotter: BlockPlotter, plot_params: PlotParameters
+    ) -> None:
+        plot_params = plot_params._replace(dpi=50, transparent=True)
+        assert raster_size(plot_params) == (240, 320)
+        out = np.zeros((240, 320, 4), dtype=np.uint8)
+        result = plotter.render_rgba([(0, 0, 0)], plot_params, out=out)
+        assert result is out
+        assert out[0, 0, 3] == 0
+        assert out[..., 3].max() == 255
+
+    def test_render_rgba_wrong_shape(
+        self, plotter: BlockPlotter, plot_params: PlotParameters
+    ) -> None:
+        with pytest.raises(ValueError):
+            plotter.render_rgba(
+                [(0, 0, 0)],
+                plot_params._replace(dpi=50),
+                out=np.zeros((10, 10, 4), dtype=np.uint8),
+            )
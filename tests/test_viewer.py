@@ -0,0 +1,108 @@
+import base64
+import json
+import re
+import struct
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+
+from src.chronotva.default_data import default_data
+from src.chronotva.meshes import GLB_MAGIC
+from src.chronotva.tesseract import PlotParameters
+from src.chronotva.viewer import (
+    GLTF_INSTANCING,
+    build_catalogue,
+    export_viewer,
+    unit_cube,
+)
+
+PLOT_PARAMS = PlotParameters(
+    colors=[(1.0, 0.0, 0.0, 1.0)],
+    edgecolors=[(0.0, 0.0, 0.0, 0.5)],
+    view_angle=(30, 22.5),
+    dpi=100,
+    transparent=True,
+    shade=False,
+    show_axes=False,
+    bbox_inches=None,
+    height=1,
+    width=1,
+)
+
+
+def read_glb(path: Path) -> Dict[str, Any]:
+    content = path.read_bytes()
+    magic, version, length = struct.unpack("<III", content[:12])
+    assert (magic, version, length) == (GLB_MAGIC, 2, len(content))
+    (json_length,) = struct.unpack("<I", content[12:16])
+    document: Dict[str, Any] = json.loads(content[20 : 20 + json_length])
+    return document
+
+
+def test_build_catalogue() -> None:
+    data = {1: [(0, 0, 0), (1, 0, 0)], 2: [(5, 5, 5)], 3: [(-1, 0, 0)]}
+    catalogue = build_catalogue(data, [2, 1])
+    assert catalogue.ranges == {2: (0, 1), 1: (1, 2)}
+    assert catalogue.offsets.shape == (3, 3)
+    assert catalogue.offsets[0].tolist() == [0, 0, 0]
+    assert catalogue.offsets[1:].tolist() == [[3, 0, 0], [4, 0, 0]]
+
+
+def test_build_catalogue_all_unfoldings() -> None:
+    catalogue = build_catalogue(default_data)
+    assert len(catalogue.ranges) == len(default_data)
+    assert len(catalogue.offsets) == 8 * len(default_data)
+    assert len(np.unique(catalogue.offsets, axis=0)) == len(catalogue.offsets)
+
+
+def test_build_catalogue_without_unfoldings() -> None:
+    with pytest.raises(ValueError):
+        build_catalogue(default_data, [9999])
+
+
+def test_unit_cube() -> None:
+    positions, normals, triangles, lines = unit_cube()
+    corners = positions[triangles].reshape(-1, 3, 3)
+    crosses = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    assert np.array_equal(crosses, normals[triangles[::3]])
+    edges = positions[lines].reshape(-1, 2, 3)
+    assert len(edges) == 12
+    assert np.all(np.abs(edges[:, 1] - edges[:, 0]).sum(axis=1) == 1)
+
+
+def test_export_glb(tmp_path: Path) -> None:
+    path = tmp_path / "catalogue.glb"
+    export_viewer({1: [(0, 0, 0), (0, 0, 1)]}, str(path), PLOT_PARAMS)
+    document = read_glb(path)
+    assert document["extensionsRequired"] == [GLTF_INSTANCING]
+    (node,) = document["nodes"]
+    translation = node["extensions"][GLTF_INSTANCING]["attributes"]["TRANSLATION"]
+    assert document["accessors"][translation]["count"] == 2
+    assert node["extras"] == {"unfoldings": {"1": [0, 2]}}
+    (mesh,) = document["meshes"]
+    assert [primitive["mode"] for primitive in mesh["primitives"]] == [4, 1]
+    materials = document["materials"]
+    assert materials[0]["pbrMetallicRoughness"]["baseColorFactor"] == [1, 0, 0, 1]
+    assert materials[1]["alphaMode"] == "BLEND"
+
+
+def test_export_html(tmp_path: Path) -> None:
+    path = tmp_path / "catalogue.html"
+    export_viewer({1: [(0, 0, 0)], 2: [(0, 0, 0), (0, 1, 0)]}, str(path), PLOT_PARAMS)
+    page = path.read_text()
+    match = re.search(r'type="application/json">(.*?)</script>', page)
+    assert match is not None
+    payload = json.loads(match.group(1))
+    offsets = np.frombuffer(base64.b64decode(payload["offsets"]), "<i2")
+    assert offsets.reshape(-1, 3).tolist() == [[0, 0, 0], [3, 0, 0], [3, 1, 0]]
+    assert payload["index"] == {"1": [0, 1], "2": [1, 2]}
+    assert len(payload["faces"]) == 36 * 3
+    assert "drawArraysInstanced" in page
+    assert "$" not in page.replace("${id}", "")
+
+
+def test_export_unsupported_file(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        export_viewer(default_data, str(tmp_path / "catalogue.obj"), PLOT_PARAMS)
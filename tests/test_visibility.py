@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from src.chronotva.default_data import default_data
+from src.chronotva.geometry import exposed_faces
+from src.chronotva.native import view_basis
+from src.chronotva.visibility import (
+    chain_segments,
+    clip_half_plane,
+    hidden_interval,
+    intersect_convex,
+    polygon_area,
+    resolve_visibility,
+    subtract_convex,
+    visible_intervals,
+)
+
+SQUARE = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+SHIFTED = [(1.0, 1.0), (3.0, 1.0), (3.0, 3.0), (1.0, 3.0)]
+
+
+def contains(polygon: np.ndarray, points: np.ndarray) -> np.ndarray:
+    inside = np.ones(len(points), dtype=bool)
+    for start, end in zip(polygon, np.roll(polygon, -1, axis=0)):
+        inside &= (end[0] - start[0]) * (points[:, 1] - start[1]) - (
+            end[1] - start[1]
+        ) * (points[:, 0] - start[0]) > 1e-7
+    return inside
+
+
+def test_polygon_area() -> None:
+    assert polygon_area(SQUARE) == 4
+    assert polygon_area(SQUARE[::-1]) == -4
+
+
+def test_clip_half_plane() -> None:
+    left = clip_half_plane(SQUARE, (1.0, 0.0), (1.0, 1.0), keep_left=True)
+    assert polygon_area(left) == 2
+    assert min(x for x, _ in left) == 0
+    assert clip_half_plane(SQUARE, (3.0, 0.0), (3.0, 1.0), keep_left=False) == []
+
+
+def test_intersect_convex() -> None:
+    assert polygon_area(intersect_convex(SQUARE, SHIFTED)) == 1
+    assert intersect_convex(SQUARE, [(x + 2, y) for x, y in SQUARE]) == []
+
+
+def test_subtract_convex() -> None:
+    pieces = subtract_convex(SQUARE, SHIFTED)
+    assert sum(polygon_area(piece) for piece in pieces) == 3
+    assert subtract_convex(SQUARE, [(x * 2 - 1, y * 2 - 1) for x, y in SQUARE]) == []
+
+
+def test_hidden_interval() -> None:
+    assert hidden_interval((-1.0, 1.0), (3.0, 1.0), SQUARE) == pytest.approx(
+        (0.25, 0.75)
+    )
+    assert hidden_interval((0.0, 0.0), (2.0, 0.0), SQUARE) is None
+    assert hidden_interval((3.0, 0.0), (3.0, 2.0), SQUARE) is None
+
+
+def test_visible_intervals() -> None:
+    assert visible_intervals([(0.0, 1.0)], (0.25, 0.75)) == [(0.0, 0.25), (0.75, 1.0)]
+    assert visible_intervals([(0.0, 0.5)], (0.0, 1.0)) == []
+
+
+def test_chain_segments() -> None:
+    a, b, c, d = (0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)
+    assert chain_segments([(b, c), (d, a), (a, b)]) == [[d, a, b, c]]
+    assert chain_segments([(a, b), (c, b), (c, d), (d, a)]) == [[a, b, c, d, a]]
+    assert chain_segments([(a, b), (c, d)]) == [[a, b], [c, d]]
+
+
+def test_resolve_visibility_segments() -> None:
+    back = [(x, y, 0.0) for x, y in SQUARE]
+    front = [(x, y, 1.0) for x, y in SHIFTED]
+    segments = np.array([[(0.0, 1.5, 0.0), (2.0, 1.5, 0.0)]])
+    _, edges = resolve_visibility(np.array([back, front]), segments, np.array([0]))
+    assert edges[1] == []
+    assert len(edges[0]) == 1
+    assert edges[0][0] == pytest.approx(np.array([[0.0, 1.5], [1.0, 1.5]]))
+
+
+def test_resolve_visibility_overlapping_squares() -> None:
+    back = [(x, y, 0.0) for x, y in SQUARE]
+    front = [(x, y, 1.0) for x, y in SHIFTED]
+    fragments, edges = resolve_visibility(np.array([back, front]))
+    assert sum(polygon_area(piece.tolist()) for piece in fragments[0]) == 3
+    assert [len(piece) for piece in fragments[1]] == [4]
+    assert len(edges[0]) == 1
+    assert edges[0][0] == pytest.approx(
+        np.array([[1.0, 2.0], [0.0, 2.0], [0.0, 0.0], [2.0, 0.0], [2.0, 1.0]])
+    )
+    assert len(edges[1]) == 1 and len(edges[1][0]) == 5
+
+
+def test_resolve_visibility_unfoldings() -> None:
+    rng = np.random.default_rng(0)
+    for coordinates in list(default_data.values())[::20]:
+        basis = view_basis((rng.uniform(-80, 80), rng.uniform(0, 360)))
+        faces = exposed_faces(coordinates)
+        polygons = faces.vertices[faces.normals @ basis[2] > 1e-9] @ basis.T
+        fragments, _ = resolve_visibility(polygons)
+
+        points = rng.uniform(
+            polygons[:, :, :2].min(axis=(0, 1)),
+            polygons[:, :, :2].max(axis=(0, 1)),
+            size=(2000, 2),
+        )
+        depth = np.full(len(points), -np.inf)
+        nearest = np.full(len(points), -1)
+        for index, polygon in enumerate(polygons):
+            origin = polygon[0]
+            normal = np.cross(polygon[1] - origin, polygon[2] - origin)
+            heights = origin[2] - (points - origin[:2]) @ normal[:2] / normal[2]
+            closer = contains(polygon[:, :2], points) & (heights > depth)
+            depth[closer] = heights[closer]
+            nearest[closer] = index
+        owners = np.full(len(points), -1)
+        for index, pieces in enumerate(fragments):
+            for piece in pieces:
+                inside = contains(piece, points)
+                assert np.all(owners[inside] == -1)
+                owners[inside] = index
+        assert np.all(owners[owners >= 0] == nearest[owners >= 0])
+        assert np.sum((nearest >= 0) & (owners < 0)) <= 2
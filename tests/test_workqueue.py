@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+
+from src.chronotva.sweep import parse_job, plan_tasks
+from src.chronotva.workqueue import (
+    DONE_DIR,
+    FAILED_DIR,
+    LEASED_DIR,
+    PENDING_DIR,
+    TEMPORARY_DIR,
+    FileQueue,
+    decode_task,
+    encode_task,
+    enqueue_job,
+    run_worker,
+)
+
+DATA = {
+    1: [(0, 0, 0), (1, 0, 0)],
+    2: [(0, 0, 0), (0, 0, 1), (0, 1, 1)],
+    3: [(0, 0, 0)],
+}
+
+JOB = {
+    "unfolding_ids": [1, 2, 3],
+    "render": {"dpi": 20, "uniform_scale": True},
+    "sweep": {
+        "palettes": ["grey=230,230,230,1", "red/black"],
+        "views": [[30, 22.5], [45, 45]],
+        "sizes": ["40x30"],
+        "formats": ["png", "svg"],
+    },
+}
+
+
+def output_names(spec_dir: Path) -> list:
+    spec = parse_job({**JOB, "output_dir": str(spec_dir)}, DATA)
+    return sorted(
+        output.name for task in plan_tasks(spec, DATA) for output in task.outputs
+    )
+
+
+def test_encode_task_round_trip(tmp_path: Path) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path)}, DATA)
+    for task in plan_tasks(spec, DATA):
+        encoded = json.loads(json.dumps(encode_task(task)))
+        assert decode_task(encoded) == task
+
+
+def test_queue_claim_and_recover(tmp_path: Path) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path / "out")}, DATA)
+    tasks = plan_tasks(spec, DATA)
+    queue = FileQueue(str(tmp_path / "queue"), lease_seconds=60)
+    queue.put("b.json", tasks[1])
+    queue.put("a.json", tasks[0])
+    first, second = queue.claim(), queue.claim()
+    assert first is not None and second is not None
+    assert (first.name, second.name) == ("a.json", "b.json")
+    assert decode_task(first.entry["task"]) == tasks[0]
+    assert queue.claim() is None
+    assert queue.counts() == {PENDING_DIR: 0, LEASED_DIR: 2, DONE_DIR: 0, FAILED_DIR: 0}
+
+    # A lease that has not been renewed for the lease time expires.
+    os.utime(queue.leased_path(second), (0, 0))
+    assert queue.recover_expired() == 1
+    assert not queue.renew(second)
+    assert queue.renew(first)
+    queue.complete(first)
+    assert queue.counts() == {PENDING_DIR: 1, LEASED_DIR: 0, DONE_DIR: 1, FAILED_DIR: 0}
+
+
+def test_queue_lost_lease(tmp_path: Path) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path / "out")}, DATA)
+    queue = FileQueue(str(tmp_path / "queue"), lease_seconds=60)
+    queue.put("a.json", plan_tasks(spec, DATA)[0])
+    lost = queue.claim()
+    assert lost is not None
+    os.utime(queue.leased_path(lost), (0, 0))
+    assert queue.recover_expired() == 1
+    assert queue.names(PENDING_DIR) == ["a.json"]
+    # Another worker takes the task over; the first one must not touch its lease.
+    taken = queue.claim()
+    assert taken is not None and taken.token != lost.token
+    assert not queue.renew(lost)
+    assert not queue.fail(lost, "RuntimeError: boom", retries=1)
+    queue.complete(lost)
+    assert queue.counts() == {PENDING_DIR: 0, LEASED_DIR: 1, DONE_DIR: 0, FAILED_DIR: 0}
+    assert queue.renew(taken)
+    queue.complete(taken)
+    assert queue.counts() == {PENDING_DIR: 0, LEASED_DIR: 0, DONE_DIR: 1, FAILED_DIR: 0}
+    assert os.listdir(queue.path(TEMPORARY_DIR, "")) == []
+
+
+def test_queue_fail_retries(tmp_path: Path) -> None:
+    spec = parse_job({**JOB, "output_dir": str(tmp_path / "out")}, DATA)
+    queue = FileQueue(str(tmp_path / "queue"))
+    queue.put("a.json", plan_tasks(spec, DATA)[0])
+    lease = queue.claim()
+    assert lease is not None
+    assert queue.fail(lease, "RuntimeError: boom", retries=1)
+    lease = queue.claim()
+    assert lease is not None
+    assert lease.entry["errors"] == ["RuntimeError: boom"]
+    assert not queue.fail(lease, "RuntimeError: boom", retries=1)
+    assert queue.counts()[FAILED_DIR] == 1
+    failed = json.loads(Path(queue.path(FAILED_DIR, "a.json")).read_text())
+    assert len(failed["errors"]) == 2
+
+
+def test_run_worker(tmp_path: Path) -> None:
+    output_dir = tmp_path / "out"
+    queue_dir = str(tmp_path / "queue")
+    spec = parse_job({**JOB, "output_dir": str(output_dir)}, DATA)
+    assert enqueue_job(spec, DATA, queue_dir) == 6
+    # An unknown unfolding fails without stopping the worker.
+    FileQueue(queue_dir).put(
+        "zz.json", plan_tasks(spec, DATA)[0]._replace(unfolding_id=99)
+    )
+    assert run_worker(queue_dir, DATA, lease_seconds=5) == 6
+    assert sorted(path.name for path in output_dir.iterdir()) == output_names(
+        output_dir
+    )
+    assert FileQueue(queue_dir).counts() == {
+        PENDING_DIR: 0,
+        LEASED_DIR: 0,
+        DONE_DIR: 6,
+        FAILED_DIR: 1,
+    }
+
+
+def test_enqueue_job_stores_absolute_output_dir(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    spec = parse_job({**JOB, "output_dir": "out"}, DATA)
+    enqueue_job(spec, DATA, "queue")
+    pending = tmp_path / "queue" / PENDING_DIR
+    for path in pending.iterdir():
+        task = decode_task(json.loads(path.read_text())["task"])
+        assert task.output_dir == str(tmp_path / "out")
+
+    # A worker in another working directory writes to the same place.
+    worker_dir = tmp_path / "elsewhere"
+    worker_dir.mkdir()
+    monkeypatch.chdir(worker_dir)
+    assert run_worker(str(tmp_path / "queue"), DATA, lease_seconds=5) == 6
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == (
+        output_names(tmp_path / "out")
+    )
+    assert list(worker_dir.iterdir()) == []
+
+
+def test_workers_drain_queue_together(tmp_path: Path) -> None:
+    output_dir = tmp_path / "out"
+    queue_dir = str(tmp_path / "queue")
+    spec = parse_job({**JOB, "output_dir": str(output_dir)}, DATA)
+    enqueue_job(spec, DATA, queue_dir)
+    context = multiprocessing.get_context()
+    workers = [
+        context.Process(target=run_worker, args=(queue_dir, DATA, 5)) for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+    assert FileQueue(queue_dir).counts()[DONE_DIR] == 6
+    assert sorted(path.name for path in output_dir.iterdir()) == output_names(
+        output_dir
+    )